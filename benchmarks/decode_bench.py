@@ -0,0 +1,190 @@
+"""
+Decode benchmark: response.json() vs the lean decode path in turvo_client
+
+Compares CPU time and memory for decoding /shipments/{id} bodies:
+    full_json    requests' response.json() (current path before lean decode)
+    full_orjson  orjson, full document
+    lean_json    stdlib json + projection to ShipmentSnapshot
+    lean_orjson  orjson + projection (what decode_shipment_details uses)
+
+Usage:
+    python -m benchmarks.decode_bench                         # synthetic fleet
+    python -m benchmarks.decode_bench --payloads recorded/    # *.json response bodies
+    python -m benchmarks.decode_bench --payloads bodies.jsonl --json results.json
+    python -m benchmarks.decode_bench --payloads capture.jsonl.gz   # TURVO_CAPTURE_PATH archive
+"""
+
+import argparse
+import gc
+import gzip
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List
+
+import requests
+
+from handlers import turvo_client, turvo_utils
+from benchmarks import fleet
+
+
+def load_payloads(path: str) -> List[bytes]:
+    """
+    Load recorded response bodies
+
+    Args:
+        path: Directory of *.json files, a .jsonl / .jsonl.gz file with one body per line,
+              or a turvo_capture archive (its /shipments/{id} bodies are used)
+
+    Returns:
+        list: Raw response bodies
+    """
+    if os.path.isdir(path):
+        bodies = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".json"):
+                with open(os.path.join(path, name), "rb") as f:
+                    bodies.append(f.read())
+        return bodies
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    if lines and b'"captured_at"' in lines[0]:
+        entries = (json.loads(line) for line in lines)
+        return [
+            entry["body"].encode() for entry in entries
+            if entry.get("status") == 200 and re.fullmatch(r"/shipments/\d+", entry["endpoint"])
+        ]
+    return lines
+
+
+def synthetic_payloads(count: int) -> List[bytes]:
+    """Serialize a synthetic fleet as /shipments/{id} response bodies"""
+    return [
+        json.dumps({"Status": "SUCCESS", "details": shipment}).encode()
+        for shipment in fleet.make_fleet(count)
+    ]
+
+
+def _response_json(raw: bytes) -> Dict[str, Any]:
+    response = requests.models.Response()
+    response._content = raw
+    response.status_code = 200
+    return response.json().get("details", {})
+
+
+def _full_orjson(raw: bytes) -> Dict[str, Any]:
+    return turvo_client.orjson.loads(raw).get("details", {})
+
+
+def _lean_json(raw: bytes) -> Dict[str, Any]:
+    return turvo_client.project_shipment(json.loads(raw).get("details", {}))
+
+
+def _lean_orjson(raw: bytes) -> Dict[str, Any]:
+    return turvo_client.project_shipment(turvo_client.orjson.loads(raw).get("details", {}))
+
+
+def measure(decode: Callable[[bytes], Any], bodies: List[bytes], repeat: int) -> Dict[str, float]:
+    """
+    Measure CPU time per document and memory held by the decoded results
+
+    Returns:
+        dict: us_per_doc, retained_kb_per_doc, peak_kb
+    """
+    # CPU: best of N passes (results discarded as we go)
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.process_time()
+        for raw in bodies:
+            decode(raw)
+        best = min(best, time.process_time() - start)
+
+    # Memory: keep every decoded document alive, like a sync run holding its results
+    gc.collect()
+    tracemalloc.start()
+    kept = [decode(raw) for raw in bodies]
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+
+    return {
+        "us_per_doc": round(best / len(bodies) * 1e6, 1),
+        "retained_kb_per_doc": round(retained / len(bodies) / 1024, 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def check_equivalent(bodies: List[bytes]) -> int:
+    """
+    Verify the lean snapshot yields the same webhook payload as the full document
+
+    Returns:
+        int: Number of mismatching documents
+    """
+    volatile = ("timestamp",)
+    mismatches = 0
+    for raw in bodies:
+        full = turvo_utils.transform_shipment_for_webhook(_response_json(raw))
+        lean = turvo_utils.transform_shipment_for_webhook(turvo_client.decode_shipment_details(raw))
+        if full is None or lean is None:
+            mismatches += (full is None) != (lean is None)
+            continue
+        for key in volatile:
+            full.pop(key, None)
+            lean.pop(key, None)
+        full["delivery"].pop("hours_until", None)
+        lean["delivery"].pop("hours_until", None)
+        mismatches += full != lean
+    return mismatches
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", help="Recorded response bodies (directory of .json or .jsonl[.gz])")
+    parser.add_argument("--count", type=int, default=1000, help="Synthetic documents if no --payloads")
+    parser.add_argument("--repeat", type=int, default=3, help="CPU passes (best is reported)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    bodies = load_payloads(args.payloads) if args.payloads else synthetic_payloads(args.count)
+    if not bodies:
+        print("No payloads found")
+        return 1
+
+    avg_kb = sum(len(b) for b in bodies) / len(bodies) / 1024
+    print(f"{len(bodies)} documents | avg body {avg_kb:.1f} KB | orjson: {'yes' if turvo_client.orjson else 'no'}")
+
+    paths = {"full_json": _response_json, "lean_json": _lean_json}
+    if turvo_client.orjson is not None:
+        paths["full_orjson"] = _full_orjson
+        paths["lean_orjson"] = _lean_orjson
+
+    results = {name: measure(decode, bodies, args.repeat) for name, decode in paths.items()}
+    baseline = results["full_json"]
+
+    print(f"{'path':<12} {'us/doc':>9} {'cpu x':>6} {'KB/doc':>8} {'mem x':>6} {'peak KB':>10}")
+    for name, r in results.items():
+        cpu_ratio = baseline["us_per_doc"] / r["us_per_doc"] if r["us_per_doc"] else 0
+        mem_ratio = baseline["retained_kb_per_doc"] / r["retained_kb_per_doc"] if r["retained_kb_per_doc"] else 0
+        print(f"{name:<12} {r['us_per_doc']:>9} {cpu_ratio:>6.2f} {r['retained_kb_per_doc']:>8} {mem_ratio:>6.2f} {r['peak_kb']:>10}")
+
+    mismatches = check_equivalent(bodies)
+    print(f"Payload equivalence (lean vs full): {len(bodies) - mismatches}/{len(bodies)} identical")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"documents": len(bodies), "avg_body_kb": round(avg_kb, 2),
+                       "results": results, "mismatches": mismatches}, f, indent=2)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
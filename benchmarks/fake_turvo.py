@@ -0,0 +1,256 @@
+"""
+Local stand-in for the Turvo API and the HappyRobot webhook
+
+Serves a synthetic fleet (benchmarks/fleet.py) with the endpoints
+turvo_client uses, plus a webhook receiver, with configurable latency and
+fault injection so throughput and resilience can be measured reproducibly.
+
+    POST /v1/oauth/token          tokens expire after --token-ttl seconds
+    GET  /v1/shipments/list       pageSize/start pagination, status[eq] filter
+    GET  /v1/shipments/{id}
+    GET  /v1/users/{id}
+    POST /hooks/{hook_id}         HappyRobot webhook (gzip/zstd bodies accepted)
+    GET  /_stats                  request counts, faults injected, webhooks received
+    POST /_reset                  clear stats
+
+Usage:
+    python -m benchmarks.fake_turvo --fleet-size 1000 --latency-ms 120 --latency-p99-ms 900 \\
+        --rate-429 0.01 --burst-rate 0.002 --burst-length 20 --token-ttl 600
+
+Point the app at it with:
+    TURVO_BASE_URL=http://127.0.0.1:8100/v1
+    MOTUS_IN_TRANSIT_WEBHOOK_URL=http://127.0.0.1:8100/hooks/local
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import math
+import random
+import secrets
+import time
+from collections import Counter
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from benchmarks import fleet
+
+
+@dataclass
+class FakeConfig:
+    """Stand-in behaviour (all faults off by default)"""
+    fleet_size: int = 100
+    seed: int = 0
+    page_size_max: int = 100
+    # Latency: lognormal with this median and p99 (equal values = fixed latency)
+    latency_ms: float = 0.0
+    latency_p99_ms: float = 0.0
+    webhook_latency_ms: float = 0.0
+    # Faults
+    rate_429: float = 0.0           # Probability a request gets 429
+    retry_after: int = 1            # Retry-After seconds on 429s
+    max_rps: float = 0.0            # Token-bucket rate limit (429 when exceeded), 0 = off
+    burst_rate: float = 0.0         # Probability a request starts a 5xx burst
+    burst_length: int = 10          # Requests failing with 503 once a burst starts
+    token_ttl: int = 43200          # Seconds until an issued token is rejected with 401
+    # Fleet dynamics
+    eta_change_rate: float = 0.0    # Probability a detail fetch sees a shifted ETA
+
+
+def _lognormal_sigma(median: float, p99: float) -> float:
+    if median <= 0 or p99 <= median:
+        return 0.0
+    return math.log(p99 / median) / 2.326  # z(0.99)
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    """
+    Build the stand-in app
+
+    Args:
+        config: Fleet size, latency and fault settings
+
+    Returns:
+        FastAPI: App to serve with uvicorn
+    """
+    app = FastAPI(title="Fake Turvo + HappyRobot")
+    rng = random.Random(config.seed)
+    started_at = datetime.now(timezone.utc)
+    base_id = config.seed * 10**6
+    sigma = _lognormal_sigma(config.latency_ms, config.latency_p99_ms)
+
+    state: Dict[str, Any] = {
+        "tokens": {},             # token -> expiry epoch
+        "burst_remaining": 0,
+        "bucket": config.max_rps,
+        "bucket_at": time.monotonic(),
+        "stats": Counter(),
+        "webhook_shipments": 0,
+        "webhook_bytes": 0,
+    }
+
+    def shipment(shipment_id: int) -> Optional[Dict[str, Any]]:
+        if not base_id < shipment_id <= base_id + config.fleet_size:
+            return None
+        doc = fleet.make_shipment(shipment_id, now=started_at)
+        if config.eta_change_rate and rng.random() < config.eta_change_rate:
+            eta = doc["globalRoute"][-1].get("etaToStop")
+            if eta:
+                shifted = datetime.fromisoformat(eta["etaValue"].replace("Z", "+00:00"))
+                eta["etaValue"] = fleet._iso(shifted + timedelta(minutes=rng.uniform(-30, 30)))
+        return doc
+
+    async def latency():
+        if config.latency_ms <= 0:
+            return
+        seconds = config.latency_ms / 1000
+        if sigma:
+            seconds *= math.exp(rng.gauss(0, sigma))
+        await asyncio.sleep(seconds)
+
+    def inject_fault(endpoint: str) -> Optional[Response]:
+        """Return an error response if a fault fires for this request"""
+        stats = state["stats"]
+
+        if config.max_rps:
+            now = time.monotonic()
+            state["bucket"] = min(config.max_rps, state["bucket"] + (now - state["bucket_at"]) * config.max_rps)
+            state["bucket_at"] = now
+            if state["bucket"] < 1:
+                stats[f"{endpoint} 429"] += 1
+                return JSONResponse({"Status": "ERROR", "details": {"errorMessage": "Rate limit exceeded"}},
+                                    status_code=429, headers={"Retry-After": str(config.retry_after)})
+            state["bucket"] -= 1
+
+        if config.rate_429 and rng.random() < config.rate_429:
+            stats[f"{endpoint} 429"] += 1
+            return JSONResponse({"Status": "ERROR", "details": {"errorMessage": "Too many requests"}},
+                                status_code=429, headers={"Retry-After": str(config.retry_after)})
+
+        if not state["burst_remaining"] and config.burst_rate and rng.random() < config.burst_rate:
+            state["burst_remaining"] = config.burst_length
+            stats["bursts"] += 1
+        if state["burst_remaining"]:
+            state["burst_remaining"] -= 1
+            stats[f"{endpoint} 503"] += 1
+            return JSONResponse({"Status": "ERROR"}, status_code=503)
+
+        return None
+
+    def check_token(request: Request, endpoint: str) -> Optional[Response]:
+        auth = request.headers.get("authorization", "")
+        expires_at = state["tokens"].get(auth.replace("Bearer ", ""))
+        if expires_at is None or time.time() >= expires_at:
+            state["stats"][f"{endpoint} 401"] += 1
+            return JSONResponse({"error": "invalid_token"}, status_code=401)
+        return None
+
+    async def turvo_response(request: Request, endpoint: str, body_fn) -> Response:
+        state["stats"][f"{endpoint} requests"] += 1
+        await latency()
+        error = check_token(request, endpoint) or inject_fault(endpoint)
+        if error:
+            return error
+        body = body_fn()
+        if body is None:
+            state["stats"][f"{endpoint} 404"] += 1
+            return JSONResponse({"Status": "ERROR", "details": {"errorMessage": "Not found"}}, status_code=404)
+        state["stats"][f"{endpoint} 200"] += 1
+        return JSONResponse({"Status": "SUCCESS", "details": body})
+
+    @app.post("/v1/oauth/token")
+    async def oauth_token():
+        state["stats"]["/oauth/token requests"] += 1
+        await latency()
+        token = secrets.token_hex(16)
+        state["tokens"][token] = time.time() + config.token_ttl
+        return {"access_token": token, "token_type": "bearer", "expires_in": config.token_ttl}
+
+    @app.get("/v1/shipments/list")
+    async def list_shipments(request: Request):
+        params = request.query_params
+        page_size = min(int(params.get("pageSize", 100)), config.page_size_max)
+        start = int(params.get("start", 0))
+        status = params.get("status[eq]")
+
+        def body():
+            # The whole synthetic fleet is En Route
+            end = min(start + page_size, config.fleet_size) if status in (None, "2105") else start
+            entries = [fleet.list_entry(shipment(base_id + i)) for i in range(start + 1, end + 1)]
+            return {
+                "shipments": entries,
+                "pagination": {"start": start, "pageSize": page_size, "totalRecordsInPage": len(entries),
+                               "moreAvailable": end < config.fleet_size}
+            }
+
+        return await turvo_response(request, "/shipments/list", body)
+
+    @app.get("/v1/shipments/{shipment_id}")
+    async def shipment_details(shipment_id: int, request: Request):
+        return await turvo_response(request, "/shipments/{id}", lambda: shipment(shipment_id))
+
+    @app.get("/v1/users/{user_id}")
+    async def user_details(user_id: int, request: Request):
+        return await turvo_response(request, "/users/{id}", lambda: fleet.make_user(user_id))
+
+    @app.post("/hooks/{hook_id}")
+    async def webhook(hook_id: str, request: Request):
+        raw = await request.body()
+        state["webhook_bytes"] += len(raw)
+        encoding = request.headers.get("content-encoding", "")
+        if encoding == "gzip":
+            raw = gzip.decompress(raw)
+        elif encoding == "zstd":
+            import zstandard
+            raw = zstandard.ZstdDecompressor().decompress(raw)
+
+        payload = json.loads(raw)
+        if config.webhook_latency_ms:
+            await asyncio.sleep(config.webhook_latency_ms / 1000)
+
+        state["stats"]["webhooks"] += 1
+        state["webhook_shipments"] += len(payload.get("shipments", []))
+        return {"status": "accepted", "hook_id": hook_id}
+
+    @app.get("/_stats")
+    async def stats():
+        return {
+            "config": asdict(config),
+            "requests": dict(state["stats"]),
+            "turvo_requests": sum(v for k, v in state["stats"].items() if k.endswith(" requests")),
+            "webhooks": state["stats"]["webhooks"],
+            "webhook_shipments": state["webhook_shipments"],
+            "webhook_bytes": state["webhook_bytes"],
+        }
+
+    @app.post("/_reset")
+    async def reset():
+        state["stats"].clear()
+        state["webhook_shipments"] = 0
+        state["webhook_bytes"] = 0
+        return {"status": "reset"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    for field, default in asdict(FakeConfig()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default)
+    args = vars(parser.parse_args())
+
+    import uvicorn
+
+    host, port = args.pop("host"), args.pop("port")
+    uvicorn.run(create_app(FakeConfig(**args)), host=host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
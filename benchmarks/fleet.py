@@ -0,0 +1,298 @@
+"""
+Synthetic Turvo fleet for benchmarks and local testing
+
+Documents follow the shape of real /shipments/{id} responses: every block the
+sync reads (globalRoute, carrierOrder drivers, equipment, customerOrder owner,
+status notes) is present, along with the bulk it ignores (costs, contacts,
+attributes, tracking) so decode and memory numbers are realistic.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
+
+
+STATES = ["TX", "PA", "CA", "IL", "GA", "OH", "NJ", "AZ", "WA", "FL", "MN", "CO"]
+CITIES = ["Dallas", "New Oxford", "Fresno", "Joliet", "Savannah", "Columbus",
+          "Edison", "Phoenix", "Kent", "Lakeland", "Eagan", "Denver"]
+FIRST_NAMES = ["Juan Carlos", "Harrison", "MIKE 22", "Ana-Maria", "Deshawn", "Li", "Olga"]
+OWNER_NAMES = ["Cameron Murray", "Justin Kinnett", "Kyle Patton", "Rick Straus", "Dana Ortiz"]
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _value(key: str, value: str) -> Dict[str, str]:
+    return {"key": key, "value": value}
+
+
+def _address(rng: random.Random, index: int) -> Dict[str, Any]:
+    i = rng.randrange(len(STATES))
+    return {
+        "id": rng.randrange(10**6, 10**7),
+        "line1": f"{rng.randrange(100, 9999)} Industrial Pkwy",
+        "line2": None,
+        "city": CITIES[i],
+        "state": STATES[i],
+        "zip": f"{rng.randrange(10000, 99999)}",
+        "country": "US",
+        "lat": round(rng.uniform(25, 48), 6),
+        "lon": round(rng.uniform(-122, -71), 6),
+        "type": _value("1201", "Warehouse"),
+        "isPrimary": index == 0,
+    }
+
+
+def _stop(rng: random.Random, index: int, stop_type: str, state: str,
+          appointment: datetime, eta: Optional[datetime]) -> Dict[str, Any]:
+    stop = {
+        "id": rng.randrange(10**8, 10**9),
+        "sequence": index,
+        "segmentSequence": index,
+        "name": f"{stop_type} Facility {rng.randrange(1, 500)}",
+        "stopType": _value("1500" if stop_type == "Pickup" else "1501", stop_type),
+        "state": state,
+        "timezone": "America/Chicago",
+        "location": {"id": rng.randrange(10**5, 10**6), "name": "DC"},
+        "address": _address(rng, index),
+        "contacts": [
+            {"id": rng.randrange(10**6), "name": "Receiving", "phone": "8005550100",
+             "email": "receiving@example.com", "isPrimary": True}
+        ],
+        "appointment": {
+            "date": _iso(appointment),
+            "start": _iso(appointment),
+            "end": _iso(appointment + timedelta(hours=2)),
+            "timezone": "America/Chicago",
+            "flex": 7200,
+            "hasTime": True,
+            "appointmentConfirmed": True,
+        },
+        "plannedAppointmentDate": {"appointment": {"date": _iso(appointment)}},
+        "services": [_value("21100", "Lumper"), _value("21101", "Driver assist")],
+        "schedulingType": _value("10701", "Appointment"),
+        "fcfs": False,
+        "poNumbers": [f"PO{rng.randrange(10**6)}" for _ in range(3)],
+        "attributes": {"arrival": None, "departed": None, "mileage": rng.randrange(50, 900)},
+        "notes": rng.choice([None, "Ships 7-1 PM Strict cut off", "TEAM DRIVERS ONLY!!!",
+                             "Call 1 hr ahead", "Seal must be intact"]),
+    }
+    if eta is not None:
+        stop["etaToStop"] = {
+            "etaValue": _iso(eta),
+            "nextStopMiles": rng.randrange(1, 600),
+            "nextStopMilesDistanceUnits": _value("1550", "mi"),
+            "etaSource": "GPS",
+            "lastUpdated": _iso(datetime.now(timezone.utc)),
+        }
+    return stop
+
+
+def _driver(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "id": rng.randrange(10**6, 10**7),
+        "context": {
+            "id": rng.randrange(10**6, 10**7),
+            "name": rng.choice(FIRST_NAMES) + " " + rng.choice(["Lopez", "Smith", "Nguyen"]),
+            "phones": [
+                {"id": rng.randrange(10**6), "number": f"{rng.randrange(2000000000, 9999999999)}",
+                 "type": _value("1300", "Mobile"), "isPrimary": True},
+                {"id": rng.randrange(10**6), "number": f"{rng.randrange(2000000000, 9999999999)}",
+                 "type": _value("1301", "Home"), "isPrimary": False},
+            ],
+            "emails": [{"email": "driver@example.com", "isPrimary": True}],
+        },
+        "truck": {"number": f"T{rng.randrange(1000)}"},
+        "trailer": {"number": f"TR{rng.randrange(1000)}"},
+        "deleted": False,
+    }
+
+
+def _costs(rng: random.Random, lines: int) -> Dict[str, Any]:
+    return {
+        "totalAmount": round(rng.uniform(800, 6000), 2),
+        "currency": _value("1550", "USD"),
+        "lineItem": [
+            {"code": _value("600", "Freight"), "qty": 1, "price": round(rng.uniform(50, 2000), 2),
+             "amount": round(rng.uniform(50, 2000), 2), "billable": True, "notes": None}
+            for _ in range(lines)
+        ],
+    }
+
+
+def make_shipment(
+    shipment_id: int,
+    hours_until: Optional[float] = None,
+    reefer: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    stops: int = 4,
+    carrier_orders: int = 1,
+    drivers: int = 2,
+    seed: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Build one En Route shipment document
+
+    Args:
+        shipment_id: Turvo shipment ID
+        hours_until: Hours from now to the delivery appointment (random if None)
+        reefer: Refrigerated equipment (random if None)
+        owner_id: Customer owner user ID (random from 5 owners if None)
+        stops: Number of globalRoute stops (first is pickup, last is delivery)
+        carrier_orders: Number of carrierOrder entries (earlier ones deleted)
+        drivers: Drivers per carrier order
+        seed: RNG seed (defaults to shipment_id, so documents are reproducible)
+        now: Reference time for ETA/appointment
+
+    Returns:
+        dict: Shipment object as found under "details" in /shipments/{id}
+    """
+    rng = random.Random(shipment_id if seed is None else seed)
+    now = now or datetime.now(timezone.utc)
+
+    if hours_until is None:
+        hours_until = rng.uniform(-2, 30)
+    if reefer is None:
+        reefer = rng.random() < 0.3
+    if owner_id is None:
+        owner_id = 201280 + rng.randrange(len(OWNER_NAMES))
+
+    appointment = now + timedelta(hours=hours_until)
+    eta = appointment + timedelta(minutes=rng.uniform(-90, 60))
+
+    route = [_stop(rng, 0, "Pickup", "COMPLETED", now - timedelta(hours=20), None)]
+    for i in range(1, max(stops, 2) - 1):
+        route.append(_stop(rng, i, "Delivery", "COMPLETED", now - timedelta(hours=20 - i), None))
+    route.append(_stop(rng, len(route), "Delivery", "OPEN", appointment, eta))
+
+    carrier_order_list = []
+    for i in range(max(carrier_orders, 1)):
+        carrier_order_list.append({
+            "id": rng.randrange(10**7, 10**8),
+            "deleted": i < carrier_orders - 1,
+            "carrier": {"id": rng.randrange(10**4, 10**5), "name": f"Carrier {rng.randrange(900)} LLC",
+                        "mcNumber": f"MC{rng.randrange(10**6)}", "dotNumber": f"{rng.randrange(10**7)}"},
+            "drivers": [_driver(rng) for _ in range(drivers)],
+            "costs": _costs(rng, 4),
+            "contacts": [{"name": "Dispatch", "phone": "8005550111"}],
+            "externalIds": [{"type": "PRO", "value": f"{rng.randrange(10**8)}"}],
+        })
+
+    equipment = {
+        "id": rng.randrange(10**6),
+        "type": _value("1200", "Refrigerated" if reefer else "Van"),
+        "size": _value("1301", "53 ft"),
+        "weight": rng.randrange(20000, 44000),
+        "weightUnits": _value("1520", "lb"),
+        "description": rng.choice([None, "Pre-cool to 34F", "No double stacking"]),
+        "shipmentEquipmentOptions": [_value("1400", "Food grade")],
+    }
+    if reefer:
+        equipment["temp"] = rng.choice([-10, 0, 34, 36, 38])
+        equipment["tempUnits"] = _value("1510", "°F")
+
+    owner_name = OWNER_NAMES[owner_id % len(OWNER_NAMES)]
+
+    return {
+        "id": shipment_id,
+        "customId": f"M{290000 + shipment_id}",
+        "status": {
+            "code": _value("2105", "En route"),
+            "notes": rng.choice([None, "Driver reports traffic", "On schedule"]),
+            "statusDate": _iso(now),
+            "location": {"city": "Somewhere", "state": "TX"},
+        },
+        "ltlShipment": False,
+        "startDate": {"date": _iso(now - timedelta(hours=20))},
+        "endDate": {"date": _iso(appointment)},
+        "lane": {"start": route[0]["address"]["city"], "end": route[-1]["address"]["city"]},
+        "globalRoute": route,
+        "carrierOrder": carrier_order_list,
+        "equipment": [equipment],
+        "customerOrder": [{
+            "id": rng.randrange(10**7, 10**8),
+            "deleted": False,
+            "customer": {
+                "id": rng.randrange(10**4, 10**5),
+                "name": f"Customer {rng.randrange(300)} Foods",
+                "owner": {"id": owner_id, "name": owner_name},
+            },
+            "costs": _costs(rng, 6),
+            "items": [{"name": "Produce", "qty": rng.randrange(1, 30), "weight": 1000} for _ in range(3)],
+            "contacts": [{"name": "AP", "email": "ap@example.com"}],
+        }],
+        "tracking": {"lastLocation": {"lat": 33.1, "lon": -96.7, "date": _iso(now)},
+                     "pings": [{"lat": 33.0 + i / 100, "lon": -96.7, "date": _iso(now)} for i in range(10)]},
+        "margin": {"amount": round(rng.uniform(100, 900), 2), "percent": round(rng.uniform(5, 20), 1)},
+        "attributes": {"hazmat": False, "highValue": False, "temperatureControlled": reefer},
+        "created": _iso(now - timedelta(days=2)),
+        "updated": _iso(now),
+    }
+
+
+def make_fleet(size: int, seed: int = 0, **kwargs) -> List[Dict[str, Any]]:
+    """
+    Build a fleet of shipment documents with IDs starting at seed * 10**6 + 1
+
+    Args:
+        size: Number of shipments
+        seed: Fleet seed (shifts IDs so different fleets don't collide)
+        **kwargs: Passed through to make_shipment
+
+    Returns:
+        list: Shipment documents
+    """
+    base = seed * 10**6
+    return [make_shipment(base + i, **kwargs) for i in range(1, size + 1)]
+
+
+def list_entry(shipment: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summary shape returned for a shipment by /shipments/list
+
+    Args:
+        shipment: Full shipment document
+
+    Returns:
+        dict: List-level summary (ids, status, dates, lane, customer/owner, stop summary)
+    """
+    return {
+        "id": shipment["id"],
+        "customId": shipment["customId"],
+        "status": {"code": shipment["status"]["code"]},
+        "startDate": shipment["startDate"],
+        "endDate": shipment["endDate"],
+        "lane": shipment["lane"],
+        "customerOrder": [
+            {"id": co["id"], "deleted": co["deleted"], "customer": co["customer"]}
+            for co in shipment["customerOrder"]
+        ],
+        "globalRoute": [
+            {key: stop[key] for key in ("id", "sequence", "stopType", "state", "appointment", "etaToStop")
+             if key in stop}
+            for stop in shipment["globalRoute"]
+        ],
+    }
+
+
+def make_user(user_id: int) -> Dict[str, Any]:
+    """
+    User document as returned by /users/{id}
+
+    Args:
+        user_id: Turvo user ID
+
+    Returns:
+        dict: User with name and phone list (Fax = team line)
+    """
+    return {
+        "id": user_id,
+        "name": OWNER_NAMES[user_id % len(OWNER_NAMES)],
+        "email": [{"email": "owner@example.com", "isPrimary": True}],
+        "phone": [
+            {"number": "8005550199", "isPrimary": True, "deleted": False, "type": _value("1300", "Work")},
+            {"number": "8005550123 x12", "isPrimary": False, "deleted": False, "type": _value("1303", "Fax")},
+        ],
+    }
@@ -0,0 +1,111 @@
+"""
+Import and cold-start time
+
+Each measurement runs in a fresh interpreter (nothing cached in-process):
+    import_in_transit    python -c "import handlers.in_transit"
+    import_server        python -c "import server"
+    first_health         uvicorn server:app started -> first 200 from /health
+
+Reports the median and min of --runs runs in milliseconds. REDIS_URL is set
+to an address nothing listens on, so a client that connects at import time
+would show up as a slow (or failing) import.
+
+Usage:
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --runs 15 --json startup.json
+    python -m benchmarks.startup_bench --root /path/to/other/checkout    # compare two trees
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List
+
+import requests
+
+TIMER = "import time, sys; t = time.perf_counter(); import {module}; sys.stdout.write(str(time.perf_counter() - t))"
+
+
+def _env(root: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "PYTHONPATH": root,
+        "PYTHONDONTWRITEBYTECODE": "0",
+        "REDIS_URL": os.getenv("STARTUP_BENCH_REDIS_URL", "redis://127.0.0.1:1/0"),
+        "WARMUP_ENABLED": "false",
+    }
+
+
+def time_import(root: str, module: str) -> float:
+    """Seconds to import module in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-c", TIMER.format(module=module)],
+        cwd=root, env=_env(root), capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_health(root: str, port: int) -> float:
+    """Seconds from spawning uvicorn to the first successful /health"""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=root, env=_env(root), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + 60
+        while time.perf_counter() < deadline:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/health", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - started
+            except requests.RequestException:
+                pass
+            time.sleep(0.005)
+        raise RuntimeError("Server did not become healthy")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="Checkout to measure (default: this one)")
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    # One untimed run so .pyc files exist for every measured one
+    time_import(args.root, "server")
+
+    results: Dict[str, Any] = {
+        "import_in_transit": summarize([time_import(args.root, "handlers.in_transit") for _ in range(args.runs)]),
+        "import_server": summarize([time_import(args.root, "server") for _ in range(args.runs)]),
+        "first_health": summarize([time_first_health(args.root, args.port) for _ in range(args.runs)]),
+    }
+
+    print(f"{args.root} | {args.runs} runs")
+    print(f"{'measurement':<20} {'median ms':>10} {'min ms':>8}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['median_ms']:>10} {result['min_ms']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
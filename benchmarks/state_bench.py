@@ -0,0 +1,186 @@
+"""
+State store throughput: SQLite (WAL) vs Redis
+
+For each backend, on the key shapes the sync uses:
+    read_batch       get_many of --batch dedup keys (half of them set)     keys/s
+    write_batch      set_many of --batch dedup records                     keys/s
+    get / set        one key per call (token cache)                        ops/s
+    claim            --workers processes add() the same --claims keys      claims/s
+                     at once; every key must be won exactly once
+
+Redis is measured only if --redis-url answers; keys go under state_bench:
+and are deleted afterwards. SQLite uses a fresh file in a temp directory
+(or --db-path).
+
+Usage:
+    python -m benchmarks.state_bench
+    python -m benchmarks.state_bench --batch 2000 --workers 8 --redis-url redis://localhost:6379/15 --json state.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Optional
+
+from handlers import state_store
+
+PREFIX = "state_bench"
+TTL = 3600
+RECORD = json.dumps({"load_number": "M3290052", "call_type": "final", "called_at": "2026-10-19T14:05:11+00:00"})
+
+
+def open_store(backend: str, target: str) -> state_store.StateStore:
+    if backend == "sqlite":
+        return state_store.SQLiteStateStore(target)
+    import redis
+    return state_store.RedisStateStore(redis.from_url(target))
+
+
+def _keys(count: int, tag: str) -> List[str]:
+    return [f"{PREFIX}:{tag}:{call_type}:{i}" for i in range(count // 2) for call_type in ("checkin", "final")]
+
+
+def _rate(count: int, seconds: float) -> int:
+    return int(count / seconds) if seconds > 0 else 0
+
+
+def measure(store: state_store.StateStore, batch: int, rounds: int, singles: int) -> Dict[str, int]:
+    keys = _keys(batch, "dedup")
+    store.set_many({key: RECORD for key in keys[::2]}, TTL)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        values = store.get_many(keys)
+    read = time.perf_counter() - started
+    assert sum(value is not None for value in values) == len(keys[::2])
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        store.set_many({key: RECORD for key in keys}, TTL)
+    write = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(singles):
+        store.set(f"{PREFIX}:token:{i % 10}", RECORD, TTL)
+    set_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(singles):
+        store.get(f"{PREFIX}:token:{i % 10}")
+    get_time = time.perf_counter() - started
+
+    return {
+        "read_batch_keys_per_s": _rate(len(keys) * rounds, read),
+        "write_batch_keys_per_s": _rate(len(keys) * rounds, write),
+        "get_ops_per_s": _rate(singles, get_time),
+        "set_ops_per_s": _rate(singles, set_time),
+    }
+
+
+def _claim_worker(backend: str, target: str, claims: int, start_at: float, results) -> None:
+    store = open_store(backend, target)
+    while time.time() < start_at:
+        time.sleep(0.001)
+    won = [i for i in range(claims) if store.add(f"{PREFIX}:claim:{i}", RECORD, TTL)]
+    results.put((won, time.time()))
+    store.close()
+
+
+def measure_claims(backend: str, target: str, workers: int, claims: int) -> Dict[str, Any]:
+    """workers processes race to claim the same keys (like two workers handling one shipment's events)"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    start_at = time.time() + 2  # Let every process start and connect first
+    processes = [
+        context.Process(target=_claim_worker, args=(backend, target, claims, start_at, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+
+    won = [i for keys, _ in outcomes for i in keys]
+    elapsed = max(finished for _, finished in outcomes) - start_at
+    return {
+        "claims_per_s": _rate(claims * workers, elapsed),
+        "exactly_once": len(won) == claims and len(set(won)) == claims,
+    }
+
+
+def _cleanup(backend: str, target: str):
+    if backend == "redis":
+        import redis
+        client = redis.from_url(target)
+        keys = list(client.scan_iter(match=f"{PREFIX}:*", count=1000))
+        for i in range(0, len(keys), 1000):
+            client.delete(*keys[i:i + 1000])
+        client.close()
+
+
+def _redis_reachable(url: str) -> bool:
+    try:
+        import redis
+        redis.from_url(url, socket_connect_timeout=1).ping()
+        return True
+    except Exception:
+        return False
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=1000, help="Keys per batched read / write")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--singles", type=int, default=2000, help="Single-key gets and sets")
+    parser.add_argument("--workers", type=int, default=4, help="Processes racing for the same claims")
+    parser.add_argument("--claims", type=int, default=2000)
+    parser.add_argument("--db-path", help="SQLite file (default: a fresh one in a temp directory)")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    temp_dir: Optional[tempfile.TemporaryDirectory] = None
+    if not args.db_path:
+        temp_dir = tempfile.TemporaryDirectory()
+        args.db_path = os.path.join(temp_dir.name, "state.db")
+
+    targets = [("sqlite", args.db_path)]
+    if _redis_reachable(args.redis_url):
+        targets.append(("redis", args.redis_url))
+    else:
+        print(f"Redis not reachable at {args.redis_url} - measuring SQLite only")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for backend, target in targets:
+            store = open_store(backend, target)
+            try:
+                results[backend] = measure(store, args.batch, args.rounds, args.singles)
+            finally:
+                store.close()
+            results[backend].update(measure_claims(backend, target, args.workers, args.claims))
+            _cleanup(backend, target)
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+
+    columns = list(next(iter(results.values())))
+    print(f"batch {args.batch} | {args.workers} claim workers x {args.claims} keys")
+    print(f"{'':<24}" + "".join(f"{backend:>12}" for backend in results))
+    for column in columns:
+        print(f"{column:<24}" + "".join(f"{str(result[column]):>12}" for result in results.values()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"batch": args.batch, "workers": args.workers, "results": results}, f, indent=2)
+
+    return 0 if all(result["exactly_once"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
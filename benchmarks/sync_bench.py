@@ -0,0 +1,212 @@
+"""
+End-to-end sync benchmark at fleet scale
+
+Runs sync_in_transit against the local Turvo stand-in (benchmarks/fake_turvo.py)
+and a local Redis for each fleet size, each in a fresh process so peak RSS and
+module config are per run. Reports wall time, Turvo requests, Redis round
+trips, peak RSS and calls produced.
+
+    python -m benchmarks.sync_bench                                   # 100, 1k, 10k, 50k
+    python -m benchmarks.sync_bench --sizes 100,1000 --latency-ms 80 --latency-p99-ms 400
+    python -m benchmarks.sync_bench --workers 4 --json results/sync.json
+    python -m benchmarks.sync_bench --redis-url ""                    # without Redis
+
+Only keys under the app's Redis prefix are cleared before each run, but point
+--redis-url at a scratch database all the same.
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+import requests
+
+RESULT_MARKER = "BENCH_RESULT "
+
+
+def _clear_app_keys(redis_client, prefix: str):
+    """Delete the app's keys so dedup doesn't suppress calls from an earlier run"""
+    keys = list(redis_client.scan_iter(match=f"{prefix}:*", count=1000))
+    for i in range(0, len(keys), 1000):
+        redis_client.delete(*keys[i:i + 1000])
+
+
+def _redis_commands(redis_client) -> int:
+    """Commands processed by the Redis server (INFO commandstats)"""
+    stats = redis_client.info("commandstats")
+    return sum(entry["calls"] for entry in stats.values())
+
+
+def run_child() -> int:
+    """Run one sync with the config the parent put in the environment and print the result"""
+    from handlers import clients, in_transit, tenants, turvo_client
+
+    redis_client = clients.redis_client()
+    if redis_client:
+        _clear_app_keys(redis_client, tenants.current().key_prefix)
+        commands_before = _redis_commands(redis_client)
+
+    requests_before = turvo_client.requests_made
+
+    started = time.perf_counter()
+    result = in_transit.sync_in_transit()
+    wall = time.perf_counter() - started
+
+    in_transit.shutdown_detail_pool()
+
+    # ru_maxrss is in KB on Linux; RUSAGE_CHILDREN covers detail pool workers
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers_rss_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    report = {
+        "success": result.get("success"),
+        "error": result.get("error"),
+        "wall_seconds": round(wall, 3),
+        "shipments_total": result.get("shipments_total"),
+        "shipments_processed": result.get("shipments_processed"),
+        "turvo_requests": turvo_client.requests_made - requests_before,
+        "redis_roundtrips": result.get("redis_roundtrips", 0),
+        # Minus the INFO call that took the reading
+        "redis_commands": _redis_commands(redis_client) - commands_before - 1 if redis_client else 0,
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1),
+        "pool_worker_peak_rss_mb": round(workers_rss_kb / 1024, 1),
+        "calls": result.get("total_calls"),
+        "final_calls": result.get("final_calls"),
+        "checkin_calls": result.get("checkin_calls"),
+        "budget_exhausted": result.get("budget_exhausted"),
+        "stage_timings": result.get("stage_timings"),
+        "errors": len(result.get("errors") or []),
+    }
+    print(RESULT_MARKER + json.dumps(report))
+    return 0 if result.get("success") else 1
+
+
+def _start_fake_turvo(args, size: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "benchmarks.fake_turvo",
+        "--port", str(args.port),
+        "--fleet-size", str(size),
+        "--seed", str(args.seed),
+        "--latency-ms", str(args.latency_ms),
+        "--latency-p99-ms", str(args.latency_p99_ms or args.latency_ms),
+    ]
+    server = subprocess.Popen(command)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{args.port}/_stats", timeout=1)
+            return server
+        except requests.RequestException:
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("Turvo stand-in did not start")
+
+
+def run_size(args, size: int) -> Optional[Dict[str, Any]]:
+    """
+    Benchmark one fleet size
+
+    Returns:
+        dict: Child report plus what the stand-in served, or None if the run
+              failed (the child exited non-zero or its sync did not succeed)
+    """
+    base = f"http://127.0.0.1:{args.port}"
+    server = _start_fake_turvo(args, size)
+    try:
+        env = {
+            **os.environ,
+            "TURVO_BASE_URL": f"{base}/v1",
+            "TURVO_API_KEY": "bench",
+            "TURVO_USERNAME": "bench",
+            "TURVO_PASSWORD": "bench",
+            "MOTUS_IN_TRANSIT_WEBHOOK_URL": f"{base}/hooks/bench",
+            "SYNC_TIME_BUDGET_SECONDS": str(args.budget),
+            "DETAIL_POOL_WORKERS": str(args.workers),
+            "TURVO_MAX_LIST_PAGES": str(math.ceil(size / 100) + 1),
+            "REDIS_URL": args.redis_url,
+            # Never a state file: a token or dedup keys left by an earlier run would skew this one
+            "STATE_BACKEND": "redis" if args.redis_url else "none",
+        }
+        if not args.redis_url:
+            env.pop("REDIS_URL")
+
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.sync_bench", "--child"],
+            env=env, capture_output=True, text=True
+        )
+        lines = [line for line in child.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+        report = json.loads(lines[-1][len(RESULT_MARKER):]) if lines else None
+        if child.returncode != 0 or not report or not report.get("success"):
+            print(child.stdout[-2000:])
+            print(child.stderr[-2000:], file=sys.stderr)
+            error = report.get("error") if report else None
+            print(f"✗ Child exited with {child.returncode}: {error or 'no result reported'}", file=sys.stderr)
+            return None
+
+        served = requests.get(f"{base}/_stats", timeout=5).json()
+        report["fleet_size"] = size
+        report["served_turvo_requests"] = served["turvo_requests"]
+        report["webhook_shipments"] = served["webhook_shipments"]
+        return report
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000,50000", help="Comma-separated fleet sizes")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Median Turvo latency")
+    parser.add_argument("--latency-p99-ms", type=float, default=0, help="p99 latency (default: same as median)")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--workers", type=int, default=0, help="DETAIL_POOL_WORKERS for the run")
+    parser.add_argument("--budget", type=float, default=0, help="SYNC_TIME_BUDGET_SECONDS (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0, help="Fleet seed")
+    parser.add_argument("--port", type=int, default=8100, help="Port for the Turvo stand-in")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    print(f"Sizes: {sizes} | latency {args.latency_ms:g}ms (p99 {args.latency_p99_ms or args.latency_ms:g}ms) | "
+          f"workers {args.workers} | Redis: {args.redis_url or 'none'}")
+
+    results: List[Dict[str, Any]] = []
+    failed = False
+    for size in sizes:
+        report = run_size(args, size)
+        if report is None:
+            print(f"✗ Fleet size {size} failed")
+            failed = True
+            continue
+        results.append(report)
+
+    print(f"{'fleet':>7} {'wall s':>8} {'turvo req':>10} {'req/s':>7} {'redis rt':>9} {'redis cmd':>10} {'RSS MB':>7} {'calls':>6}")
+    for r in results:
+        req_per_sec = r["turvo_requests"] / r["wall_seconds"] if r["wall_seconds"] else 0
+        print(f"{r['fleet_size']:>7} {r['wall_seconds']:>8.2f} {r['turvo_requests']:>10} {req_per_sec:>7.1f} "
+              f"{r['redis_roundtrips']:>9} {r['redis_commands']:>10} {r['peak_rss_mb']:>7} {r['calls']:>6}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "config": {key: value for key, value in vars(args).items() if key not in ("child", "json")},
+                "results": results
+            }, f, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
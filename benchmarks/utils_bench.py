@@ -0,0 +1,219 @@
+"""
+Microbenchmarks for the turvo_utils functions every shipment goes through
+
+For each function, over a realistic corpus and a pathological one (hundreds of
+stops, dozens of carrier orders, long driver names, users with many phones),
+reports:
+    ns_per_op        best-of-N CPU time per call
+    peak_b_per_op    mean tracemalloc high-water per call (transient allocations)
+    blocks_per_op    allocated blocks still held per call (allocations kept in the result)
+
+Documents are projected to the lean snapshot first, like decode_shipment_details
+does in production (--full keeps whole documents).
+
+Usage:
+    python -m benchmarks.utils_bench
+    python -m benchmarks.utils_bench --json utils.json
+    python -m benchmarks.utils_bench --baseline utils.json --threshold 15   # exit 1 on regressions
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Tuple
+
+from handlers import turvo_client, turvo_utils
+from benchmarks import fleet
+
+# (label, function, list of argument tuples)
+Case = Tuple[str, Callable, List[tuple]]
+
+
+def _documents(count: int, pathological: bool, full: bool) -> List[Dict[str, Any]]:
+    if pathological:
+        docs = [fleet.make_shipment(i, stops=250, carrier_orders=40, drivers=12) for i in range(1, count + 1)]
+        # Only the oldest carrier order has a driver phone, so extract_driver_info walks all of them
+        for doc in docs:
+            for index, carrier_order in enumerate(doc["carrierOrder"]):
+                carrier_order["deleted"] = False
+                for driver in carrier_order["drivers"] if index else ():
+                    driver["context"]["phones"] = []
+    else:
+        docs = fleet.make_fleet(count)
+    return docs if full else [turvo_client.project_shipment(doc) for doc in docs]
+
+
+def _timestamps(docs: List[Dict[str, Any]], pathological: bool) -> List[str]:
+    stamps = []
+    for doc in docs:
+        for stop in doc["globalRoute"]:
+            stamps.append(stop["appointment"]["date"])
+            if stop.get("etaToStop"):
+                stamps.append(stop["etaToStop"]["etaValue"])
+    if pathological:
+        stamps += ["2026-01-12T19:59:00.123456+05:30", "2026-01-12 19:59", "", "not a timestamp", "2026-13-45T99:99:99Z"]
+    return stamps
+
+
+def _driver_names(pathological: bool) -> List[str]:
+    names = fleet.FIRST_NAMES + ["O'Brien-Smith Jr.", "  josé  ", "DRIVER 2 (TEAM)"]
+    if pathological:
+        names += ["A" * 5000, "1234567890 " * 200 + "Bob", "!@#$%^&*() " * 300, "Ünïcødé Ñame"]
+    return names
+
+
+def _users(pathological: bool) -> List[Dict[str, Any]]:
+    users = [fleet.make_user(201280 + i) for i in range(5)]
+    if pathological:
+        user = fleet.make_user(201280)
+        # Team line at the very end of a long, mostly deleted list
+        user["phone"] = [{"number": f"80055501{i:02d}", "isPrimary": False, "deleted": True,
+                          "type": {"key": "1300", "value": "Work"}} for i in range(500)] + user["phone"]
+        users += [user, {"id": 1, "name": "   ", "phone": []}]
+    return users
+
+
+def build_cases(count: int, pathological: bool, full: bool) -> List[Case]:
+    """Inputs for each benchmarked function"""
+    docs = _documents(count, pathological, full)
+    owner = turvo_utils.extract_owner_contact_info(fleet.make_user(201281))
+    stamps = _timestamps(docs, pathological)
+    datetimes = [dt for dt in map(turvo_utils.parse_iso_timestamp, stamps) if dt]
+    states = [None, "CA", "TX", "ny", "ZZ"] + fleet.STATES
+
+    return [
+        ("transform_shipment_for_webhook", turvo_utils.transform_shipment_for_webhook,
+         [(doc, owner) for doc in docs]),
+        ("parse_iso_timestamp", turvo_utils.parse_iso_timestamp, [(s,) for s in stamps]),
+        ("format_datetime_with_timezone", turvo_utils.format_datetime_with_timezone,
+         [(dt, states[i % len(states)]) for i, dt in enumerate(datetimes)]),
+        ("clean_driver_name", turvo_utils.clean_driver_name, [(n,) for n in _driver_names(pathological)]),
+        ("extract_driver_info", turvo_utils.extract_driver_info, [(doc,) for doc in docs]),
+        ("extract_owner_contact_info", turvo_utils.extract_owner_contact_info, [(u,) for u in _users(pathological)]),
+    ]
+
+
+def measure(func: Callable, inputs: List[tuple], min_seconds: float, repeat: int) -> Dict[str, float]:
+    """
+    Measure one function over its inputs
+
+    Returns:
+        dict: ns_per_op, peak_b_per_op, blocks_per_op
+    """
+    # Loop the inputs enough times that one pass takes at least min_seconds
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            for args in inputs:
+                func(*args)
+        if time.perf_counter() - start >= min_seconds:
+            break
+        loops *= 2
+
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.process_time()
+        for _ in range(loops):
+            for args in inputs:
+                func(*args)
+        best = min(best, time.process_time() - start)
+    ns_per_op = best / (loops * len(inputs)) * 1e9
+
+    # Transient allocations: high-water mark of each call above what was live before it
+    gc.collect()
+    tracemalloc.start()
+    peak_total = 0
+    for args in inputs:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - before
+    tracemalloc.stop()
+
+    # Allocations the results keep alive
+    gc.collect()
+    gc.disable()
+    blocks_before = sys.getallocatedblocks()
+    kept = [func(*args) for args in inputs]
+    blocks_kept = sys.getallocatedblocks() - blocks_before
+    gc.enable()
+    del kept
+
+    return {
+        "ns_per_op": round(ns_per_op, 1),
+        "peak_b_per_op": round(peak_total / len(inputs), 1),
+        # The list holding the results is one block plus its growth - negligible against the inputs
+        "blocks_per_op": round(max(blocks_kept, 0) / len(inputs), 2),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """
+    Find functions whose ns/op grew by more than threshold percent
+
+    Returns:
+        list: Regression descriptions
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or not before["ns_per_op"]:
+            continue
+        change = (result["ns_per_op"] / before["ns_per_op"] - 1) * 100
+        result["ns_change_pct"] = round(change, 1)
+        if change > threshold:
+            regressions.append(f"{name}: {before['ns_per_op']} -> {result['ns_per_op']} ns/op (+{change:.0f}%)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200, help="Realistic documents in the corpus")
+    parser.add_argument("--pathological-count", type=int, default=10, help="Pathological documents")
+    parser.add_argument("--full", action="store_true", help="Benchmark on full documents instead of lean snapshots")
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Minimum time per measured pass")
+    parser.add_argument("--repeat", type=int, default=5, help="Measured passes (best is reported)")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="ns/op regression threshold in percent")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    print(f"{datetime.now(timezone.utc).isoformat()} | docs: {'full' if args.full else 'lean'} | "
+          f"{args.count} realistic + {args.pathological_count} pathological")
+
+    results: Dict[str, Dict[str, float]] = {}
+    for corpus, count, pathological in (("realistic", args.count, False),
+                                        ("pathological", args.pathological_count, True)):
+        for label, func, inputs in build_cases(count, pathological, args.full):
+            results[f"{label}[{corpus}]"] = {"inputs": len(inputs), **measure(func, inputs, args.min_seconds, args.repeat)}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+
+    print(f"{'function':<46} {'inputs':>7} {'ns/op':>11} {'peak B/op':>10} {'blocks/op':>10} {'vs base':>8}")
+    for name, r in results.items():
+        change = f"{r['ns_change_pct']:+.1f}%" if "ns_change_pct" in r else ""
+        print(f"{name:<46} {r['inputs']:>7} {r['ns_per_op']:>11.1f} {r['peak_b_per_op']:>10.1f} "
+              f"{r['blocks_per_op']:>10.2f} {change:>8}")
+
+    for regression in regressions:
+        print(f"✗ Regression: {regression}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"full_documents": args.full, "results": results}, f, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Webhook body size and latency per encoding
+
+Builds batch payloads the way sync_in_transit does (synthetic fleet, owner
+contacts from the user documents) and, for every format / compression pair,
+reports:
+    KB              body size
+    ratio           body size / standard body size
+    encode_ms       best-of-N time to serialize (and compress) the batch
+    post_ms         median time of POSTing it to the Turvo stand-in's webhook
+                    receiver (which decompresses and parses it)
+    upload_ms       time to transfer the body at --uplink-mbps (modelled -
+                    loopback hides what a slow uplink costs)
+
+Compact batches are also expanded again and checked against the standard
+payload (null values aside).
+
+Usage:
+    python -m benchmarks.webhook_bench
+    python -m benchmarks.webhook_bench --sizes 50,500 --uplink-mbps 20 --json webhook.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+import requests
+
+from handlers import in_transit, turvo_client, turvo_utils, webhook_encoding
+from benchmarks import fleet
+
+ENCODINGS = [
+    ("standard", "none"),
+    ("standard", "gzip"),
+    ("standard", "zstd"),
+    ("compact", "none"),
+    ("compact", "gzip"),
+    ("compact", "zstd"),
+]
+
+
+def build_batch(size: int, seed: int) -> Dict[str, Any]:
+    """A batch of size calls, like build_batch_payload produces at peak"""
+    calls = []
+    for i, document in enumerate(fleet.make_fleet(size, seed=seed)):
+        shipment = turvo_client.project_shipment(document)
+        owner_id = turvo_utils.extract_owner_id(shipment)
+        owner = turvo_utils.extract_owner_contact_info(fleet.make_user(owner_id)) if owner_id else None
+        payload = turvo_utils.transform_shipment_for_webhook(shipment, owner)
+        if payload is None:
+            continue
+        call_type = "final" if i % 3 == 0 else "checkin"
+        payload["call_type"] = call_type
+        calls.append({"payload": payload, "call_type": call_type,
+                      "shipment_id": shipment["id"], "load_number": shipment.get("customId")})
+    return in_transit.build_batch_payload(calls, "BUSINESS")
+
+
+def _without_nulls(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _without_nulls(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_without_nulls(v) for v in value]
+    return value
+
+
+def check_round_trip(batch: Dict[str, Any]) -> bool:
+    """compact -> JSON -> expand gives back the standard batch (nulls aside)"""
+    expanded = webhook_encoding.expand(json.loads(webhook_encoding._dumps(webhook_encoding.compact(batch))))
+    return _without_nulls(expanded) == _without_nulls(batch)
+
+
+def measure(batch: Dict[str, Any], fmt: str, compression: str, repeat: int,
+            hook_url: Optional[str], posts: int) -> Dict[str, Any]:
+    encode_ms = []
+    for _ in range(repeat):
+        body, headers, info = webhook_encoding.encode(batch, fmt, compression)
+        encode_ms.append(info["encode_ms"])
+
+    post_ms = []
+    if hook_url:
+        session = requests.Session()
+        for _ in range(posts):
+            started = time.perf_counter()
+            session.post(hook_url, data=body, headers=headers, timeout=30).raise_for_status()
+            post_ms.append((time.perf_counter() - started) * 1000)
+        session.close()
+
+    return {
+        "encoding": info["encoding"],
+        "kb": round(info["bytes"] / 1024, 1),
+        "ratio": round(info["bytes"] / info["standard_bytes"], 3),
+        "encode_ms": min(encode_ms),
+        "post_ms": round(statistics.median(post_ms), 2) if post_ms else None,
+    }
+
+
+def _start_receiver(port: int) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_turvo", "--port", str(port), "--fleet-size", "1"])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/_stats", timeout=1)
+            return server
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Turvo stand-in did not start")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="50,300,1000", help="Calls per batch (comma-separated)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="Encode passes (best is reported)")
+    parser.add_argument("--posts", type=int, default=5, help="POSTs per encoding (median is reported)")
+    parser.add_argument("--port", type=int, default=8101, help="Port for the webhook receiver (0 = don't POST)")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="Uplink for the modelled upload time")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if webhook_encoding.orjson else 'no'} | "
+          f"zstandard: {'yes' if webhook_encoding.zstandard else 'no (zstd falls back to gzip)'}")
+
+    server = _start_receiver(args.port) if args.port else None
+    hook_url = f"http://127.0.0.1:{args.port}/hooks/bench" if server else None
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    failed = 0
+
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            batch = build_batch(size, args.seed)
+            round_trip = check_round_trip(batch)
+            failed += not round_trip
+            print(f"\n{len(batch['shipments'])} calls | compact round trip: {'ok' if round_trip else 'MISMATCH'}")
+            print(f"{'encoding':<18} {'KB':>8} {'ratio':>6} {'encode_ms':>10} {'post_ms':>8} {'upload_ms':>10}")
+
+            rows = []
+            for fmt, compression in ENCODINGS:
+                if compression == "zstd" and webhook_encoding.zstandard is None:
+                    continue
+                row = measure(batch, fmt, compression, args.repeat, hook_url, args.posts)
+                row["upload_ms"] = round(row["kb"] * 1024 * 8 / (args.uplink_mbps * 1e6) * 1000, 1)
+                rows.append(row)
+                post = f"{row['post_ms']:>8.1f}" if row["post_ms"] is not None else f"{'-':>8}"
+                print(f"{row['encoding']:<18} {row['kb']:>8.1f} {row['ratio']:>6.2f} {row['encode_ms']:>10.2f} {post} {row['upload_ms']:>10.1f}")
+            results[str(size)] = rows
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"uplink_mbps": args.uplink_mbps, "results": results}, f, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
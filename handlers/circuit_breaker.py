@@ -0,0 +1,134 @@
+"""
+Circuit breakers for Turvo and the HappyRobot webhook
+
+One breaker per upstream and Turvo endpoint family ("turvo /shipments/{id}",
+"turvo /shipments/list", "turvo /users/{id}", "turvo /oauth/token",
+"webhook"), per tenant. After BREAKER_FAILURE_THRESHOLD consecutive failures
+(connection errors, timeouts, 5xx) a breaker opens and calls fail at once
+with CircuitOpen instead of each waiting out its timeout. After
+BREAKER_OPEN_SECONDS it lets a single probe through (half-open): success
+closes it, failure opens it for another BREAKER_OPEN_SECONDS. A probe whose
+caller never reports back (it raised something unexpected) is given up on
+after BREAKER_OPEN_SECONDS, and the next call becomes the probe.
+
+State is per worker process - a run happens in one worker, and a worker
+that has never seen the failures simply starts closed.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+import requests
+
+from . import tenants
+
+# Configuration
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    def __init__(self, name: str, tenant_id: str):
+        self.name = name
+        self.tenant_id = tenant_id
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None  # epoch seconds (for reporting)
+        self._opened_monotonic = 0.0
+        self._probe_started: Optional[float] = None  # monotonic, while a half-open probe is out
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go out now (the half-open probe counts as one)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_monotonic >= BREAKER_OPEN_SECONDS:
+                self.state = HALF_OPEN
+                self._probe_started = None
+            if self.state == HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= BREAKER_OPEN_SECONDS
+            ):
+                self._probe_started = now
+                return True
+            return False
+
+    def check(self):
+        """Raise CircuitOpen unless a call may go out now"""
+        if not self.allow():
+            raise CircuitOpen(f"Circuit open: {self.name} (tenant {self.tenant_id})")
+
+    def record(self, ok: bool):
+        """Report the outcome of a call that allow() let through"""
+        with self._lock:
+            if ok:
+                if self.state != CLOSED:
+                    print(f"✓ Circuit closed: {self.name} | Tenant: {self.tenant_id}")
+                self.state = CLOSED
+                self.failures = 0
+                self._probe_started = None
+                return
+
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= BREAKER_FAILURE_THRESHOLD):
+                print(f"⚠ Circuit open: {self.name} | Tenant: {self.tenant_id} | {self.failures} consecutive failures | Retry in {BREAKER_OPEN_SECONDS:g}s")
+                self.state = OPEN
+                self.opened_at = time.time()
+                self._opened_monotonic = time.monotonic()
+                self._probe_started = None
+
+    def is_open(self) -> bool:
+        """Open and not yet due for a probe"""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_monotonic < BREAKER_OPEN_SECONDS
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "opened_at": self.opened_at if self.state != CLOSED else None,
+                "retry_at": self.opened_at + BREAKER_OPEN_SECONDS if self.state == OPEN else None
+            }
+
+
+def get(name: str) -> CircuitBreaker:
+    """
+    The current tenant's breaker for an upstream (created closed on first use)
+
+    Args:
+        name: Upstream, e.g. "webhook" or "turvo /shipments/{id}"
+
+    Returns:
+        CircuitBreaker
+    """
+    tenant = tenants.current()
+    breakers = tenant.local("circuit_breaker.breakers", dict)
+    breaker = breakers.get(name)
+    if breaker is None:
+        breaker = breakers.setdefault(name, CircuitBreaker(name, tenant.tenant_id))
+    return breaker
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """
+    State of the current tenant's breakers
+
+    Returns:
+        dict: name -> {"state", "consecutive_failures", "opened_at", "retry_at"}
+    """
+    breakers = tenants.current().local("circuit_breaker.breakers", dict)
+    return {name: breaker.snapshot() for name, breaker in sorted(breakers.items())}
@@ -0,0 +1,285 @@
+"""
+Shared clients, built on first use
+
+One Redis client - one connection pool - for the whole process, created the
+first time anything needs Redis rather than when a module is imported.
+Every module gets it from redis_client(); tests and benchmarks can install
+their own (or none) with use_redis(). Keys are namespaced per tenant by
+Tenant.key().
+
+state_store() is the token / dedup / owner contact store: Redis when
+REDIS_URL is set, otherwise the SQLite file at STATE_DB_PATH if that is set
+(STATE_BACKEND picks one explicitly).
+
+The redis package itself (~140 ms to import, it pulls in redis.asyncio) is
+loaded then too. Modules catch clients.RedisError / clients.WatchError, which
+resolve to the redis exceptions on first use.
+
+The pool is bounded (REDIS_MAX_CONNECTIONS; a thread waits for a free
+connection rather than opening more), commands time out after
+REDIS_COMMAND_TIMEOUT_SECONDS, and idle connections are health-checked
+before reuse. async_redis_client() is the same for code on the event loop,
+and batch() sends several commands in one round trip.
+
+The client counts its own round trips (metrics.count_redis): one per
+command, labelled with the command, and one "pipeline" per pipeline or
+batch sent - callers never count by hand. A client installed with
+use_redis() counts too if it was built from counting(its class).
+"""
+
+import os
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from . import metrics, settings
+
+if TYPE_CHECKING:
+    import redis
+    import redis.asyncio
+    from .state_store import StateStore
+
+_redis: Optional["redis.Redis"] = None
+_redis_ready = False
+# (event loop it was built for - None if installed with use_redis, client)
+_async_redis: Optional[Tuple[Optional[asyncio.AbstractEventLoop], Optional["redis.asyncio.Redis"]]] = None
+_state: Optional["StateStore"] = None
+_state_ready = False
+_lock = threading.Lock()
+_counting_classes: Dict[type, type] = {}
+
+
+def __getattr__(name: str):
+    # except clients.RedisError: is only evaluated when an exception is raised
+    if name in ("RedisError", "WatchError"):
+        import redis
+        return getattr(redis, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _pool_options() -> Dict[str, Any]:
+    config = settings.get()
+    return {
+        "max_connections": config.redis_max_connections,
+        "socket_timeout": config.redis_command_timeout,
+        "socket_connect_timeout": config.redis_connect_timeout,
+        "socket_keepalive": True,
+        "health_check_interval": config.redis_health_check_seconds,
+    }
+
+
+def counting(redis_class: type) -> type:
+    """
+    A subclass of redis_class (redis.Redis or a stand-in) that counts its round trips
+
+    Commands count under their name ("get", "mget", "eval", "watch", ...),
+    and a pipeline counts once as "pipeline" when it is sent.
+    """
+    counted = _counting_classes.get(redis_class)
+    if counted is not None:
+        return counted
+
+    import redis.client
+
+    class CountingPipeline(redis.client.Pipeline):
+        def immediate_execute_command(self, *args, **options):
+            # Commands sent at once on a pipeline: WATCH and reads while watching
+            metrics.count_redis(str(args[0]).lower())
+            return super().immediate_execute_command(*args, **options)
+
+        def execute(self, raise_on_error: bool = True):
+            if self.command_stack:
+                metrics.count_redis("pipeline")
+            return super().execute(raise_on_error)
+
+    class CountingRedis(redis_class):
+        def execute_command(self, *args, **options):
+            metrics.count_redis(str(args[0]).lower())
+            return super().execute_command(*args, **options)
+
+        def pipeline(self, transaction: bool = True, shard_hint: Any = None):
+            return CountingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+    CountingRedis.__name__ = CountingRedis.__qualname__ = f"Counting{redis_class.__name__}"
+    return _counting_classes.setdefault(redis_class, CountingRedis)
+
+
+def redis_client() -> Optional["redis.Redis"]:
+    """
+    The shared Redis client
+
+    Returns:
+        redis.Redis, or None when REDIS_URL is not set (in-process fallbacks are used)
+    """
+    global _redis, _redis_ready
+    if _redis_ready:
+        return _redis
+
+    with _lock:
+        if not _redis_ready:
+            url = settings.get().redis_url
+            if url:
+                import redis
+                # Blocking pool: past max_connections a thread waits (up to the command timeout) for one
+                pool = redis.BlockingConnectionPool.from_url(
+                    url, timeout=settings.get().redis_command_timeout, **_pool_options()
+                )
+                _redis = counting(redis.Redis)(connection_pool=pool)
+            else:
+                _redis = None
+            _redis_ready = True
+    return _redis
+
+
+def async_redis_client() -> Optional["redis.asyncio.Redis"]:
+    """
+    The shared asyncio Redis client, for code running on the event loop
+
+    Same URL, connection limit and timeouts as redis_client(). Built per
+    event loop (a pool can't be shared across loops).
+
+    Returns:
+        redis.asyncio.Redis, or None without Redis - or when use_redis()
+        installed a sync client only; callers then run the sync path in a thread
+    """
+    global _async_redis
+    loop = asyncio.get_running_loop()
+    if _async_redis is not None and _async_redis[0] in (None, loop):
+        return _async_redis[1]  # Installed with use_redis(), or already built for this loop
+
+    url = settings.get().redis_url
+    if not url:
+        return None
+    import redis.asyncio
+    # Not the asyncio BlockingConnectionPool: in redis-py 5.0 a failed connect
+    # there waits out the whole pool timeout instead of failing
+    client = redis.asyncio.Redis(connection_pool=redis.asyncio.ConnectionPool.from_url(url, **_pool_options()))
+    _async_redis = (loop, client)
+    return client
+
+
+def use_redis(client: Optional["redis.Redis"], async_client: Optional["redis.asyncio.Redis"] = None):
+    """Install a Redis client (or None for no Redis) in place of the configured one"""
+    global _redis, _redis_ready, _async_redis, _state_ready
+    with _lock:
+        _redis = client
+        _redis_ready = True
+        _async_redis = (None, async_client)  # Used on any loop
+        _state_ready = False  # Rebuilt for the new client
+
+
+class Batch:
+    """
+    Redis commands queued to go out in one round trip
+
+        with clients.batch() as batch:
+            batch.lrange(key, 0, 9)
+            batch.llen(key)
+        runs, total = batch.results
+
+    Commands are sent when the block exits (not at all if nothing was
+    queued or the block raised) - one "pipeline" round trip. Raises
+    RedisError like the commands themselves would.
+    """
+
+    def __init__(self, client: "redis.Redis", transaction: bool = False):
+        self._pipe = client.pipeline(transaction=transaction)
+        self.results: List[Any] = []
+
+    def __getattr__(self, name: str):
+        return getattr(self._pipe, name)
+
+    def __len__(self) -> int:
+        return len(self._pipe)
+
+    def __enter__(self) -> "Batch":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is None and len(self._pipe):
+                self.results = self._pipe.execute()
+        finally:
+            self._pipe.reset()
+
+
+def batch(transaction: bool = False, client: Optional["redis.Redis"] = None) -> Batch:
+    """
+    Queue commands on the shared client (or client) for one round trip
+
+    Args:
+        transaction: Wrap them in MULTI/EXEC (all or nothing)
+        client: Redis client to use instead of redis_client()
+    """
+    return Batch(client or redis_client(), transaction)
+
+
+def state_store() -> Optional["StateStore"]:
+    """
+    The shared state store (token cache, call dedup, owner contacts)
+
+    Returns:
+        StateStore, or None for STATE_BACKEND=none (per-process state only)
+
+    Raises:
+        ValueError: Unknown STATE_BACKEND, "redis" without REDIS_URL or
+                    "sqlite" without STATE_DB_PATH
+    """
+    global _state, _state_ready
+    if _state_ready:
+        return _state
+
+    from . import state_store as stores
+
+    config = settings.get()
+    backend = config.state_backend
+    if backend == "auto":
+        backend = "redis" if redis_client() else "sqlite" if config.state_db_path else "none"
+    if backend not in ("redis", "sqlite", "none"):
+        raise ValueError(f"STATE_BACKEND must be auto, redis, sqlite or none, got {backend!r}")
+    if backend == "redis" and not redis_client():
+        raise ValueError("STATE_BACKEND=redis needs REDIS_URL")
+    if backend == "sqlite" and not config.state_db_path:
+        raise ValueError("STATE_BACKEND=sqlite needs STATE_DB_PATH")
+
+    with _lock:
+        if not _state_ready:
+            if backend == "redis":
+                _state = stores.RedisStateStore(_redis)
+            elif backend == "sqlite":
+                path = os.path.abspath(config.state_db_path)
+                _state = stores.SQLiteStateStore(path)
+                print(f"✓ State store: SQLite {path} (calls are deduplicated without Redis)")
+            else:
+                _state = None
+                print("⚠ No state store (set REDIS_URL or STATE_DB_PATH) - call dedup and the token cache are per process")
+            _state_ready = True
+    return _state
+
+
+def use_state_store(store: Optional["StateStore"]):
+    """Install a state store (or None) in place of the configured one"""
+    global _state, _state_ready
+    with _lock:
+        _state = store
+        _state_ready = True
+
+
+async def aclose():
+    """Disconnect the asyncio Redis pool (server shutdown, on its event loop)"""
+    global _async_redis
+    if _async_redis is not None and _async_redis[0] is not None:
+        await _async_redis[1].aclose()
+    _async_redis = None
+
+
+def close():
+    """Disconnect the shared Redis pool and close the state store (server shutdown)"""
+    global _redis, _redis_ready, _state, _state_ready
+    with _lock:
+        if _state is not None:
+            _state.close()
+        if _redis is not None:
+            _redis.close()
+        _redis = _state = None
+        _redis_ready = _state_ready = False
@@ -0,0 +1,273 @@
+"""
+Per-shipment ETA history and trend-based late prediction
+
+is_driver_late only compares the current GPS ETA with the appointment, so a
+load whose ETA slips a few minutes every hour is flagged once it is already
+30+ minutes late. Every run (and every shipment event) appends the GPS ETA
+it saw to the shipment's history; a least-squares slope over the recent
+observations projects where the ETA is heading, and a load projected to
+arrive more than LATE_THRESHOLD_MINUTES after its appointment counts as
+late for overnight check-ins.
+
+A history is packed binary - (observed_at, eta) as two little-endian uint32
+epoch seconds, 8 bytes per observation, oldest first, capped at
+ETA_HISTORY_SIZE - stored as one Redis string per shipment
+(`{prefix}:eta_history:{id}`, in the tenant's namespace, expiring after
+REDIS_TTL_DAYS). A run reads the histories of everything it classifies
+with one MGET and writes them back with one pipeline of per-key Lua merges:
+each key merges in whatever shipment events appended meanwhile on the
+server, atomically and independently, so neither side's observations are
+lost and a busy shipment can't hold up the others.
+"""
+
+import os
+import time
+import struct
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import clients, settings, tenants, turvo_utils
+
+# Configuration
+ETA_HISTORY_SIZE = int(os.getenv("ETA_HISTORY_SIZE", "48"))  # Observations kept per shipment
+ETA_TREND_WINDOW_HOURS = float(os.getenv("ETA_TREND_WINDOW_HOURS", "3"))  # Observations the slope is fitted to
+
+MIN_POINTS = 3                 # Fewer observations in the window - no projection
+MIN_SPAN_SECONDS = 15 * 60     # Observations closer together than this - no projection
+MERGE_SECONDS = 60             # A newer observation within this replaces the last one
+MAX_SLOPE = 0.9                # ETA slipping this fast (54 min/h) is treated as 54 min/h
+
+_OBSERVATION = struct.Struct("<II")
+_local_lock = threading.Lock()
+
+# merge() on the server: KEYS[1] = history key, ARGV = (our history,
+# MERGE_SECONDS, ETA_HISTORY_SIZE, TTL seconds). Observations are two
+# little-endian uint32, decoded by hand (no struct library needed).
+_MERGE_SCRIPT = """
+local function read(history, into)
+    for i = 1, #history - 7, 8 do
+        local a, b, c, d, e, f, g, h = string.byte(history, i, i + 7)
+        into[#into + 1] = {a + b * 256 + c * 65536 + d * 16777216, e + f * 256 + g * 65536 + h * 16777216,
+                           string.sub(history, i, i + 7)}
+    end
+end
+
+local stored = redis.call('GET', KEYS[1]) or ''
+local ours = ARGV[1]
+local merged = ours
+if stored ~= '' and stored ~= ours then
+    local points = {}
+    read(stored, points)
+    read(ours, points)
+    table.sort(points, function(x, y) return x[1] < y[1] or (x[1] == y[1] and x[2] < y[2]) end)
+
+    local kept = {}
+    local merge_seconds = tonumber(ARGV[2])
+    for _, point in ipairs(points) do
+        local last = kept[#kept]
+        if last and last[1] == point[1] and last[2] == point[2] then
+            -- the same observation in both versions
+        elseif last and point[1] - last[1] < merge_seconds then
+            kept[#kept] = point
+        else
+            kept[#kept + 1] = point
+        end
+    end
+
+    local parts = {}
+    for i = math.max(1, #kept - tonumber(ARGV[3]) + 1), #kept do
+        parts[#parts + 1] = kept[i][3]
+    end
+    merged = table.concat(parts)
+end
+redis.call('SET', KEYS[1], merged, 'EX', ARGV[4])
+return #merged
+"""
+_MERGE_SHA = hashlib.sha1(_MERGE_SCRIPT.encode()).hexdigest()
+
+
+def _history_key(shipment_id: int) -> str:
+    return tenants.current().key("eta_history", shipment_id)
+
+
+def _local_histories() -> Dict[int, bytes]:
+    return tenants.current().local("eta_history.histories", dict)
+
+
+def observations(history: bytes) -> List[Tuple[int, int]]:
+    """Unpack a history into (observed_at, eta) epoch pairs, oldest first"""
+    return list(_OBSERVATION.iter_unpack(history))
+
+
+def append(history: bytes, observed_at: float, eta_iso: Optional[str]) -> bytes:
+    """
+    Add one ETA observation to a packed history
+
+    Args:
+        history: Packed history (b"" for none)
+        observed_at: Epoch seconds of the observation
+        eta_iso: GPS ETA seen at that time
+
+    Returns:
+        bytes: New packed history (unchanged if the ETA can't be parsed)
+    """
+    eta_dt = turvo_utils.parse_iso_timestamp(eta_iso) if eta_iso else None
+    if not eta_dt:
+        return history
+    return _add(history, int(observed_at), int(eta_dt.timestamp()))
+
+
+def _add(history: bytes, observed_at: int, eta: int) -> bytes:
+    size = _OBSERVATION.size
+    if len(history) >= size:
+        last_observed_at, _ = _OBSERVATION.unpack_from(history, len(history) - size)
+        if observed_at - last_observed_at < MERGE_SECONDS:
+            history = history[:-size]
+
+    history += _OBSERVATION.pack(observed_at, eta)
+    return history[-ETA_HISTORY_SIZE * size:]
+
+
+def merge(stored: bytes, ours: bytes) -> bytes:
+    """
+    Combine two versions of a history (the stored one and one updated from an older read)
+
+    Returns:
+        bytes: Every observation of either, oldest first, merged and capped as append() does
+    """
+    if not stored or stored == ours:
+        return ours
+    history = b""
+    for observed_at, eta in sorted(set(observations(stored)) | set(observations(ours))):
+        history = _add(history, observed_at, eta)
+    return history
+
+
+def slope(history: bytes, now: float) -> Optional[float]:
+    """
+    How fast the ETA is moving: seconds of ETA change per second (0.1 = 6 min/h later)
+
+    Least-squares fit over the observations of the last ETA_TREND_WINDOW_HOURS.
+
+    Returns:
+        float or None if there are too few observations or they are too close together
+    """
+    recent = [(t, eta) for t, eta in observations(history) if now - t <= ETA_TREND_WINDOW_HOURS * 3600]
+    if len(recent) < MIN_POINTS or recent[-1][0] - recent[0][0] < MIN_SPAN_SECONDS:
+        return None
+
+    mean_t = sum(t for t, _ in recent) / len(recent)
+    mean_eta = sum(eta for _, eta in recent) / len(recent)
+    covariance = sum((t - mean_t) * (eta - mean_eta) for t, eta in recent)
+    variance = sum((t - mean_t) ** 2 for t, _ in recent)
+    return covariance / variance if variance else None
+
+
+def projected_minutes_late(history: bytes, appointment_iso: Optional[str], now: float) -> Optional[float]:
+    """
+    Minutes after the appointment the driver will arrive if the ETA keeps drifting
+
+    With the ETA moving s seconds per second, the driver arrives when the
+    clock catches up with it: now + (eta - now) / (1 - s).
+
+    Args:
+        history: Packed history (including the current observation)
+        appointment_iso: Delivery stop appointment
+        now: Current epoch seconds
+
+    Returns:
+        float: Projected minutes late (negative = early), or None when the
+               ETA isn't drifting later or there is no usable trend
+    """
+    appointment_dt = turvo_utils.parse_iso_timestamp(appointment_iso) if appointment_iso else None
+    drift = slope(history, now)
+    if not appointment_dt or drift is None or drift <= 0:
+        return None
+
+    drift = min(drift, MAX_SLOPE)
+    last_observed_at, last_eta = _OBSERVATION.unpack_from(history, len(history) - _OBSERVATION.size)
+    eta_now = last_eta + drift * (now - last_observed_at)
+    arrival = now + (eta_now - now) / (1 - drift) if eta_now > now else eta_now
+
+    return round((arrival - appointment_dt.timestamp()) / 60, 1)
+
+
+def load(shipment_ids: Iterable[int]) -> Dict[int, bytes]:
+    """
+    Histories of many shipments in one round trip
+
+    Args:
+        shipment_ids: Shipments to read
+
+    Returns:
+        dict: shipment_id -> packed history (shipments without one are left out)
+    """
+    redis_client = clients.redis_client()
+    shipment_ids = list(shipment_ids)
+    if not redis_client:
+        local = _local_histories()
+        return {sid: local[sid] for sid in shipment_ids if sid in local}
+    if not shipment_ids:
+        return {}
+
+    try:
+        raw_histories = redis_client.mget([_history_key(sid) for sid in shipment_ids])
+    except clients.RedisError as e:
+        print(f"⚠ Could not load ETA history: {e}")
+        return {}
+
+    return {sid: raw for sid, raw in zip(shipment_ids, raw_histories) if raw}
+
+
+def save(histories: Dict[int, bytes], expire_local: bool = False):
+    """
+    Store updated histories, merged with what was stored since they were loaded
+
+    One pipeline: the merge script is loaded, then run once per key, so
+    each key is merged atomically on its own.
+
+    Args:
+        histories: shipment_id -> packed history
+        expire_local: Without Redis, also drop histories older than
+                      REDIS_TTL_DAYS (once per sync run, like the key TTL)
+    """
+    redis_client = clients.redis_client()
+    if not redis_client:
+        local = _local_histories()
+        with _local_lock:
+            for shipment_id, history in histories.items():
+                local[shipment_id] = merge(local.get(shipment_id, b""), history)
+        if not expire_local:
+            return
+        cutoff = time.time() - settings.get().redis_ttl_days * 86400
+        size = _OBSERVATION.size
+        for shipment_id in [sid for sid, h in local.items() if _OBSERVATION.unpack_from(h, len(h) - size)[0] < cutoff]:
+            del local[shipment_id]
+        return
+    if not histories:
+        return
+
+    ttl = settings.get().redis_ttl_days * 86400
+    try:
+        with clients.batch() as pipe:
+            # Loaded in the same round trip (commands run in order), so a
+            # restarted Redis never answers NOSCRIPT
+            pipe.script_load(_MERGE_SCRIPT)
+            for shipment_id, history in histories.items():
+                pipe.evalsha(_MERGE_SHA, 1, _history_key(shipment_id), history, MERGE_SECONDS, ETA_HISTORY_SIZE, ttl)
+    except clients.RedisError as e:
+        print(f"⚠ Could not save ETA history: {e}")
+
+
+def record(shipment_id: int, observed_at: float, eta_iso: Optional[str]) -> bytes:
+    """
+    Append one observation to a single shipment's stored history (shipment events)
+
+    Returns:
+        bytes: The updated packed history
+    """
+    history = append(load([shipment_id]).get(shipment_id, b""), observed_at, eta_iso)
+    if history:
+        save({shipment_id: history})
+    return history
@@ -0,0 +1,391 @@
+"""
+Read-side index of current fleet state
+
+Each sync (and each shipment event) records how every shipment was
+classified: effective delivery time, window, late minutes, dedup state and
+why it was skipped. /fleet answers "what's about to be called and why"
+from memory, without touching Turvo.
+
+Writes are incremental: only entries whose classification changed are
+written to the Redis hash, and a version counter tells other workers to
+reload. Lookups use per-field inverted indexes (owner, window, state,
+reefer), so filtered queries stay in the millisecond range at tens of
+thousands of shipments. Each tenant has its own index.
+"""
+
+import json
+import time
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Iterable, Optional, Set, Tuple
+
+from . import clients, tenants, turvo_utils
+
+FILTER_FIELDS = ("owner", "window", "state", "reefer")
+
+
+class _Index:
+    """This worker's copy of one tenant's index"""
+
+    def __init__(self):
+        # shipment_id -> entry
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        # field -> value -> shipment ids
+        self.by: Dict[str, Dict[Any, Set[int]]] = {field: defaultdict(set) for field in FILTER_FIELDS}
+        self.version: Optional[int] = None
+        self.updated_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+
+def _index() -> _Index:
+    return tenants.current().local("fleet_index", _Index)
+
+
+def _index_key() -> str:
+    return tenants.current().key("fleet_index")
+
+
+def _meta_key() -> str:
+    return tenants.current().key("fleet_index", "meta")
+
+
+def _listed_owner(shipment: Dict[str, Any]) -> Tuple[Optional[int], Optional[str]]:
+    """Owner from the first active customer order (list entries and snapshots alike)"""
+    for customer_order in shipment.get("customerOrder", []):
+        if customer_order.get("deleted"):
+            continue
+        owner = customer_order.get("customer", {}).get("owner", {})
+        return owner.get("id"), owner.get("name")
+    return None, None
+
+
+def _listed_effective_at(shipment: Dict[str, Any]) -> Optional[float]:
+    """Later of ETA and appointment of the delivery stop in a list entry"""
+    delivery_stop = turvo_utils.find_delivery_stop(shipment.get("globalRoute", []))
+    if not delivery_stop:
+        return None
+    times = [
+        turvo_utils.parse_iso_timestamp(delivery_stop.get("etaToStop", {}).get("etaValue")),
+        turvo_utils.parse_iso_timestamp(delivery_stop.get("appointment", {}).get("date"))
+    ]
+    times = [t for t in times if t]
+    return max(times).timestamp() if times else None
+
+
+def make_entry(
+    shipment: Dict[str, Any],
+    state: str,
+    reason: Optional[str] = None,
+    eta: Optional[str] = None,
+    window: Optional[str] = None,
+    minutes_late: Optional[float] = None,
+    projected_minutes_late: Optional[float] = None,
+    checkin_called: Optional[bool] = None,
+    final_called: Optional[bool] = None,
+    reefer: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    owner_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the index entry for one shipment
+
+    Args:
+        shipment: List entry (or snapshot) - supplies ids, owner and, without eta, the delivery time
+        state: Classification: "calling", "called", "webhook_failed",
+               "outside_window" (also for loads the pre-filter skipped from
+               list data), "already_called", "overnight_on_time", "degraded",
+               "owner_filtered", "missing_data", "no_eta" or "error"
+        reason: Human-readable detail for skips and errors
+        eta: Effective delivery time (ISO) from the webhook payload
+        window: "checkin", "final" or None
+        minutes_late: Minutes the driver is behind the appointment
+        projected_minutes_late: Lateness projected from the ETA trend (see eta_history)
+        checkin_called: Check-in call already made
+        final_called: Final call already made
+        reefer: Refrigerated equipment (None if unknown)
+        owner_id: Owner user ID (defaults to the list entry's owner)
+        owner_name: Owner name (defaults to the list entry's owner)
+
+    Returns:
+        dict: Index entry
+    """
+    listed_owner_id, listed_owner_name = _listed_owner(shipment)
+    eta_dt = turvo_utils.parse_iso_timestamp(eta) if eta else None
+
+    return {
+        "shipment_id": shipment["id"],
+        "load_number": shipment.get("customId"),
+        "owner_id": owner_id or listed_owner_id,
+        "owner_name": owner_name or listed_owner_name,
+        "reefer": reefer,
+        "effective_at": eta_dt.timestamp() if eta_dt else _listed_effective_at(shipment),
+        "window": window,
+        "minutes_late": minutes_late,
+        "projected_minutes_late": projected_minutes_late,
+        "checkin_called": checkin_called,
+        "final_called": final_called,
+        "state": state,
+        "reason": reason
+    }
+
+
+def _filter_values(entry: Dict[str, Any]) -> Dict[str, list]:
+    owners = [str(entry["owner_id"])] if entry["owner_id"] else []
+    if entry["owner_name"]:
+        owners.append(entry["owner_name"].lower())
+    return {
+        "owner": owners,
+        "window": [entry["window"]],
+        "state": [entry["state"]],
+        "reefer": [entry["reefer"]]
+    }
+
+
+def _put(index: _Index, entry: Dict[str, Any]):
+    shipment_id = entry["shipment_id"]
+    _drop(index, shipment_id)
+    index.entries[shipment_id] = entry
+    for field, values in _filter_values(entry).items():
+        for value in values:
+            index.by[field][value].add(shipment_id)
+
+
+def _drop(index: _Index, shipment_id: int):
+    old = index.entries.pop(shipment_id, None)
+    if old is None:
+        return
+    for field, values in _filter_values(old).items():
+        for value in values:
+            ids = index.by[field].get(value)
+            if ids is not None:
+                ids.discard(shipment_id)
+                if not ids:
+                    del index.by[field][value]
+
+
+def _same(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> bool:
+    """Unchanged classification (changed_at aside)"""
+    return old is not None and all(old.get(k) == v for k, v in new.items() if k != "changed_at")
+
+
+def _write(index: _Index, changed: Dict[int, Dict[str, Any]], removed: Iterable[int]):
+    """Write changed entries and bump the version (one pipeline)"""
+    redis_client = clients.redis_client()
+    now = time.time()
+    index.updated_at = now
+    if not redis_client:
+        return
+
+    removed = list(removed)
+    try:
+        with clients.batch(transaction=True) as pipe:
+            if changed:
+                pipe.hset(_index_key(), mapping={str(sid): json.dumps(entry) for sid, entry in changed.items()})
+            if removed:
+                pipe.hdel(_index_key(), *[str(sid) for sid in removed])
+            pipe.hset(_meta_key(), "updated_at", now)
+            # Other workers reload only when something changed
+            if changed or removed:
+                pipe.hincrby(_meta_key(), "version", 1)
+        results = pipe.results
+        if changed or removed:
+            # Our copy already has these changes - no reload needed, unless
+            # another worker wrote since our last refresh (its changes aren't here)
+            if index.version is not None and results[-1] == index.version + 1:
+                index.version = results[-1]
+            else:
+                index.version = None
+    except clients.RedisError as e:
+        print(f"⚠ Could not write fleet index: {e}")
+
+
+def apply_sync(entries: Dict[int, Dict[str, Any]], listed_ids: Set[int], deferred_ids: Set[int]):
+    """
+    Apply a sync run's classifications
+
+    Shipments no longer listed (delivered, canceled) leave the index.
+    Deferred shipments keep their previous classification, marked "deferred".
+
+    Args:
+        entries: shipment_id -> make_entry result for everything classified this run
+        listed_ids: Every shipment the run listed
+        deferred_ids: Shipments the run didn't get to (time budget)
+    """
+    index = _index()
+    with index.lock:
+        _refresh(index)
+        now = time.time()
+        changed = {}
+
+        for shipment_id in deferred_ids:
+            old = index.entries.get(shipment_id)
+            if old and old["state"] != "deferred":
+                entries[shipment_id] = {**old, "state": "deferred", "reason": "Time budget exhausted"}
+
+        for shipment_id, entry in entries.items():
+            if _same(index.entries.get(shipment_id), entry):
+                continue
+            entry["changed_at"] = now
+            changed[shipment_id] = entry
+            _put(index, entry)
+
+        removed = [sid for sid in index.entries if sid not in listed_ids]
+        for shipment_id in removed:
+            _drop(index, shipment_id)
+
+        _write(index, changed, removed)
+        total = len(index.entries)
+
+    print(f"✓ Fleet index updated | {total} shipments | {len(changed)} changed | {len(removed)} removed")
+
+
+def update(entries: Dict[int, Optional[Dict[str, Any]]]):
+    """
+    Apply classifications made outside a sync run (shipment events)
+
+    Args:
+        entries: shipment_id -> entry, or None to remove the shipment
+    """
+    index = _index()
+    with index.lock:
+        _refresh(index)
+        now = time.time()
+        changed, removed = {}, []
+        for shipment_id, entry in entries.items():
+            if entry is None:
+                if shipment_id in index.entries:
+                    _drop(index, shipment_id)
+                    removed.append(shipment_id)
+                continue
+            if _same(index.entries.get(shipment_id), entry):
+                continue
+            entry["changed_at"] = now
+            changed[shipment_id] = entry
+            _put(index, entry)
+
+        if changed or removed:
+            _write(index, changed, removed)
+
+
+def _refresh(index: _Index):
+    """Reload from Redis if another worker changed the index (caller holds index.lock)"""
+    redis_client = clients.redis_client()
+    if not redis_client:
+        return
+
+    try:
+        meta = redis_client.hgetall(_meta_key())
+        index.updated_at = float(meta[b"updated_at"]) if b"updated_at" in meta else index.updated_at
+        version = int(meta.get(b"version", 0))
+        if version == index.version:
+            return
+
+        raw_entries = redis_client.hgetall(_index_key())
+    except clients.RedisError as e:
+        print(f"⚠ Could not refresh fleet index: {e}")
+        return
+
+    index.entries.clear()
+    for field in FILTER_FIELDS:
+        index.by[field].clear()
+    for raw in raw_entries.values():
+        _put(index, json.loads(raw))
+
+    index.version = version
+
+
+def _with_live_fields(entry: Dict[str, Any], now: float) -> Dict[str, Any]:
+    effective_at = entry["effective_at"]
+    return {
+        **entry,
+        "hours_until": round((effective_at - now) / 3600, 2) if effective_at else None
+    }
+
+
+def query(
+    owner: Optional[str] = None,
+    window: Optional[str] = None,
+    state: Optional[str] = None,
+    reefer: Optional[bool] = None,
+    limit: int = 100,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Filter the current tenant's index, soonest delivery first
+
+    Args:
+        owner: Owner ID or name (case-insensitive)
+        window: "checkin", "final" or "none"
+        state: Classification state (see make_entry)
+        reefer: Refrigerated equipment only / non-reefer only
+        limit: Shipments per page
+        offset: Shipments to skip
+
+    Returns:
+        dict: updated_at, total matches and the page of shipments with live hours_until
+    """
+    filters = {
+        "owner": owner.lower() if owner else None,
+        "window": (None if window == "none" else window) if window else "",
+        "state": state,
+        "reefer": reefer
+    }
+
+    index = _index()
+    with index.lock:
+        _refresh(index)
+
+        id_sets = [
+            index.by[field].get(value, set())
+            for field, value in filters.items()
+            if value is not None and value != ""
+        ]
+        if window == "none":
+            id_sets.append(index.by["window"].get(None, set()))
+
+        if id_sets:
+            id_sets.sort(key=len)
+            candidates = set(id_sets[0])
+            for ids in id_sets[1:]:
+                candidates &= ids
+        else:
+            candidates = index.entries.keys()
+
+        matches = [index.entries[sid] for sid in candidates]
+        updated_at = index.updated_at
+
+    matches.sort(key=lambda e: e["effective_at"] if e["effective_at"] is not None else float("inf"))
+    now = time.time()
+
+    return {
+        "updated_at": updated_at,
+        "total": len(matches),
+        "shipments": [_with_live_fields(entry, now) for entry in matches[offset:offset + limit]]
+    }
+
+
+def get(shipment_id: int) -> Optional[Dict[str, Any]]:
+    """Index entry for one shipment (with live hours_until), or None"""
+    index = _index()
+    with index.lock:
+        _refresh(index)
+        entry = index.entries.get(shipment_id)
+    return _with_live_fields(entry, time.time()) if entry else None
+
+
+def summary() -> Dict[str, Any]:
+    """
+    Shipment counts per state and window
+
+    Returns:
+        dict: updated_at, total, by_state, by_window
+    """
+    index = _index()
+    with index.lock:
+        _refresh(index)
+        return {
+            "updated_at": index.updated_at,
+            "total": len(index.entries),
+            "by_state": {state: len(ids) for state, ids in index.by["state"].items()},
+            "by_window": {str(window or "none"): len(ids) for window, ids in index.by["window"].items()}
+        }
@@ -7,33 +7,304 @@ for loads within 4 hours of delivery
 
 import os
 import json
-import redis
+import time
+import hashlib
 import requests
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, Any
-
+from typing import Dict, Any, Optional
+
+from . import circuit_breaker
+from . import clients
+from . import eta_history
+from . import fleet_index
+from . import metrics
+from . import run_journal
+from . import settings
+from . import state_store
+from . import shipment_events
+from . import sync_progress
+from . import tenants
 from . import turvo_client
 from . import turvo_utils
+from . import webhook_encoding
 
 # Configuration
-REDIS_URL = os.getenv("REDIS_URL")
-MOTUS_IN_TRANSIT_WEBHOOK_URL = os.getenv("MOTUS_IN_TRANSIT_WEBHOOK_URL")
-REDIS_TTL_DAYS = int(os.getenv("REDIS_TTL_DAYS", "2"))  # Default: 2 days
+# Webhook URL, call windows and owner filter are per tenant (see tenants.py):
+# window 1 is the check-in call (3-4 hours before delivery), window 2 the
+# final call (0-30 minutes before delivery). Redis and those tenant defaults
+# are read once into settings.get() (see settings.py).
+
+# Pre-detail filtering: slack (hours) around the call windows when judging
+# list-level ETA/appointment data, which can be slightly stale
+PREFILTER_MARGIN_HOURS = float(os.getenv("PREFILTER_MARGIN_HOURS", "1"))
+
+# Detail processing pool (optional - 0 decodes and transforms in the sync thread)
+DETAIL_POOL_WORKERS = int(os.getenv("DETAIL_POOL_WORKERS", "0"))
+
+# Payloads cached by shipment content hash (LRU, per process - 0 disables)
+PAYLOAD_CACHE_SIZE = int(os.getenv("PAYLOAD_CACHE_SIZE", "5000"))
+
+# Time budget per sync run (seconds, 0 = unlimited). Keep it under the cron interval
+# so a slow Turvo can't push final-window loads past their window.
+SYNC_TIME_BUDGET_SECONDS = float(os.getenv("SYNC_TIME_BUDGET_SECONDS", "240"))
+
+# Keep a per-shipment state snapshot for push updates from Turvo (/turvo/events).
+# Each sync then refreshes the snapshots of the shipments it fetched.
+TURVO_EVENTS_ENABLED = os.getenv("TURVO_EVENTS_ENABLED", "false").lower() == "true"
+
+# Degraded mode: snapshots of loads due within this many hours are kept so a
+# run can still place final calls while Turvo is unreachable (0 = off)
+DEGRADED_CACHE_HOURS = float(os.getenv("DEGRADED_CACHE_HOURS", "6"))
+
+# Owner contact details are cached per tenant (and shared through Redis) for this long
+OWNER_CONTACT_TTL_SECONDS = int(os.getenv("OWNER_CONTACT_TTL_SECONDS", "3600"))
+
+# A sync reuses the En Route list prefetched at startup (see warmup.py) if it is this fresh
+WARMUP_LIST_MAX_AGE_SECONDS = float(os.getenv("WARMUP_LIST_MAX_AGE_SECONDS", "300"))
+
+# Log a warning when one sync makes more Redis round trips than this (0 = never).
+# A run's Redis work is a fixed number of batched reads/writes, not one per shipment.
+SYNC_REDIS_ROUNDTRIP_WARN = int(os.getenv("SYNC_REDIS_ROUNDTRIP_WARN", "100"))
+
+# Statuses that never need a call (canceled, delivered, etc.)
+INVALID_STATUSES = [
+    "2107",  # Delivered
+    "2108",  # Ready for billing
+    "2113",  # Canceled
+    "2116",  # Route complete
+    "2119",  # Tender - rejected
+]
+
+# Worker processes for decoding/transforming shipment details (created on first use)
+_detail_pool: Optional[ProcessPoolExecutor] = None
+
+# content hash -> {"payload", "effective_eta", "gps_eta", "appointment"}
+# Lives in whichever process runs prepare_shipment (each pool worker has its own);
+# tenants' syncs share it from their own threads, hence the lock
+_payload_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_payload_cache_lock = threading.Lock()
+
+# Urgency hints are kept per tenant: shipment_id -> (hours_until, observed_at
+# epoch, is_reefer) from the last run (local copy - Redis holds the shared one)
+
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str):
+    """Accumulate wall time spent in a sync stage into timings[name] (and the stage histogram)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[name] = timings.get(name, 0.0) + elapsed
+        metrics.observe_stage(name, elapsed)
+
+
+def get_detail_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Get the shared detail processing pool, creating it on first use
+
+    Uses spawn so workers never inherit the server's threads or sockets.
+
+    Returns:
+        ProcessPoolExecutor or None if DETAIL_POOL_WORKERS is 0
+    """
+    global _detail_pool
+
+    if DETAIL_POOL_WORKERS <= 0:
+        return None
+
+    if _detail_pool is None:
+        _detail_pool = ProcessPoolExecutor(
+            max_workers=DETAIL_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _detail_pool
+
+
+def shutdown_detail_pool():
+    """Stop the detail processing pool (called on server shutdown)"""
+    global _detail_pool
+
+    if _detail_pool is not None:
+        _detail_pool.shutdown(wait=False, cancel_futures=True)
+        _detail_pool = None
+
+
+def shipment_content_hash(shipment: Dict[str, Any]) -> str:
+    """
+    Stable hash over everything that drives the payload and the window decision
+
+    Hashes the lean snapshot (ETA, appointment, stop state and addresses,
+    driver, equipment, notes, carrier, customer/owner), so volatile fields
+    such as tracking pings or "updated" never cause a miss.
+
+    Args:
+        shipment: Shipment object (full or ShipmentSnapshot)
+
+    Returns:
+        str: Hex digest
+    """
+    if not turvo_client.TURVO_LEAN_DECODE:
+        shipment = turvo_client.project_shipment(shipment)
+
+    if turvo_client.orjson is not None:
+        encoded = turvo_client.orjson.dumps(shipment, option=turvo_client.orjson.OPT_SORT_KEYS)
+    else:
+        encoded = json.dumps(shipment, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _build_payload_entry(details: Dict[str, Any]) -> Dict[str, Any]:
+    """Transform a shipment and collect the inputs the classification needs"""
+    payload = turvo_utils.transform_shipment_for_webhook(details)
+
+    entry = {
+        "payload": payload,
+        "effective_eta": turvo_utils.parse_iso_timestamp(payload["delivery"]["eta"]) if payload else None,
+        "gps_eta": None,
+        "appointment": None
+    }
 
-# Two-window call system
-# Window 1: Check-in call (3-4 hours before delivery)
-CALL_WINDOW_1_MIN = float(os.getenv("CALL_WINDOW_1_MIN", "3"))
-CALL_WINDOW_1_MAX = float(os.getenv("CALL_WINDOW_1_MAX", "4"))
-# Window 2: Final call (0-30 minutes before delivery)
-CALL_WINDOW_2_MIN = float(os.getenv("CALL_WINDOW_2_MIN", "0"))
-CALL_WINDOW_2_MAX = float(os.getenv("CALL_WINDOW_2_MAX", "0.5"))
+    # GPS ETA and appointment for the late check (needed for overnight logic)
+    delivery_stop = turvo_utils.find_delivery_stop(details.get("globalRoute", []))
+    if delivery_stop:
+        entry["gps_eta"] = delivery_stop.get("etaToStop", {}).get("etaValue")
+        entry["appointment"] = delivery_stop.get("appointment", {}).get("date")
 
-# Owner filtering (optional - leave empty to allow all owners)
-ALLOWED_OWNERS = os.getenv("ALLOWED_OWNERS", "")  # Comma-separated names, e.g., "Kyle Patton,Rick Straus"
-ALLOWED_OWNER_IDS = os.getenv("ALLOWED_OWNER_IDS", "")  # Comma-separated IDs, e.g., "201288,5564"
+    return entry
 
-# Redis client for deduplication
-redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+
+def _payload_from_entry(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Copy a cached payload, refreshing only the time-dependent fields"""
+    skeleton = entry["payload"]
+    if not skeleton:
+        return None
+
+    now = datetime.now(timezone.utc)
+    hours_until = round((entry["effective_eta"] - now).total_seconds() / 3600, 1)
+
+    return {
+        **skeleton,
+        "delivery": {**skeleton["delivery"], "hours_until": hours_until},
+        "timestamp": now.isoformat()
+    }
+
+
+def prepare_shipment(raw: bytes, tenant_id: Optional[str] = None, policy: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Decode a raw shipment body and build everything the sync needs from it
+
+    Runs inside a pool worker when DETAIL_POOL_WORKERS > 0, so only this
+    compact result crosses the process boundary - never the full document.
+
+    Args:
+        raw: Raw /shipments/{id} response body
+        tenant_id: Tenant whose owner filter applies (pool workers don't inherit the current one)
+        policy: That tenant's current call policy (Tenant.policy()). Pool workers
+                load tenants once at spawn, so reloads reach them this way.
+
+    Returns:
+        dict: {
+            "owner_allowed": bool,
+            "owner_id": owner ID for the contact lookup,
+            "payload": webhook payload without owner block (None if missing data),
+            "gps_eta": delivery stop GPS ETA,
+            "appointment": delivery stop appointment,
+            "cache_hit": True if the payload came from the content-hash cache,
+            "timings": {"decode": seconds, "transform": seconds},
+            "snapshot": lean shipment snapshot (event state store and degraded-mode cache)
+        }
+    """
+    start = time.perf_counter()
+    details = turvo_client.decode_shipment_details(raw)
+
+    tenant = tenants.get(tenant_id) if tenant_id else tenants.current()
+    if policy:
+        for name, value in policy.items():
+            setattr(tenant, name, value)
+
+    with tenants.activate(tenant):
+        return prepare_details(details, decode_seconds=time.perf_counter() - start)
+
+
+def prepare_details(details: Dict[str, Any], decode_seconds: float = 0.0) -> Dict[str, Any]:
+    """
+    Build everything the sync needs from an already decoded shipment
+
+    Args:
+        details: Shipment object (full or ShipmentSnapshot)
+        decode_seconds: Time spent decoding, reported in the timings
+
+    Returns:
+        dict: Same shape as prepare_shipment
+    """
+    decoded = time.perf_counter()
+
+    result = {
+        "owner_allowed": False,
+        "owner_id": None,
+        "payload": None,
+        "gps_eta": None,
+        "appointment": None,
+        "cache_hit": False,
+        "timings": {"decode": decode_seconds, "transform": 0.0}
+    }
+
+    result["snapshot"] = details if turvo_client.TURVO_LEAN_DECODE else turvo_client.project_shipment(details)
+
+    # Owner filtering first so filtered loads never pay for the transform
+    is_allowed, _ = check_owner_allowed(details)
+    if not is_allowed:
+        return result
+
+    result["owner_allowed"] = True
+    result["owner_id"] = turvo_utils.extract_owner_id(details)
+
+    # Unchanged content since a previous run: reuse the payload skeleton
+    content_hash = shipment_content_hash(details) if PAYLOAD_CACHE_SIZE > 0 else None
+    entry = None
+    if content_hash:
+        with _payload_cache_lock:
+            entry = _payload_cache.get(content_hash)
+            if entry is not None:
+                _payload_cache.move_to_end(content_hash)
+
+    if entry is not None:
+        result["cache_hit"] = True
+    else:
+        # Built outside the lock - a concurrent miss on the same hash builds the same entry
+        entry = _build_payload_entry(details)
+        if content_hash:
+            with _payload_cache_lock:
+                _payload_cache[content_hash] = entry
+                if len(_payload_cache) > PAYLOAD_CACHE_SIZE:
+                    _payload_cache.popitem(last=False)
+
+    result["payload"] = _payload_from_entry(entry)
+    result["gps_eta"] = entry["gps_eta"]
+    result["appointment"] = entry["appointment"]
+
+    result["timings"]["transform"] = time.perf_counter() - decoded
+    return result
+
+
+def _call_key(shipment_id: int, call_type: str) -> str:
+    return tenants.current().key("in_transit", call_type, shipment_id)
+
+
+def _call_record(load_number: str, call_type: str) -> str:
+    return json.dumps({
+        "load_number": load_number,
+        "call_type": call_type,
+        "called_at": datetime.now(timezone.utc).isoformat()
+    })
 
 
 def check_already_called(shipment_id: int, call_type: str) -> bool:
@@ -47,11 +318,30 @@ def check_already_called(shipment_id: int, call_type: str) -> bool:
     Returns:
         bool: True if already called, False otherwise
     """
-    if not redis_client:
-        return False  # No Redis, can't check
+    store = clients.state_store()
+    if not store:
+        return False  # No state store, can't check
+
+    return store.get(_call_key(shipment_id, call_type)) is not None
 
-    cache_key = f"019b0e1e-f561-7a0a-97a4-11058661c03e:in_transit:{call_type}:{shipment_id}"
-    return redis_client.get(cache_key) is not None
+
+def load_called(shipment_ids: list) -> set:
+    """
+    Calls already made for these shipments (one state store round trip)
+
+    Args:
+        shipment_ids: Turvo shipment IDs
+
+    Returns:
+        set: (shipment_id, call_type) pairs already called
+    """
+    store = clients.state_store()
+    if not store or not shipment_ids:
+        return set()
+
+    pairs = [(shipment_id, call_type) for shipment_id in shipment_ids for call_type in ("checkin", "final")]
+    values = store.get_many([_call_key(*pair) for pair in pairs])
+    return {pair for pair, value in zip(pairs, values) if value is not None}
 
 
 def mark_as_called(shipment_id: int, load_number: str, call_type: str):
@@ -63,20 +353,346 @@ def mark_as_called(shipment_id: int, load_number: str, call_type: str):
         load_number: Load number for logging
         call_type: "checkin" or "final"
     """
+    mark_calls([{"shipment_id": shipment_id, "load_number": load_number, "call_type": call_type}])
+
+
+def mark_calls(calls: list):
+    """
+    Mark calls as completed (one state store round trip)
+
+    Args:
+        calls: Dicts with shipment_id, load_number and call_type
+    """
+    store = clients.state_store()
+    if not store:
+        print(f"⚠ No state store, cannot mark {len(calls)} calls as called")
+        return
+
+    store.set_many(
+        {_call_key(call["shipment_id"], call["call_type"]): _call_record(call["load_number"], call["call_type"])
+         for call in calls},
+        settings.get().redis_ttl_days * 86400
+    )
+
+
+def claim_call(shipment_id: int, load_number: str, call_type: str) -> bool:
+    """
+    Atomically mark a call as made unless it already is
+
+    Used where calls are decided outside a sync run (shipment events), so two
+    workers handling updates for the same shipment can't both place the call.
+
+    Args:
+        shipment_id: Turvo shipment ID
+        load_number: Load number for logging
+        call_type: "checkin" or "final"
+
+    Returns:
+        bool: True if this caller owns the call (always True without a state store)
+    """
+    store = clients.state_store()
+    if not store:
+        return True
+
+    return store.add(
+        _call_key(shipment_id, call_type), _call_record(load_number, call_type), settings.get().redis_ttl_days * 86400
+    )
+
+
+def release_call(shipment_id: int, call_type: str):
+    """Undo claim_call (the webhook failed, so the call wasn't made)"""
+    store = clients.state_store()
+    if not store:
+        return
+
+    store.delete(_call_key(shipment_id, call_type))
+
+
+def claim_calls(calls: list) -> list:
+    """
+    claim_call for a sync's whole batch (one state store round trip)
+
+    The sync reads the dedup state when it starts; a Turvo event may place
+    one of its calls while it runs. Claiming right before the webhook makes
+    sure only one of them dials the driver.
+
+    Args:
+        calls: Dicts with shipment_id, load_number and call_type
+
+    Returns:
+        list: The calls this run owns (all of them without a state store)
+    """
+    store = clients.state_store()
+    if not store or not calls:
+        return list(calls)
+
+    claimed = store.add_many(
+        {_call_key(call["shipment_id"], call["call_type"]): _call_record(call["load_number"], call["call_type"])
+         for call in calls},
+        settings.get().redis_ttl_days * 86400
+    )
+    return [call for call, owned in zip(calls, claimed) if owned]
+
+
+def release_calls(calls: list):
+    """
+    Undo claim_calls (the webhook failed) - one state store round trip
+
+    A failure is logged, not raised: the claims then expire with the dedup
+    TTL, and those calls are skipped until they do.
+    """
+    store = clients.state_store()
+    if not store or not calls:
+        return
+
+    try:
+        store.delete_many([_call_key(call["shipment_id"], call["call_type"]) for call in calls])
+    except state_store.StateError as e:
+        print(f"⚠ Could not release {len(calls)} claimed calls (skipped until the dedup TTL expires): {e}")
+
+
+def load_urgency_hints() -> Dict[int, tuple]:
+    """
+    Load last known hours_until per shipment (one Redis round trip)
+
+    Returns:
+        dict: shipment_id -> (hours_until, observed_at epoch seconds, is_reefer)
+    """
+    redis_client = clients.redis_client()
+    tenant = tenants.current()
     if not redis_client:
-        print(f"⚠ Redis not available, cannot mark {load_number} as called")
+        return dict(tenant.local("in_transit.urgency_hints", dict))
+
+    try:
+        raw_hints = redis_client.hgetall(tenant.key("in_transit", "urgency"))
+    except clients.RedisError as e:
+        print(f"⚠ Could not load urgency hints: {e}")
+        return dict(tenant.local("in_transit.urgency_hints", dict))
+
+    hints = {}
+    for shipment_id, value in raw_hints.items():
+        try:
+            hours_until, observed_at, is_reefer = json.loads(value)
+            hints[int(shipment_id)] = (hours_until, observed_at, is_reefer)
+        except (ValueError, TypeError):
+            continue
+    return hints
+
+
+def save_urgency_hints(hints: Dict[int, tuple]):
+    """
+    Replace stored urgency hints with this run's view of the fleet
+
+    Args:
+        hints: shipment_id -> (hours_until, observed_at epoch seconds, is_reefer)
+    """
+    redis_client = clients.redis_client()
+    tenant = tenants.current()
+    local = tenant.local("in_transit.urgency_hints", dict)
+    local.clear()
+    local.update(hints)
+
+    if not redis_client or not hints:
         return
 
-    cache_key = f"019b0e1e-f561-7a0a-97a4-11058661c03e:in_transit:{call_type}:{shipment_id}"
+    key = tenant.key("in_transit", "urgency")
+    try:
+        with clients.batch(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={str(sid): json.dumps(hint) for sid, hint in hints.items()})
+            pipe.expire(key, settings.get().redis_ttl_days * 86400)
+    except clients.RedisError as e:
+        print(f"⚠ Could not save urgency hints: {e}")
 
-    cache_data = {
-        "load_number": load_number,
-        "call_type": call_type,
-        "called_at": datetime.now(timezone.utc).isoformat()
-    }
 
-    ttl_seconds = REDIS_TTL_DAYS * 86400
-    redis_client.set(cache_key, json.dumps(cache_data), ex=ttl_seconds)
+def load_cached_snapshots(shipment_ids: Optional[list] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Snapshots kept for degraded-mode runs (one Redis round trip)
+
+    Args:
+        shipment_ids: Only these shipments (None for all of them)
+
+    Returns:
+        dict: shipment_id -> lean snapshot from the last run that fetched it
+    """
+    redis_client = clients.redis_client()
+    tenant = tenants.current()
+    local = tenant.local("in_transit.cached_snapshots", dict)
+    if not redis_client:
+        cached = dict(local)
+    else:
+        try:
+            raw_snapshots = redis_client.hgetall(tenant.key("in_transit", "snapshots"))
+            cached = {int(sid): json.loads(raw) for sid, raw in raw_snapshots.items()}
+        except (clients.RedisError, ValueError) as e:
+            print(f"⚠ Could not load cached snapshots: {e}")
+            cached = dict(local)
+
+    if shipment_ids is None:
+        return cached
+    return {sid: cached[sid] for sid in shipment_ids if sid in cached}
+
+
+def save_cached_snapshots(snapshots: Dict[int, Dict[str, Any]]):
+    """
+    Replace the degraded-mode snapshots with this run's near-term loads
+
+    Args:
+        snapshots: shipment_id -> lean snapshot
+    """
+    redis_client = clients.redis_client()
+    tenant = tenants.current()
+    local = tenant.local("in_transit.cached_snapshots", dict)
+    local.clear()
+    local.update(snapshots)
+
+    if not redis_client:
+        return
+
+    key = tenant.key("in_transit", "snapshots")
+    try:
+        with clients.batch(transaction=True) as pipe:
+            pipe.delete(key)
+            if snapshots:
+                pipe.hset(key, mapping={str(sid): json.dumps(snapshot) for sid, snapshot in snapshots.items()})
+                pipe.expire(key, settings.get().redis_ttl_days * 86400)
+    except clients.RedisError as e:
+        print(f"⚠ Could not save cached snapshots: {e}")
+
+
+def _owner_contacts() -> Dict[int, tuple]:
+    """owner_id -> (contact, fetched_at epoch) - owner IDs are per Turvo account"""
+    return tenants.current().local("in_transit.owner_contacts", dict)
+
+
+def get_owner_contact(owner_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """
+    Owner contact info (name, email, phone), cached for OWNER_CONTACT_TTL_SECONDS
+
+    A miss fetches the user from Turvo and shares the result through the
+    state store so other workers (and the warm-up of the next deploy) can
+    preload it.
+
+    Args:
+        owner_id: Turvo user ID of the shipment owner
+
+    Returns:
+        dict from extract_owner_contact_info, or None if unknown or Turvo failed
+    """
+    store = clients.state_store()
+    if not owner_id:
+        return None
+
+    owner_contacts = _owner_contacts()
+    cached = owner_contacts.get(owner_id)
+    if cached and time.time() - cached[1] < OWNER_CONTACT_TTL_SECONDS:
+        return cached[0]
+
+    try:
+        contact = turvo_utils.extract_owner_contact_info(turvo_client.get_user_details(owner_id))
+    except Exception:
+        return None  # Not cached - the next lookup tries again
+
+    fetched_at = time.time()
+    owner_contacts[owner_id] = (contact, fetched_at)
+
+    if store:
+        try:
+            store.hash_set(
+                tenants.current().key("owner_contacts"), str(owner_id), json.dumps([contact, fetched_at]),
+                OWNER_CONTACT_TTL_SECONDS
+            )
+        except state_store.StateError as e:
+            print(f"⚠ Could not share owner contact: {e}")
+
+    return contact
+
+
+def preload_owner_contacts() -> int:
+    """
+    Load the owner contacts other workers cached (one state store round trip)
+
+    Returns:
+        int: Contacts now cached in this worker
+    """
+    store = clients.state_store()
+    owner_contacts = _owner_contacts()
+    if not store:
+        return len(owner_contacts)
+
+    try:
+        raw_contacts = store.hash_get_all(tenants.current().key("owner_contacts"))
+    except state_store.StateError as e:
+        print(f"⚠ Could not preload owner contacts: {e}")
+        return len(owner_contacts)
+
+    now = time.time()
+    for owner_id, raw in raw_contacts.items():
+        try:
+            contact, fetched_at = json.loads(raw)
+        except (ValueError, TypeError):
+            continue
+        if now - fetched_at < OWNER_CONTACT_TTL_SECONDS:
+            owner_contacts[int(owner_id)] = (contact, fetched_at)
+    return len(owner_contacts)
+
+
+def prefetch_listing() -> list:
+    """
+    List the En Route shipments now and keep them for the next sync (warm-up)
+
+    Returns:
+        list: The listed shipments
+    """
+    shipments = turvo_client.list_all_shipments(status=2105)
+    tenants.current().local("in_transit.prefetched_listing", dict).update(
+        shipments=shipments, fetched_at=time.time()
+    )
+    return shipments
+
+
+def _take_prefetched_listing() -> Optional[list]:
+    """The prefetched En Route list if it is fresh enough (handed out once)"""
+    prefetched = tenants.current().local("in_transit.prefetched_listing", dict)
+    shipments = prefetched.pop("shipments", None)
+    fetched_at = prefetched.pop("fetched_at", 0.0)
+    if shipments is None or time.time() - fetched_at > WARMUP_LIST_MAX_AGE_SECONDS:
+        return None
+    print(f"  Using the En Route list prefetched {time.time() - fetched_at:.0f}s ago at startup ({len(shipments)} shipments)")
+    return shipments
+
+
+def urgency_rank(shipment_id: int, hints: Dict[int, tuple], now: float) -> tuple:
+    """
+    Cheap urgency estimate used to order a run (lower sorts first)
+
+    Final-window candidates first, then shipments never seen before (so
+    they can't be starved by a budget that keeps running out), then
+    reefers, then by estimated hours until delivery. Overdue ones go last.
+
+    Args:
+        shipment_id: Turvo shipment ID
+        hints: Output of load_urgency_hints
+        now: Current epoch seconds
+
+    Returns:
+        tuple: Sort key
+    """
+    hint = hints.get(shipment_id)
+    if hint is None:
+        return (1, 0, 0.0)
+
+    hours_until, observed_at, is_reefer = hint
+    estimate = hours_until - (now - observed_at) / 3600
+
+    tenant = tenants.current()
+    is_final_candidate = tenant.call_window_2_min - 1 <= estimate <= tenant.call_window_2_max + 1
+    if estimate < tenant.call_window_2_min - 1:
+        estimate = float("inf")  # Overdue - nothing left to call
+
+    if is_final_candidate:
+        return (0, 0 if is_reefer else 1, estimate)
+    return (2, 0 if is_reefer else 1, estimate)
 
 
 def check_owner_allowed(shipment: Dict[str, Any]) -> tuple[bool, str]:
@@ -89,8 +705,10 @@ def check_owner_allowed(shipment: Dict[str, Any]) -> tuple[bool, str]:
     Returns:
         tuple: (is_allowed, owner_name)
     """
+    tenant = tenants.current()
+
     # If no filtering configured, allow all
-    if not ALLOWED_OWNERS and not ALLOWED_OWNER_IDS:
+    if not tenant.allowed_owners and not tenant.allowed_owner_ids:
         return True, "All owners allowed"
 
     # Extract owner info
@@ -105,14 +723,14 @@ def check_owner_allowed(shipment: Dict[str, Any]) -> tuple[bool, str]:
         owner_id = str(owner.get("id", ""))
 
         # Check against allowed names
-        if ALLOWED_OWNERS:
-            allowed_names = [name.strip() for name in ALLOWED_OWNERS.split(",")]
+        if tenant.allowed_owners:
+            allowed_names = [name.strip() for name in tenant.allowed_owners.split(",")]
             if owner_name in allowed_names:
                 return True, owner_name
 
         # Check against allowed IDs
-        if ALLOWED_OWNER_IDS:
-            allowed_ids = [id.strip() for id in ALLOWED_OWNER_IDS.split(",")]
+        if tenant.allowed_owner_ids:
+            allowed_ids = [id.strip() for id in tenant.allowed_owner_ids.split(",")]
             if owner_id in allowed_ids:
                 return True, f"{owner_name} (ID: {owner_id})"
 
@@ -123,26 +741,294 @@ def check_owner_allowed(shipment: Dict[str, Any]) -> tuple[bool, str]:
     return False, "No owner"
 
 
+def prefilter_listed_shipment(shipment: Dict[str, Any]) -> Optional[str]:
+    """
+    Decide from the /shipments/list entry alone whether details are needed
+
+    Only skips when the list entry carries enough data to be sure:
+    - owner: the entry includes the customer owner and it is not allowed
+    - window: the effective delivery time (LATER of ETA and appointment) is
+      clearly outside every call window. Either value alone is a lower
+      bound, so a far-off appointment is enough to skip.
+
+    Args:
+        shipment: Shipment entry from /shipments/list
+
+    Returns:
+        str: Skip reason ("owner" or "window"), or None to fetch details
+    """
+    tenant = tenants.current()
+
+    # Owner filtering (same rule as check_owner_allowed on full details)
+    if tenant.allowed_owners or tenant.allowed_owner_ids:
+        for customer_order in shipment.get("customerOrder", []):
+            if customer_order.get("deleted"):
+                continue
+            # First active customer order decides - only if the list includes its owner
+            if "owner" in customer_order.get("customer", {}):
+                is_allowed, _ = check_owner_allowed(shipment)
+                if not is_allowed:
+                    return "owner"
+            break
+
+    # Window filtering from the list-level delivery stop summary
+    delivery_stop = turvo_utils.find_delivery_stop(shipment.get("globalRoute", []))
+    if not delivery_stop:
+        return None
+
+    eta = delivery_stop.get("etaToStop", {}).get("etaValue")
+    appointment = delivery_stop.get("appointment", {}).get("date")
+    margin = PREFILTER_MARGIN_HOURS
+    windows = [
+        (tenant.call_window_1_min, tenant.call_window_1_max),
+        (tenant.call_window_2_min, tenant.call_window_2_max)
+    ]
+
+    if eta:
+        # Both known (or ETA only): this is the effective hours_until
+        hours_until = turvo_utils.calculate_hours_until(eta, appointment)
+        if hours_until is not None and not any(
+            low - margin <= hours_until <= high + margin for low, high in windows
+        ):
+            return "window"
+    elif appointment:
+        # Appointment only: delivery can't be earlier than this
+        earliest = turvo_utils.calculate_hours_until(appointment)
+        if earliest is not None and all(earliest > high + margin for _, high in windows):
+            return "window"
+
+    return None
+
+
 def send_webhook(payload: Dict[str, Any]) -> bool:
-    """Send webhook to HappyRobot"""
-    if not MOTUS_IN_TRANSIT_WEBHOOK_URL:
-        print("ERROR: MOTUS_IN_TRANSIT_WEBHOOK_URL not configured")
+    """
+    Send webhook to HappyRobot (the current tenant's webhook URL)
+
+    Tenants with webhook_format "compact" or a webhook_compression get the
+    body from webhook_encoding; the default is the standard JSON body.
+    """
+    tenant = tenants.current()
+    webhook_url = tenant.webhook_url
+    if not webhook_url:
+        print(f"ERROR: No webhook URL configured for tenant {tenant.tenant_id}")
+        return False
+
+    # Encoded before the breaker lets a (probe) request through: a body that
+    # can't be encoded is not the webhook's failure
+    encoded = None
+    if tenant.webhook_format != "standard" or tenant.webhook_compression != "none":
+        try:
+            encoded = webhook_encoding.encode(payload, tenant.webhook_format, tenant.webhook_compression)
+        except Exception as e:
+            print(f"ERROR: Could not encode webhook body ({tenant.webhook_format}/{tenant.webhook_compression}): {e}")
+            return False
+
+    breaker = circuit_breaker.get("webhook")
+    if not breaker.allow():
+        print("ERROR: Webhook circuit open - calls stay queued for the next run")
         return False
 
+    started = time.perf_counter()
+    try:
+        if encoded:
+            body, headers, info = encoded
+            response = requests.post(webhook_url, data=body, headers=headers, timeout=10)
+        else:
+            response = requests.post(
+                webhook_url,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=10
+            )
+    except requests.exceptions.RequestException as e:
+        breaker.record(False)
+        print(f"ERROR: Webhook failed: {e}")
+        return False
+
+    breaker.record(response.status_code < 500)
     try:
-        response = requests.post(
-            MOTUS_IN_TRANSIT_WEBHOOK_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
         response.raise_for_status()
+        if encoded:
+            print(
+                f"✓ Webhook sent | {len(payload['shipments'])} shipments | {info['encoding']} | "
+                f"{info['bytes'] / 1024:.1f} KB of {info['standard_bytes'] / 1024:.1f} KB standard "
+                f"({info['bytes'] / max(info['standard_bytes'], 1):.0%}) | "
+                f"encode {info['encode_ms']:.1f} ms | POST {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
         return True
     except requests.exceptions.RequestException as e:
         print(f"ERROR: Webhook failed: {e}")
         return False
 
 
+def classify_shipment(
+    shipment_id: int,
+    custom_id: str,
+    payload: Dict[str, Any],
+    gps_eta: Optional[str],
+    appointment: Optional[str],
+    is_overnight: bool,
+    checkin_called: bool,
+    final_called: bool,
+    stats: Dict[str, int],
+    decision: Optional[Dict[str, Any]] = None,
+    final_only: bool = False,
+    projected_minutes_late: Optional[float] = None
+) -> list:
+    """
+    Apply the call windows to one shipment
+
+    Final calls (window 2) always trigger. Check-in calls (window 1) trigger
+    during business hours, and overnight only when the driver is 30+ min late
+    now or is projected to be from the ETA trend.
+
+    Args:
+        shipment_id: Turvo shipment ID
+        custom_id: Load number
+        payload: Webhook payload with delivery.hours_until set
+        gps_eta: Delivery stop GPS ETA (for the late check)
+        appointment: Delivery stop appointment (for the late check)
+        is_overnight: Overnight mode
+        checkin_called: Check-in call already made
+        final_called: Final call already made
+        stats: Counters to update (sync_in_transit's stats keys)
+        decision: If given, filled with window, minutes_late, state and reason (for the fleet index)
+        final_only: Payload built from cached data (degraded mode) - hold check-ins for live data
+        projected_minutes_late: Lateness projected from the ETA history (see eta_history)
+
+    Returns:
+        list: Calls to make ({"shipment_id", "load_number", "call_type", "payload"})
+    """
+    hours_until = payload["delivery"]["hours_until"]
+    tenant = tenants.current()
+
+    call_types_to_make = []
+    minutes_late = None
+    window = None
+    skip_state, skip_reason = "outside_window", "Outside both call windows"
+
+    # Check if driver is late (for overnight checkin logic)
+    driver_is_late = False
+    if gps_eta and appointment:
+        driver_is_late, minutes_late = turvo_utils.is_driver_late(gps_eta, appointment)
+
+    # Not late yet, but the ETA is drifting towards it
+    trending_late = (
+        not driver_is_late
+        and projected_minutes_late is not None
+        and projected_minutes_late > turvo_utils.LATE_THRESHOLD_MINUTES
+    )
+
+    # FINAL CALLS (0-30 min): ALWAYS trigger regardless of time of day
+    if tenant.call_window_2_min <= hours_until <= tenant.call_window_2_max:
+        window = "final"
+        if final_called:
+            stats["final_already_called"] += 1
+            skip_state, skip_reason = "already_called", "Final call already made"
+        else:
+            call_types_to_make.append("final")
+    else:
+        stats["final_outside_window"] += 1
+
+    # CHECKIN CALLS (3-4 hours): Depends on time of day
+    if tenant.call_window_1_min <= hours_until <= tenant.call_window_1_max:
+        window = window or "checkin"
+        if final_only:
+            stats["stale_checkin_held"] += 1
+            skip_state, skip_reason = "degraded", "Check-in waits for live Turvo data"
+        elif is_overnight:
+            # OVERNIGHT: Only checkin if driver is (or is projected to be) 30+ min late
+            if driver_is_late or trending_late:
+                if trending_late:
+                    stats["trending_late"] += 1
+                if checkin_called:
+                    stats["checkin_already_called"] += 1
+                    skip_state, skip_reason = "already_called", "Check-in call already made"
+                else:
+                    call_types_to_make.append("checkin")
+            else:
+                stats["overnight_skipped"] += 1
+                skip_state, skip_reason = "overnight_on_time", "Overnight and driver not 30+ min late"
+        else:
+            # BUSINESS HOURS: Always checkin
+            if checkin_called:
+                stats["checkin_already_called"] += 1
+                skip_state, skip_reason = "already_called", "Check-in call already made"
+            else:
+                call_types_to_make.append("checkin")
+    else:
+        stats["checkin_outside_window"] += 1
+
+    calls = []
+    for call_type in call_types_to_make:
+        # Create payload with call_type
+        call_payload = payload.copy()
+        call_payload["call_type"] = call_type
+
+        # For overnight checkin calls, add how late the driver is (or will be)
+        if call_type == "checkin" and is_overnight and minutes_late:
+            call_payload["minutes_late"] = minutes_late
+        if call_type == "checkin" and is_overnight and trending_late:
+            call_payload["projected_minutes_late"] = projected_minutes_late
+
+        # Log calls that will be made
+        if call_type == "checkin" and is_overnight and minutes_late:
+            print(f"  → CHECKIN call (LATE): {custom_id} | {payload['driver']['name']} | {minutes_late:.0f} min late | {payload['delivery']['location']['city']}, {payload['delivery']['location']['state']}")
+        elif call_type == "checkin" and is_overnight and trending_late:
+            print(f"  → CHECKIN call (TRENDING LATE): {custom_id} | {payload['driver']['name']} | projected {projected_minutes_late:.0f} min late | {payload['delivery']['location']['city']}, {payload['delivery']['location']['state']}")
+        else:
+            print(f"  → {call_type.upper()} call: {custom_id} | {payload['driver']['name']} | {payload['delivery']['location']['city']}, {payload['delivery']['location']['state']} | ETA: {payload['delivery']['eta_formatted']}")
+
+        calls.append({
+            "shipment_id": shipment_id,
+            "load_number": custom_id,
+            "call_type": call_type,
+            "payload": call_payload
+        })
+
+        if call_type == "checkin":
+            stats["checkin_triggered"] += 1
+        else:
+            stats["final_triggered"] += 1
+
+    if decision is not None:
+        decision.update(
+            window=window,
+            minutes_late=minutes_late,
+            state="calling" if calls else skip_state,
+            reason=", ".join(call_types_to_make) if calls else skip_reason
+        )
+
+    return calls
+
+
+def build_batch_payload(calls_to_make: list, mode: str) -> Dict[str, Any]:
+    """
+    Build the batch webhook body (reefer loads first, then most urgent)
+
+    Args:
+        calls_to_make: Calls from classify_shipment
+        mode: "BUSINESS" or "OVERNIGHT"
+
+    Returns:
+        dict: Batch payload for send_webhook
+    """
+    # Sort calls: reefer loads first, then by hours_until (most urgent first)
+    calls_to_make.sort(key=lambda c: (
+        0 if c["payload"]["equipment"]["temperature"] is not None else 1,
+        c["payload"]["delivery"]["hours_until"] or 999
+    ))
+
+    return {
+        "shipments": [call["payload"] for call in calls_to_make],
+        "total_calls": len(calls_to_make),
+        "checkin_calls": sum(1 for c in calls_to_make if c["call_type"] == "checkin"),
+        "final_calls": sum(1 for c in calls_to_make if c["call_type"] == "final"),
+        "mode": mode,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
 def sync_in_transit() -> Dict[str, Any]:
     """
     Main in-transit sync logic with overnight-aware calling
@@ -155,7 +1041,7 @@ def sync_in_transit() -> Dict[str, Any]:
         Monitor only, call ONLY if driver is 30+ minutes late
 
     For each shipment:
-    1. Get full details from Turvo
+    1. Get full details from Turvo (decoded/transformed in the detail pool if enabled)
     2. Check if overnight or business hours
     3. Apply appropriate call logic
     4. Build batch of calls (with call_type)
@@ -163,34 +1049,68 @@ def sync_in_transit() -> Dict[str, Any]:
     6. Mark each call type as completed
 
     Returns:
-        dict: Summary of execution
+        dict: Summary of execution, including time spent per stage and
+              the Redis round trips the run made
     """
+    with metrics.redis_roundtrips() as roundtrips:
+        result = _run_sync()
+
+    total = sum(roundtrips.values())
+    result["redis_roundtrips"] = total
+    result["redis_operations"] = dict(sorted(roundtrips.items()))
+    metrics.observe_sync_redis(total)
+    if total:
+        operations = ", ".join(f"{operation} {count}" for operation, count in result["redis_operations"].items())
+        print(f"  Redis: {total} round trips | {operations}")
+    if SYNC_REDIS_ROUNDTRIP_WARN and total > SYNC_REDIS_ROUNDTRIP_WARN:
+        print(f"⚠ Redis: {total} round trips in one sync (SYNC_REDIS_ROUNDTRIP_WARN={SYNC_REDIS_ROUNDTRIP_WARN}) - look for per-shipment calls")
+    return result
+
+
+def _run_sync() -> Dict[str, Any]:
+    """The sync itself (see sync_in_transit)"""
+    sync_started = time.perf_counter()
+    timings: Dict[str, float] = {}
+
     # Check if we're in overnight mode
     is_overnight = turvo_utils.is_overnight_hours()
     mode = "OVERNIGHT" if is_overnight else "BUSINESS"
 
-    print(f"SYNC START | {datetime.now(timezone.utc).isoformat()} | Mode: {mode}")
+    tenant_id = tenants.current().tenant_id
+    print(f"SYNC START | {datetime.now(timezone.utc).isoformat()} | Tenant: {tenant_id} | Mode: {mode}")
+    progress = sync_progress.start()
 
     # Step 1: Get ALL En Route shipments (status 2105) across all pages
+    cached_snapshots = None  # Degraded-mode cache, loaded once Turvo fails
+    degraded_listing = False
     try:
-        shipments = turvo_client.list_all_shipments(status=2105)
+        with _stage(timings, "list"):
+            shipments = _take_prefetched_listing()
+            if shipments is None:
+                shipments = turvo_client.list_all_shipments(status=2105)
     except Exception as e:
-        print(f"ERROR: Failed to get shipments: {e}")
-        return {"success": False, "error": str(e), "calls_made": 0}
+        # Turvo down: keep final calls flowing from the near-term loads of earlier runs
+        cached_snapshots = load_cached_snapshots() if DEGRADED_CACHE_HOURS > 0 else {}
+        if not cached_snapshots:
+            print(f"ERROR: Failed to get shipments: {e}")
+            progress.finish()
+            metrics.observe_sync_run("error", time.perf_counter() - sync_started)
+            return {"success": False, "error": str(e), "calls_made": 0}
+
+        print(f"⚠ DEGRADED MODE | Listing failed: {e} | Using {len(cached_snapshots)} cached near-term shipments")
+        shipments = list(cached_snapshots.values())
+        degraded_listing = True
+
+    progress.set(shipments_listed=len(shipments))
 
     if not shipments:
         print("SYNC COMPLETE | No shipments found")
+        fleet_index.apply_sync({}, set(), set())
+        progress.finish()
+        metrics.observe_sync_run("success", time.perf_counter() - sync_started)
         return {"success": True, "shipments_processed": 0, "calls_made": 0}
 
     # Filter out invalid statuses (canceled, delivered, etc.)
-    INVALID_STATUSES = [
-        "2107",  # Delivered
-        "2108",  # Ready for billing
-        "2113",  # Canceled
-        "2116",  # Route complete
-        "2119",  # Tender - rejected
-    ]
-
     shipments = [
         s for s in shipments
         if s.get("status", {}).get("code", {}).get("key") not in INVALID_STATUSES
@@ -198,11 +1118,19 @@ def sync_in_transit() -> Dict[str, Any]:
 
     if not shipments:
         print("SYNC COMPLETE | No valid shipments after filtering")
+        fleet_index.apply_sync({}, set(), set())
+        progress.finish()
+        metrics.observe_sync_run("success", time.perf_counter() - sync_started)
         return {"success": True, "shipments_processed": 0, "calls_made": 0}
 
+    progress.set(phase="fetching", shipments_total=len(shipments))
+
     # Step 2: Process each shipment
     calls_to_make = []  # Single batch with all calls (checkin + final)
-    owner_cache = {}  # In-memory cache for owner details during this sync
+    owner_cache = {}  # Owner contacts looked up during this sync (backed by get_owner_contact)
+    states = {}  # shipment_id -> snapshot for the event state store (TURVO_EVENTS_ENABLED)
+    index_entries = {}  # shipment_id -> fleet index entry
+    observed_etas = {}  # shipment_id -> (GPS ETA, appointment) for the run journal
 
     # Counters for summary
     stats = {
@@ -213,183 +1141,356 @@ def sync_in_transit() -> Dict[str, Any]:
         "final_triggered": 0,
         "final_outside_window": 0,
         "overnight_skipped": 0,  # Overnight: drivers in checkin window but on-time (skipped)
+        "trending_late": 0,  # Overnight: on time now, but the ETA trend projects 30+ min late
         "owner_filtered": 0,
         "no_eta": 0,
         "missing_data": 0,
+        "prefiltered_owner": 0,  # Skipped from list data, before any detail call
+        "prefiltered_window": 0,
+        "payload_cache_hits": 0,  # Unchanged shipments that skipped the transform
+        "served_from_cache": 0,  # Degraded mode: classified from a cached snapshot
+        "stale_checkin_held": 0,  # Degraded mode: check-ins wait for live data
+        "claimed_elsewhere": 0,  # Called from a Turvo event while this run was going
     }
     errors = []
 
-    for shipment in shipments:
+    # Most urgent first, so a run that hits its time budget only defers
+    # loads that can wait until the next one
+    hints = load_urgency_hints()
+    now_epoch = time.time()
+    shipments.sort(key=lambda s: urgency_rank(s["id"], hints, now_epoch))
+    deferred = []
+
+    # What the list entries already rule out (saves the detail call), then the
+    # calls already made for the rest - one state store round trip
+    skip_reasons = {s["id"]: prefilter_listed_shipment(s) for s in shipments}
+    with _stage(timings, "dedup"):
+        already_called = load_called([sid for sid, reason in skip_reasons.items() if reason is None])
+
+    # Step 2a: Fetch details. With the pool enabled, decoding/transforming
+    # happens in worker processes while this thread keeps fetching.
+    detail_pool = get_detail_pool()
+    policy = tenants.current().policy() if detail_pool else None
+    fetched = []
+    stale = []  # (shipment, checkin_called, final_called) Turvo couldn't serve - see degraded mode below
+
+    for index, shipment in enumerate(shipments):
         shipment_id = shipment["id"]
         custom_id = shipment.get("customId", "Unknown")
 
+        # Out of time: stop fetching, still dispatch what's been decided
+        if SYNC_TIME_BUDGET_SECONDS and time.perf_counter() - sync_started > SYNC_TIME_BUDGET_SECONDS:
+            deferred = shipments[index:]
+            break
+
+        progress.incr("shipments_checked")
+
+        # Drop what the list entry already rules out
+        skip_reason = skip_reasons[shipment_id]
+        if skip_reason == "owner":
+            stats["prefiltered_owner"] += 1
+            stats["owner_filtered"] += 1
+            index_entries[shipment_id] = fleet_index.make_entry(
+                shipment, "owner_filtered", "Owner not in the allowed owners", reefer=hints.get(shipment_id, (None,) * 3)[2]
+            )
+            continue
+        if skip_reason == "window":
+            stats["prefiltered_window"] += 1
+            stats["checkin_outside_window"] += 1
+            stats["final_outside_window"] += 1
+            index_entries[shipment_id] = fleet_index.make_entry(
+                shipment, "outside_window", "Far from both call windows (list data)",
+                reefer=hints.get(shipment_id, (None,) * 3)[2]
+            )
+            continue
+
         # Check which call types have already been made
-        checkin_called = check_already_called(shipment_id, "checkin")
-        final_called = check_already_called(shipment_id, "final")
+        checkin_called = (shipment_id, "checkin") in already_called
+        final_called = (shipment_id, "final") in already_called
 
         # Skip if all applicable calls have been made
         if checkin_called and final_called:
             stats["checkin_already_called"] += 1
             stats["final_already_called"] += 1
+            index_entries[shipment_id] = fleet_index.make_entry(
+                shipment, "already_called", "Both calls already made", checkin_called=True, final_called=True,
+                reefer=hints.get(shipment_id, (None,) * 3)[2]
+            )
+            continue
+
+        if degraded_listing:
+            stale.append((shipment, checkin_called, final_called))
             continue
 
         # Get full details
         try:
-            details = turvo_client.get_shipment_details(shipment_id)
+            with _stage(timings, "detail_fetch"):
+                raw = turvo_client.get_shipment_details_raw(shipment_id)
+        except circuit_breaker.CircuitOpen:
+            stale.append((shipment, checkin_called, final_called))
+            continue
         except Exception as e:
             errors.append({"load": custom_id, "error": str(e)})
+            index_entries[shipment_id] = fleet_index.make_entry(shipment, "error", str(e)[:200])
             continue
 
+        progress.incr("details_fetched")
+
+        if detail_pool:
+            prepared = detail_pool.submit(prepare_shipment, raw, tenant_id, policy)
+        else:
+            # A body that fails to decode/transform loses this shipment only (as in the pool)
+            try:
+                prepared = prepare_shipment(raw)
+            except Exception as e:
+                errors.append({"load": custom_id, "error": str(e)})
+                index_entries[shipment_id] = fleet_index.make_entry(shipment, "error", str(e)[:200])
+                continue
+
+        fetched.append((shipment, checkin_called, final_called, prepared))
+
+    # Degraded mode: cached snapshots stand in for the details Turvo can't
+    # serve (only final calls are placed from them)
+    if stale:
+        if cached_snapshots is None:
+            cached_snapshots = load_cached_snapshots([shipment["id"] for shipment, _, _ in stale])
+        unavailable = []
+        for shipment, checkin_called, final_called in stale:
+            snapshot = cached_snapshots.get(shipment["id"])
+            if snapshot is None:
+                unavailable.append(shipment.get("customId", "Unknown"))
+                index_entries[shipment["id"]] = fleet_index.make_entry(
+                    shipment, "error", "Turvo unavailable (circuit open) and no cached data"
+                )
+                continue
+            prepared = prepare_details(snapshot)
+            prepared["stale"] = True
+            stats["served_from_cache"] += 1
+            fetched.append((shipment, checkin_called, final_called, prepared))
+
+        if unavailable:
+            errors.append({"error": "Turvo unavailable (circuit open) and no cached data", "loads": unavailable[:50]})
+        print(f"⚠ DEGRADED MODE | {stats['served_from_cache']} shipments from cached data (final calls only) | {len(unavailable)} without cached data")
+
+    # Step 2b: Classify each shipment against the call windows
+    progress.set(phase="classifying")
+    near_term = {}  # shipment_id -> snapshot kept for degraded-mode runs
+
+    # ETA history of everything classified below (one round trip)
+    with _stage(timings, "eta_history"):
+        eta_histories = eta_history.load(shipment["id"] for shipment, _, _, _ in fetched)
+    updated_histories = {}
+
+    for shipment, checkin_called, final_called, prepared in fetched:
+        shipment_id = shipment["id"]
+        custom_id = shipment.get("customId", "Unknown")
+
+        if isinstance(prepared, Future):
+            try:
+                with _stage(timings, "pool_wait"):
+                    prepared = prepared.result()
+            except Exception as e:
+                errors.append({"load": custom_id, "error": str(e)})
+                index_entries[shipment_id] = fleet_index.make_entry(shipment, "error", str(e)[:200])
+                continue
+
+        # Decode/transform time is measured where it ran (summed across workers)
+        for name, seconds in prepared["timings"].items():
+            timings[name] = timings.get(name, 0.0) + seconds
+            metrics.observe_stage(name, seconds)
+
+        if prepared["cache_hit"]:
+            stats["payload_cache_hits"] += 1
+
         # Check owner filtering
-        is_allowed, _ = check_owner_allowed(details)
-        if not is_allowed:
+        if not prepared["owner_allowed"]:
             stats["owner_filtered"] += 1
+            index_entries[shipment_id] = fleet_index.make_entry(
+                shipment, "owner_filtered", "Owner not in the allowed owners"
+            )
             continue
 
+        # Everything an event may later complete (e.g. a driver assignment) - not just callable loads
+        if TURVO_EVENTS_ENABLED and not prepared.get("stale"):
+            states[shipment_id] = prepared["snapshot"]
+
         # Get owner contact info (with caching)
-        owner_id = turvo_utils.extract_owner_id(details)
+        owner_id = prepared["owner_id"]
         owner_contact = None
         if owner_id:
             if owner_id not in owner_cache:
-                try:
-                    user_details = turvo_client.get_user_details(owner_id)
-                    owner_cache[owner_id] = turvo_utils.extract_owner_contact_info(user_details)
-                except Exception:
-                    owner_cache[owner_id] = None
+                with _stage(timings, "owner_lookup"):
+                    owner_cache[owner_id] = get_owner_contact(owner_id)
             owner_contact = owner_cache[owner_id]
 
-        # Transform to webhook payload
-        payload = turvo_utils.transform_shipment_for_webhook(details, owner_info=owner_contact)
+        # Webhook payload (built without owner block)
+        payload = prepared["payload"]
 
         if not payload:
             # Missing critical data (logged by transform function)
             stats["missing_data"] += 1
+            index_entries[shipment_id] = fleet_index.make_entry(
+                shipment, "missing_data", "Missing driver or delivery data",
+                checkin_called=checkin_called, final_called=final_called, owner_id=owner_id
+            )
             continue
 
+        if owner_contact:
+            payload["owner"] = owner_contact
+
+        progress.incr("payloads_built")
+
         hours_until = payload["delivery"]["hours_until"]
 
+        reefer = payload["equipment"]["temperature"] is not None
+
         if hours_until is None:
             stats["no_eta"] += 1
+            index_entries[shipment_id] = fleet_index.make_entry(
+                shipment, "no_eta", "No ETA or appointment on the delivery stop",
+                checkin_called=checkin_called, final_called=final_called, reefer=reefer, owner_id=owner_id
+            )
             continue
 
-        # Get GPS ETA and appointment for late check (needed for overnight logic)
-        global_route = details.get("globalRoute", [])
-        delivery_stop = turvo_utils.find_delivery_stop(global_route)
-        gps_eta = delivery_stop.get("etaToStop", {}).get("etaValue") if delivery_stop else None
-        appointment = delivery_stop.get("appointment", {}).get("date") if delivery_stop else None
+        hints[shipment_id] = (hours_until, now_epoch, reefer)
 
-        call_types_to_make = []
-        minutes_late = None
+        # Record this run's GPS ETA (not a cached one) and project the trend
+        history = eta_histories.get(shipment_id, b"")
+        if not prepared.get("stale"):
+            history = updated_histories[shipment_id] = eta_history.append(history, now_epoch, prepared["gps_eta"])
+        projected_late = eta_history.projected_minutes_late(history, prepared["appointment"], now_epoch)
 
-        # Check if driver is late (for overnight checkin logic)
-        driver_is_late = False
-        if gps_eta and appointment:
-            driver_is_late, minutes_late = turvo_utils.is_driver_late(gps_eta, appointment)
+        # Loads with a final call ahead are cached for runs while Turvo is down
+        if not final_called and tenants.current().call_window_2_min <= hours_until <= DEGRADED_CACHE_HOURS:
+            near_term[shipment_id] = prepared["snapshot"]
 
-        # FINAL CALLS (0-30 min): ALWAYS trigger regardless of time of day
-        if CALL_WINDOW_2_MIN <= hours_until <= CALL_WINDOW_2_MAX:
-            if final_called:
-                stats["final_already_called"] += 1
-            else:
-                call_types_to_make.append("final")
-        else:
-            stats["final_outside_window"] += 1
+        observed_etas[shipment_id] = (prepared["gps_eta"], prepared["appointment"])
 
-        # CHECKIN CALLS (3-4 hours): Depends on time of day
-        if CALL_WINDOW_1_MIN <= hours_until <= CALL_WINDOW_1_MAX:
-            if is_overnight:
-                # OVERNIGHT: Only checkin if driver is 30+ min late
-                if driver_is_late:
-                    if checkin_called:
-                        stats["checkin_already_called"] += 1
-                    else:
-                        call_types_to_make.append("checkin")
-                else:
-                    stats["overnight_skipped"] += 1
-            else:
-                # BUSINESS HOURS: Always checkin
-                if checkin_called:
-                    stats["checkin_already_called"] += 1
-                else:
-                    call_types_to_make.append("checkin")
-        else:
-            stats["checkin_outside_window"] += 1
+        decision = {}
+        calls = classify_shipment(
+            shipment_id, custom_id, payload, prepared["gps_eta"], prepared["appointment"],
+            is_overnight, checkin_called, final_called, stats, decision,
+            final_only=prepared.get("stale", False), projected_minutes_late=projected_late
+        )
+        calls_to_make.extend(calls)
+        index_entries[shipment_id] = fleet_index.make_entry(
+            shipment, decision["state"], decision["reason"], eta=payload["delivery"]["eta"],
+            window=decision["window"], minutes_late=decision["minutes_late"], projected_minutes_late=projected_late,
+            checkin_called=checkin_called, final_called=final_called, reefer=reefer,
+            owner_id=owner_id, owner_name=(owner_contact or {}).get("name")
+        )
+        if calls:
+            progress.incr("calls_queued", len(calls))
 
-        # Add calls to batch
-        for call_type in call_types_to_make:
-            # Create payload with call_type
-            call_payload = payload.copy()
-            call_payload["call_type"] = call_type
+    # Step 3: Send all calls in one batch webhook
+    progress.set(phase="dispatching")
 
-            # For overnight checkin calls, add how late the driver is
-            if call_type == "checkin" and is_overnight and minutes_late:
-                call_payload["minutes_late"] = minutes_late
+    sent_calls = {}  # shipment_id -> call types sent
+    if calls_to_make:
+        with _stage(timings, "dedup"):
+            claimed = claim_calls(calls_to_make)
+        if len(claimed) < len(calls_to_make):
+            owned = {id(call) for call in claimed}
+            for call in calls_to_make:
+                if id(call) in owned:
+                    continue
+                # Placed by a Turvo event since this run read the dedup state
+                stats[f"{call['call_type']}_triggered"] -= 1
+                stats["claimed_elsewhere"] += 1
+                entry = index_entries[call["shipment_id"]]
+                entry["state"], entry["reason"] = "already_called", "Called from a Turvo event during this run"
+                entry[f"{call['call_type']}_called"] = True
+            calls_to_make = claimed
 
-            # Log calls that will be made
-            if call_type == "checkin" and is_overnight and minutes_late:
-                print(f"  → CHECKIN call (LATE): {custom_id} | {payload['driver']['name']} | {minutes_late:.0f} min late | {payload['delivery']['location']['city']}, {payload['delivery']['location']['state']}")
-            else:
-                print(f"  → {call_type.upper()} call: {custom_id} | {payload['driver']['name']} | {payload['delivery']['location']['city']}, {payload['delivery']['location']['state']} | ETA: {payload['delivery']['eta_formatted']}")
+    if calls_to_make:
+        batch_payload = build_batch_payload(calls_to_make, mode)
 
-            calls_to_make.append({
-                "shipment_id": shipment_id,
-                "load_number": custom_id,
-                "call_type": call_type,
-                "payload": call_payload
-            })
+        # Send the batch
+        with _stage(timings, "webhook"):
+            try:
+                sent = send_webhook(batch_payload)
+            except BaseException:
+                release_calls(calls_to_make)
+                raise
+
+        if not sent:
+            release_calls(calls_to_make)
+            errors.append({"error": "Batch webhook failed", "loads": [call["load_number"] for call in calls_to_make]})
 
-            if call_type == "checkin":
-                stats["checkin_triggered"] += 1
+        for call in calls_to_make:
+            entry = index_entries[call["shipment_id"]]
+            if sent:
+                entry["state"] = "called"
+                entry[f"{call['call_type']}_called"] = True
+                sent_calls.setdefault(call["shipment_id"], []).append(call["call_type"])
             else:
-                stats["final_triggered"] += 1
+                entry["state"], entry["reason"] = "webhook_failed", "Batch webhook failed - retried next run"
 
-    # Step 3: Send all calls in one batch webhook
-    if calls_to_make:
-        # Sort calls: reefer loads first, then by hours_until (most urgent first)
-        calls_to_make.sort(key=lambda c: (
-            0 if c["payload"]["equipment"]["temperature"] is not None else 1,
-            c["payload"]["delivery"]["hours_until"] or 999
-        ))
-
-        checkin_count = sum(1 for c in calls_to_make if c["call_type"] == "checkin")
-        final_count = sum(1 for c in calls_to_make if c["call_type"] == "final")
-
-        # Prepare batch payload
-        batch_payload = {
-            "shipments": [call["payload"] for call in calls_to_make],
-            "total_calls": len(calls_to_make),
-            "checkin_calls": checkin_count,
-            "final_calls": final_count,
-            "mode": mode,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
+    # Keep hints only for shipments still En Route (a degraded listing can't tell)
+    listed_ids = {s["id"] for s in shipments}
+    save_urgency_hints(hints if degraded_listing else {sid: hint for sid, hint in hints.items() if sid in listed_ids})
 
-        # Send the batch
-        if send_webhook(batch_payload):
-            for call in calls_to_make:
-                mark_as_called(
-                    call["shipment_id"],
-                    call["load_number"],
-                    call["call_type"]
-                )
+    if DEGRADED_CACHE_HOURS > 0:
+        save_cached_snapshots(near_term)
+
+    with _stage(timings, "eta_history"):
+        eta_history.save(updated_histories, expire_local=True)
+
+    # Reconcile the event state store with what this run fetched
+    if states:
+        shipment_events.save_polled_states(states, now_epoch)
+
+    with _stage(timings, "index"):
+        if degraded_listing:
+            # Not a full listing - update what was classified, drop nothing
+            fleet_index.update(index_entries)
         else:
-            errors.append({"error": "Batch webhook failed", "loads": [call["load_number"] for call in calls_to_make]})
+            fleet_index.apply_sync(index_entries, listed_ids, {s["id"] for s in deferred})
+
+    # Queued for the journal's writer thread - no disk I/O here
+    run_journal.record("sync", now_epoch, mode, index_entries, observed_etas, sent_calls)
+
+    progress.finish()
+
+    detail_calls_saved = stats["prefiltered_owner"] + stats["prefiltered_window"]
+    duration = time.perf_counter() - sync_started
+    metrics.count_sync_stats(stats)
+    metrics.observe_sync_run("success", duration)
 
     # Summary log
+    if deferred:
+        print(f"⚠ Time budget ({SYNC_TIME_BUDGET_SECONDS:g}s) exhausted | Deferred to next run: {len(deferred)} shipments")
+    if stats["served_from_cache"]:
+        print(f"⚠ Degraded run | {stats['served_from_cache']} shipments classified from cached data | Check-ins held: {stats['stale_checkin_held']}")
+    if detail_calls_saved:
+        print(f"  Pre-detail filter saved {detail_calls_saved} detail calls | Owner: {stats['prefiltered_owner']} | Out of window: {stats['prefiltered_window']}")
     if is_overnight:
-        print(f"SYNC COMPLETE | Mode: {mode} | Processed: {len(shipments)} | Filtered: {stats['owner_filtered']} | Checkin (late only): {stats['checkin_triggered']} | Final: {stats['final_triggered']} | Skipped (on-time): {stats['overnight_skipped']} | Errors: {len(errors)}")
+        print(f"SYNC COMPLETE | Tenant: {tenant_id} | Mode: {mode} | Processed: {len(shipments)} | Filtered: {stats['owner_filtered']} | Checkin (late only): {stats['checkin_triggered']} | Final: {stats['final_triggered']} | Skipped (on-time): {stats['overnight_skipped']} | Errors: {len(errors)}")
     else:
-        print(f"SYNC COMPLETE | Mode: {mode} | Processed: {len(shipments)} | Filtered: {stats['owner_filtered']} | Checkin: {stats['checkin_triggered']} | Final: {stats['final_triggered']} | Errors: {len(errors)}")
+        print(f"SYNC COMPLETE | Tenant: {tenant_id} | Mode: {mode} | Processed: {len(shipments)} | Filtered: {stats['owner_filtered']} | Checkin: {stats['checkin_triggered']} | Final: {stats['final_triggered']} | Errors: {len(errors)}")
 
     return {
         "success": True,
+        "tenant": tenant_id,
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "mode": mode,
         "shipments_total": len(shipments),
         "shipments_processed": len(shipments),
         "owner_filtered": stats["owner_filtered"],
+        "detail_calls_saved": detail_calls_saved,
+        "prefiltered_owner": stats["prefiltered_owner"],
+        "prefiltered_window": stats["prefiltered_window"],
+        "payload_cache_hits": stats["payload_cache_hits"],
+        "trending_late": stats["trending_late"],
         "checkin_calls": stats["checkin_triggered"],
         "final_calls": stats["final_triggered"],
         "total_calls": len(calls_to_make),
+        "degraded": degraded_listing or bool(stats["served_from_cache"]),
+        "served_from_cache": stats["served_from_cache"],
+        "budget_exhausted": bool(deferred),
+        "deferred": len(deferred),
+        "deferred_loads": [s.get("customId", "Unknown") for s in deferred[:50]],
+        "duration_seconds": round(duration, 3),
+        "stage_timings": {name: round(seconds, 3) for name, seconds in timings.items()},
         "errors": errors
     }
@@ -0,0 +1,192 @@
+"""
+Prometheus metrics for the in-transit sync
+
+Covers sync stages, Turvo request latency, Redis round trips and the
+per-shipment counters kept by sync_in_transit. Label children are resolved
+once and cached, so instrumenting a call costs a dict lookup plus an
+observe/inc (~1 us) - negligible at 1k requests per run.
+
+With multiple uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to aggregate
+across worker processes.
+"""
+
+import os
+import re
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+
+# Latency buckets (seconds) - sub-ms Redis/transform up to multi-minute runs
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 20, 30)
+RUN_BUCKETS = (1, 5, 10, 30, 60, 120, 180, 240, 300, 600)
+ROUNDTRIP_BUCKETS = (5, 10, 20, 30, 50, 75, 100, 150, 250, 500, 1000)
+
+SYNC_STAGE_SECONDS = Histogram(
+    "motus_sync_stage_seconds",
+    "Time per sync stage invocation (list, dedup, detail_fetch, decode, transform, owner_lookup, webhook, ...)",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+SYNC_RUN_SECONDS = Histogram(
+    "motus_sync_run_seconds",
+    "Wall time of a full sync run",
+    buckets=RUN_BUCKETS
+)
+SYNC_RUNS = Counter(
+    "motus_sync_runs_total",
+    "Sync runs by outcome",
+    ["outcome"]
+)
+SYNC_SHIPMENTS = Counter(
+    "motus_sync_shipments_total",
+    "Per-shipment sync outcomes (the stats counters of sync_in_transit)",
+    ["stat"]
+)
+TURVO_REQUEST_SECONDS = Histogram(
+    "motus_turvo_request_seconds",
+    "Turvo API request latency",
+    ["endpoint", "status"],
+    buckets=REQUEST_BUCKETS
+)
+TURVO_EVENTS = Counter(
+    "motus_turvo_events_total",
+    "Turvo shipment events by result (duplicate, stale, closed, called, outside_window, ...)",
+    ["result"]
+)
+TURVO_HEDGES = Counter(
+    "motus_turvo_hedges_total",
+    "Hedged Turvo requests: sent, won (the duplicate answered first) or lost",
+    ["endpoint", "outcome"]
+)
+WEBHOOK_BYTES = Counter(
+    "motus_webhook_bytes_total",
+    "Webhook body bytes by encoding: sent, and what the standard format would have sent",
+    ["encoding", "kind"]
+)
+REDIS_ROUNDTRIPS = Counter(
+    "motus_redis_roundtrips_total",
+    "Redis round trips (a pipeline counts once)",
+    ["operation"]
+)
+SYNC_REDIS_ROUNDTRIPS = Histogram(
+    "motus_sync_redis_roundtrips",
+    "Redis round trips made by one sync run",
+    buckets=ROUNDTRIP_BUCKETS
+)
+
+# Cached label children: (metric id, labels) -> child
+_children: Dict[Tuple, Any] = {}
+
+# Per-operation round trips of the block running redis_roundtrips() in this context
+_run_roundtrips: contextvars.ContextVar = contextvars.ContextVar("redis_roundtrips", default=None)
+
+# Numeric path segments -> {id} so /shipments/123 doesn't explode cardinality
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def _child(metric, *labels):
+    key = (id(metric), labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Normalize an endpoint path for labeling (e.g. /shipments/123 -> /shipments/{id})"""
+    return _ID_SEGMENT.sub("/{id}", endpoint)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record one invocation of a sync stage"""
+    _child(SYNC_STAGE_SECONDS, stage).observe(seconds)
+
+
+def observe_sync_run(outcome: str, seconds: float):
+    """Record a finished sync run ("success" or "error")"""
+    _child(SYNC_RUNS, outcome).inc()
+    SYNC_RUN_SECONDS.observe(seconds)
+
+
+def count_sync_stats(stats: Dict[str, int]):
+    """Add a run's stats counters to the shipment outcome counter"""
+    for stat, value in stats.items():
+        if value:
+            _child(SYNC_SHIPMENTS, stat).inc(value)
+
+
+def observe_turvo_request(endpoint: str, status: Any, seconds: float):
+    """Record a Turvo request (status is the HTTP code or "error")"""
+    _child(TURVO_REQUEST_SECONDS, endpoint_template(endpoint), str(status)).observe(seconds)
+
+
+def count_turvo_hedge(endpoint: str, outcome: str):
+    """Record a hedged Turvo request ("sent", "won" or "lost")"""
+    _child(TURVO_HEDGES, endpoint_template(endpoint), outcome).inc()
+
+
+def count_turvo_event(result: str):
+    """Record a processed Turvo shipment event"""
+    _child(TURVO_EVENTS, result).inc()
+
+
+def count_webhook_bytes(encoding: str, sent: int, standard: int):
+    """Record a webhook body (encoding e.g. "compact+gzip") and its standard-format size"""
+    _child(WEBHOOK_BYTES, encoding, "sent").inc(sent)
+    _child(WEBHOOK_BYTES, encoding, "standard").inc(standard)
+
+
+def count_redis(operation: str, count: int = 1):
+    """Record Redis round trips"""
+    _child(REDIS_ROUNDTRIPS, operation).inc(count)
+    run = _run_roundtrips.get()
+    if run is not None:
+        run[operation] = run.get(operation, 0) + count
+
+
+@contextmanager
+def redis_roundtrips() -> Iterator[Dict[str, int]]:
+    """
+    Count the Redis round trips made inside the block (this thread / task only)
+
+    Yields:
+        dict: operation -> round trips, filled in as the block runs
+    """
+    counts: Dict[str, int] = {}
+    token = _run_roundtrips.set(counts)
+    try:
+        yield counts
+    finally:
+        _run_roundtrips.reset(token)
+
+
+def observe_sync_redis(roundtrips: int):
+    """Record the Redis round trips of a finished sync run"""
+    SYNC_REDIS_ROUNDTRIPS.observe(roundtrips)
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format
+
+    Returns:
+        tuple: (body, content_type)
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
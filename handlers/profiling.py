@@ -0,0 +1,216 @@
+"""
+On-demand profiling of live sync runs
+
+POST /sync-in-transit/profile arms profiling for the next run. That run
+executes under cProfile with tracemalloc snapshots, and the result is pushed
+to a bounded ring in Redis (in-process without Redis) where it can be listed
+and downloaded. Unarmed runs only pay for one flag check per run - nothing
+is hooked into the sync itself.
+
+cProfile sees the sync thread only: with DETAIL_POOL_WORKERS > 0 the work
+done in pool workers shows up as waiting on futures. tracemalloc, though,
+traces the whole process: when other tenants' runs overlap the profiled one
+in the same worker, their allocations are counted too, and the profile lists
+them under "memory_shared_with".
+"""
+
+import os
+import json
+import time
+import uuid
+import zlib
+import base64
+import marshal
+import pstats
+import cProfile
+import tracemalloc
+import io
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from . import clients, sync_history, tenants
+
+# Configuration
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "10"))  # Profiles kept
+PROFILE_TOP_N = 40  # Functions / allocation sites in the text summaries
+
+# Process-wide, not per tenant: the next run of any tenant is profiled
+PROFILE_RING_KEY = f"{tenants.DEFAULT_KEY_PREFIX}:profiles"
+PROFILE_REQUEST_KEY = f"{tenants.DEFAULT_KEY_PREFIX}:profile_requested"
+
+# Fallbacks when Redis is not configured
+_requested = False
+_ring: deque = deque(maxlen=PROFILE_RING_SIZE)
+
+
+def request_profile():
+    """Arm profiling for the next sync run (seen by every worker when Redis is available)"""
+    redis_client = clients.redis_client()
+    global _requested
+    _requested = True
+
+    if redis_client:
+        try:
+            # Expires so a request never lingers into tomorrow's runs
+            redis_client.set(PROFILE_REQUEST_KEY, "1", ex=3600)
+        except clients.RedisError as e:
+            print(f"⚠ Could not share profiling request (only this worker will profile): {e}")
+
+
+def consume_request() -> bool:
+    """
+    Check (and clear) the profiling request - called once per sync run
+
+    Returns:
+        bool: True if this run should be profiled
+    """
+    redis_client = clients.redis_client()
+    global _requested
+    requested, _requested = _requested, False
+
+    if redis_client:
+        try:
+            requested = redis_client.getdel(PROFILE_REQUEST_KEY) is not None or requested
+        except clients.RedisError as e:
+            print(f"⚠ Could not check profiling request: {e}")
+
+    return requested
+
+
+def _top_allocators(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+    """Allocation sites that grew the most between two snapshots"""
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    growth = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count": stat.count,
+            "count_diff": stat.count_diff
+        }
+        for stat in growth[:PROFILE_TOP_N]
+    ]
+
+
+def run_profiled(sync: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Run a sync under cProfile + tracemalloc and store the profile
+
+    Args:
+        sync: The sync function (in_transit.sync_in_transit)
+
+    Returns:
+        tuple: (sync result, stored profile metadata)
+    """
+    started_at = datetime.now(timezone.utc).isoformat()
+    tenant_id = tenants.current().tenant_id
+    others_before, started_before = sync_history.process_runs()
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        result = sync()
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - started
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if not was_tracing:
+            tracemalloc.stop()
+        others_after, started_after = sync_history.process_runs()
+
+    # Runs of other tenants that were going on at either end, or started and
+    # finished in between (those are counted but can't be named)
+    shared_with = sorted((others_before | others_after) - {tenant_id})
+    overlapping = len(shared_with) + max(0, started_after - started_before - len(others_after - others_before))
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+
+    profiler.create_stats()
+    entry = {
+        "id": uuid.uuid4().hex[:12],
+        "started_at": started_at,
+        "duration_seconds": round(duration, 3),
+        "sync_success": result.get("success"),
+        "total_calls": result.get("total_calls"),
+        "peak_memory_kb": round(peak / 1024, 1),
+        # Memory figures are process-wide - these runs' allocations are in them too
+        "memory_shared_with": shared_with,
+        "memory_overlapping_runs": overlapping,
+        "top_allocators": _top_allocators(before, after),
+        "summary": summary.getvalue(),
+        # Same format as cProfile's dump_stats - loadable with pstats/snakeviz
+        "pstats": base64.b64encode(zlib.compress(marshal.dumps(profiler.stats))).decode()
+    }
+    _store(entry)
+
+    if overlapping:
+        print(f"⚠ Profile {entry['id']}: memory figures include {overlapping} overlapping run(s) of other tenants")
+    print(f"✓ Profiled sync stored | id: {entry['id']} | {entry['duration_seconds']}s | peak {entry['peak_memory_kb']:.0f} KB")
+    return result, _metadata(entry)
+
+
+def _store(entry: Dict[str, Any]):
+    redis_client = clients.redis_client()
+    _ring.appendleft(entry)
+
+    if redis_client:
+        try:
+            with clients.batch(transaction=True) as pipe:
+                pipe.lpush(PROFILE_RING_KEY, json.dumps(entry))
+                pipe.ltrim(PROFILE_RING_KEY, 0, PROFILE_RING_SIZE - 1)
+        except clients.RedisError as e:
+            print(f"⚠ Could not store profile in Redis: {e}")
+
+
+def _entries() -> List[Dict[str, Any]]:
+    redis_client = clients.redis_client()
+    if redis_client:
+        try:
+            raw_entries = redis_client.lrange(PROFILE_RING_KEY, 0, PROFILE_RING_SIZE - 1)
+            return [json.loads(raw) for raw in raw_entries]
+        except clients.RedisError as e:
+            print(f"⚠ Could not read profiles from Redis: {e}")
+    return list(_ring)
+
+
+def _metadata(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in entry.items() if key not in ("pstats", "summary")}
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """
+    Stored profiles, newest first (without the raw stats)
+
+    Returns:
+        list: Profile metadata incl. top allocators
+    """
+    return [_metadata(entry) for entry in _entries()]
+
+
+def get_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get one stored profile
+
+    Args:
+        profile_id: ID from list_profiles
+
+    Returns:
+        dict: Metadata plus "summary" text and "pstats" bytes, or None if not found
+    """
+    for entry in _entries():
+        if entry["id"] == profile_id:
+            entry = dict(entry)
+            entry["pstats"] = zlib.decompress(base64.b64decode(entry["pstats"]))
+            return entry
+    return None
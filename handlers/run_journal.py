@@ -0,0 +1,441 @@
+"""
+Run journal: every shipment decision, kept as columnar files for analytics
+
+Each sync run (and each shipment event that reaches a decision) appends one
+row per classified shipment - ids, owner, hours_until, window, late and
+projected-late minutes, GPS ETA, appointment, state and skip reason, and the
+calls sent - to an append-only journal under JOURNAL_DIR/{tenant}/.
+
+record() only puts the rows on an in-memory queue; a background thread
+turns them into Arrow record batches every JOURNAL_FLUSH_SECONDS (or every
+JOURNAL_FLUSH_ROWS rows), so the sync never waits on the disk. If the disk
+falls behind by more than JOURNAL_QUEUE_ROWS rows, new rows are dropped (and
+counted) instead.
+
+The file being written is an Arrow IPC stream (journal-{first}-{pid}.arrows):
+every flush is a complete record batch, so a crash loses only unflushed
+rows. At JOURNAL_ROTATE_MB or JOURNAL_ROTATE_HOURS it is rewritten as a
+zstd-compressed Parquet file named after the time range it covers
+(journal-{first}-{last}-{pid}.parquet). Streams left behind by a process
+that is gone are converted when the next writer starts.
+
+query() reads it back: files outside the requested time range are skipped
+by name, and column selection and filters are pushed down into the Parquet
+reader.
+
+Needs pyarrow (optional - without it the journal is off).
+"""
+
+import os
+import glob
+import time
+import queue
+import threading
+import importlib.util
+from typing import Dict, Any, Iterable, List, Optional
+
+from . import tenants, turvo_utils
+
+# pyarrow is imported by the writer thread / query(), not with this module
+pa = pc = ds = pq = None
+SCHEMA = None
+
+# Configuration
+JOURNAL_DIR = os.getenv("JOURNAL_DIR")  # Unset = no journal
+JOURNAL_ROTATE_MB = float(os.getenv("JOURNAL_ROTATE_MB", "64"))
+JOURNAL_ROTATE_HOURS = float(os.getenv("JOURNAL_ROTATE_HOURS", "24"))
+JOURNAL_FLUSH_SECONDS = float(os.getenv("JOURNAL_FLUSH_SECONDS", "5"))
+JOURNAL_FLUSH_ROWS = int(os.getenv("JOURNAL_FLUSH_ROWS", "10000"))
+JOURNAL_QUEUE_ROWS = int(os.getenv("JOURNAL_QUEUE_ROWS", "200000"))
+
+_PYARROW_INSTALLED = bool(JOURNAL_DIR) and importlib.util.find_spec("pyarrow") is not None
+if JOURNAL_DIR and not _PYARROW_INSTALLED:
+    print("⚠ JOURNAL_DIR is set but pyarrow is not installed - run journal off")
+
+PARQUET_ROW_GROUP = 64 * 1024
+_arrow_lock = threading.Lock()
+
+
+def _load_arrow():
+    """Import pyarrow and build SCHEMA (first use only - it adds ~150 ms to startup)"""
+    global pa, pc, ds, pq, SCHEMA
+    with _arrow_lock:
+        if SCHEMA is not None:
+            return
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet
+        pa, pc, ds, pq = pyarrow, pyarrow.compute, pyarrow.dataset, pyarrow.parquet
+        SCHEMA = _schema()
+
+
+def _schema() -> "pa.Schema":
+    return pa.schema([
+        ("recorded_at", pa.timestamp("ms", tz="UTC")),   # Run (or event) time - rows of one run share it
+        ("source", pa.string()),                          # "sync" or "event"
+        ("mode", pa.string()),                            # "BUSINESS" or "OVERNIGHT"
+        ("shipment_id", pa.int64()),
+        ("load_number", pa.string()),
+        ("owner_id", pa.int64()),
+        ("reefer", pa.bool_()),
+        ("state", pa.string()),                           # fleet_index states, e.g. "called", "outside_window"
+        ("reason", pa.string()),
+        ("window", pa.string()),                          # "checkin", "final" or null
+        ("hours_until", pa.float64()),
+        ("minutes_late", pa.float64()),
+        ("projected_minutes_late", pa.float64()),
+        ("effective_at", pa.timestamp("s", tz="UTC")),   # Later of GPS ETA and appointment
+        ("gps_eta", pa.timestamp("s", tz="UTC")),
+        ("appointment", pa.timestamp("s", tz="UTC")),
+        ("checkin_sent", pa.bool_()),                     # Call sent by this run / event
+        ("final_sent", pa.bool_()),
+    ])
+
+
+_queue: "queue.Queue" = queue.Queue()
+_pending_rows = 0
+_stats = {"rows_written": 0, "rows_dropped": 0, "flushes": 0, "files_rotated": 0, "errors": 0}
+_stats_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+_STOP = object()
+
+
+def enabled() -> bool:
+    """Journal configured and pyarrow available"""
+    return _PYARROW_INSTALLED
+
+
+def _epoch(iso: Optional[str]) -> Optional[int]:
+    parsed = turvo_utils.parse_iso_timestamp(iso) if iso else None
+    return int(parsed.timestamp()) if parsed else None
+
+
+def record(
+    source: str,
+    recorded_at: float,
+    mode: str,
+    entries: Dict[int, Dict[str, Any]],
+    observed: Optional[Dict[int, tuple]] = None,
+    sent: Optional[Dict[int, List[str]]] = None
+):
+    """
+    Queue the decisions of one run or event (never blocks)
+
+    Args:
+        source: "sync" or "event"
+        recorded_at: Epoch seconds of the run / event
+        mode: "BUSINESS" or "OVERNIGHT"
+        entries: shipment_id -> fleet index entry (see fleet_index.make_entry)
+        observed: shipment_id -> (gps_eta, appointment) ISO strings, where known
+        sent: shipment_id -> call types sent
+    """
+    global _pending_rows
+    if not enabled() or not entries:
+        return
+
+    observed = observed or {}
+    sent = sent or {}
+    rows = []
+    for shipment_id, entry in entries.items():
+        # Copied now - index entries can change after this returns
+        calls = sent.get(shipment_id, ())
+        rows.append((
+            shipment_id, entry.get("load_number"), entry.get("owner_id"), entry.get("reefer"),
+            entry.get("state"), entry.get("reason"), entry.get("window"), entry.get("minutes_late"),
+            entry.get("projected_minutes_late"), entry.get("effective_at"),
+            *observed.get(shipment_id, (None, None)), "checkin" in calls, "final" in calls
+        ))
+
+    with _stats_lock:
+        if _pending_rows + len(rows) > JOURNAL_QUEUE_ROWS:
+            _stats["rows_dropped"] += len(rows)
+            print(f"⚠ Run journal behind by {_pending_rows} rows - dropped {len(rows)}")
+            return
+        _pending_rows += len(rows)
+
+    _start()
+    _queue.put((tenants.current().tenant_id, source, recorded_at, mode, rows))
+
+
+def _to_batch(items: List[tuple]) -> "pa.RecordBatch":
+    """Queued items -> one record batch (runs in the writer thread)"""
+    columns: Dict[str, list] = {field.name: [] for field in SCHEMA}
+    for source, recorded_at, mode, rows in items:
+        for (shipment_id, load_number, owner_id, reefer, state, reason, window, minutes_late,
+             projected_minutes_late, effective_at, gps_eta, appointment, checkin_sent, final_sent) in rows:
+            columns["recorded_at"].append(int(recorded_at * 1000))
+            columns["source"].append(source)
+            columns["mode"].append(mode)
+            columns["shipment_id"].append(shipment_id)
+            columns["load_number"].append(load_number)
+            columns["owner_id"].append(owner_id)
+            columns["reefer"].append(reefer)
+            columns["state"].append(state)
+            columns["reason"].append(reason)
+            columns["window"].append(window)
+            columns["hours_until"].append(round((effective_at - recorded_at) / 3600, 3) if effective_at else None)
+            columns["minutes_late"].append(minutes_late)
+            columns["projected_minutes_late"].append(projected_minutes_late)
+            columns["effective_at"].append(int(effective_at) if effective_at else None)
+            columns["gps_eta"].append(_epoch(gps_eta))
+            columns["appointment"].append(_epoch(appointment))
+            columns["checkin_sent"].append(checkin_sent)
+            columns["final_sent"].append(final_sent)
+
+    return pa.RecordBatch.from_arrays(
+        [pa.array(columns[field.name], type=field.type) for field in SCHEMA], schema=SCHEMA
+    )
+
+
+class _Stream:
+    """The Arrow IPC stream one tenant's rows are being appended to"""
+
+    def __init__(self, directory: str, first_ms: int):
+        self.opened_at = time.monotonic()
+        self.path = os.path.join(directory, f"journal-{first_ms}-{os.getpid()}.arrows")
+        self.file = open(self.path, "wb")
+        self.writer = pa.ipc.new_stream(self.file, SCHEMA)
+
+    def write(self, batch: "pa.RecordBatch"):
+        self.writer.write_batch(batch)
+        self.file.flush()
+
+    def due(self) -> bool:
+        return (
+            os.path.getsize(self.path) >= JOURNAL_ROTATE_MB * 1024 * 1024
+            or time.monotonic() - self.opened_at >= JOURNAL_ROTATE_HOURS * 3600
+        )
+
+    def close(self):
+        self.writer.close()
+        self.file.close()
+
+
+def _read_stream(path: str) -> "pa.Table":
+    """Every complete batch of a stream (a crashed writer may leave a partial one)"""
+    batches = []
+    try:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_stream(source)
+            for batch in reader:
+                batches.append(batch)
+    except (pa.ArrowInvalid, OSError):
+        pass
+    return pa.Table.from_batches(batches, schema=SCHEMA)
+
+
+def _to_parquet(path: str):
+    """Rewrite a finished stream as Parquet named after its time range, then remove it"""
+    table = _read_stream(path)
+    if table.num_rows:
+        recorded = table.column("recorded_at")
+        first = pc.min(recorded).value
+        last = pc.max(recorded).value
+        pid = os.path.basename(path).rsplit("-", 1)[1].split(".")[0]
+        target = os.path.join(os.path.dirname(path), f"journal-{first}-{last}-{pid}.parquet")
+        pq.write_table(table, target + ".tmp", compression="zstd", row_group_size=PARQUET_ROW_GROUP)
+        os.replace(target + ".tmp", target)
+    os.remove(path)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _recover():
+    """Convert streams left behind by processes that are gone"""
+    for path in glob.glob(os.path.join(JOURNAL_DIR, "*", "journal-*.arrows")):
+        try:
+            pid = int(os.path.basename(path).rsplit("-", 1)[1].split(".")[0])
+            if not _pid_alive(pid):
+                _to_parquet(path)
+                print(f"✓ Run journal recovered {os.path.basename(path)}")
+        except Exception as e:
+            print(f"⚠ Could not recover run journal {path}: {e}")
+
+
+def _flush(buffers: Dict[str, List[tuple]], streams: Dict[str, _Stream]):
+    global _pending_rows
+    for tenant_id, items in buffers.items():
+        if not items:
+            continue
+        rows = sum(len(item[3]) for item in items)
+        try:
+            batch = _to_batch(items)
+            stream = streams.get(tenant_id)
+            if stream is None:
+                directory = os.path.join(JOURNAL_DIR, tenant_id)
+                os.makedirs(directory, exist_ok=True)
+                stream = streams[tenant_id] = _Stream(directory, int(items[0][1] * 1000))
+            stream.write(batch)
+            with _stats_lock:
+                _stats["rows_written"] += rows
+                _stats["flushes"] += 1
+
+            if stream.due():
+                stream.close()
+                del streams[tenant_id]
+                _to_parquet(stream.path)
+                with _stats_lock:
+                    _stats["files_rotated"] += 1
+        except Exception as e:
+            with _stats_lock:
+                _stats["errors"] += 1
+                _stats["rows_dropped"] += rows
+            print(f"⚠ Run journal write failed | Tenant: {tenant_id} | {e}")
+        finally:
+            with _stats_lock:
+                _pending_rows -= rows
+        items.clear()
+
+
+def _run():
+    _load_arrow()
+    _recover()
+    buffers: Dict[str, List[tuple]] = {}
+    streams: Dict[str, _Stream] = {}
+    buffered = 0
+    last_flush = time.monotonic()
+
+    while True:
+        try:
+            item = _queue.get(timeout=max(JOURNAL_FLUSH_SECONDS - (time.monotonic() - last_flush), 0.01))
+        except queue.Empty:
+            item = None
+
+        flush_requested = isinstance(item, threading.Event)
+        if isinstance(item, tuple):
+            tenant_id, *rest = item
+            buffers.setdefault(tenant_id, []).append(tuple(rest))
+            buffered += len(rest[3])
+
+        if (
+            item is _STOP or flush_requested or buffered >= JOURNAL_FLUSH_ROWS
+            or (buffered and time.monotonic() - last_flush >= JOURNAL_FLUSH_SECONDS)
+        ):
+            _flush(buffers, streams)
+            buffered = 0
+            last_flush = time.monotonic()
+        if flush_requested:
+            item.set()
+
+        if item is _STOP:
+            for stream in streams.values():
+                stream.close()
+            return
+
+
+def _start():
+    global _thread
+    if _thread is not None:
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="run-journal", daemon=True)
+            _thread.start()
+
+
+def flush(timeout: float = 30.0) -> bool:
+    """
+    Write everything queued so far (tests, benchmarks, before query())
+
+    Returns:
+        bool: True if the writer caught up within timeout
+    """
+    if _thread is None:
+        return True
+    done = threading.Event()
+    _queue.put(done)
+    return done.wait(timeout)
+
+
+def shutdown():
+    """Flush queued rows and close the open streams (server shutdown)"""
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            return
+        _queue.put(_STOP)
+        _thread.join(timeout=30)
+        _thread = None
+
+
+def _files(directory: str, start_ms: Optional[int], end_ms: Optional[int]) -> Iterable[str]:
+    """Parquet files whose time range (from the name) overlaps [start, end]"""
+    for path in glob.glob(os.path.join(directory, "journal-*-*-*.parquet")):
+        _, first, last, _ = os.path.basename(path).split("-", 3)
+        if (end_ms is None or int(first) <= end_ms) and (start_ms is None or int(last) >= start_ms):
+            yield path
+
+
+def query(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    columns: Optional[List[str]] = None,
+    filter: Optional["ds.Expression"] = None,
+    tenant_id: Optional[str] = None
+) -> "pa.Table":
+    """
+    Read journal rows back
+
+    Example - calls sent per day over the last 30 days:
+
+        table = run_journal.query(start=time.time() - 30 * 86400, columns=["recorded_at", "checkin_sent", "final_sent"])
+
+    Args:
+        start: Epoch seconds, inclusive (None = from the beginning)
+        end: Epoch seconds, inclusive (None = up to now)
+        columns: Columns to read (None = all)
+        filter: Extra pyarrow.dataset expression, e.g. ds.field("state") == "called"
+        tenant_id: Tenant to read (defaults to the current tenant)
+
+    Returns:
+        pyarrow.Table: Matching rows (flushed ones - call flush() first for
+                       the rows of a run that just finished)
+    """
+    if not enabled():
+        raise RuntimeError("Run journal is off (set JOURNAL_DIR and install pyarrow)")
+    _load_arrow()
+
+    directory = os.path.join(JOURNAL_DIR, tenant_id or tenants.current().tenant_id)
+    start_ms = int(start * 1000) if start is not None else None
+    end_ms = int(end * 1000) if end is not None else None
+
+    expression = filter
+    recorded_at = ds.field("recorded_at")
+    for bound in (
+        recorded_at >= pa.scalar(start_ms, pa.timestamp("ms", tz="UTC")) if start_ms is not None else None,
+        recorded_at <= pa.scalar(end_ms, pa.timestamp("ms", tz="UTC")) if end_ms is not None else None
+    ):
+        if bound is not None:
+            expression = bound if expression is None else expression & bound
+
+    # Rotated files, pruned by name, then the streams still being written
+    sources = [ds.dataset(sorted(_files(directory, start_ms, end_ms)), schema=SCHEMA, format="parquet")]
+    streams = [_read_stream(path) for path in sorted(glob.glob(os.path.join(directory, "journal-*.arrows")))]
+    if streams:
+        sources.append(ds.InMemoryDataset(pa.concat_tables(streams)))
+
+    tables = [source.to_table(columns=columns, filter=expression) for source in sources]
+    return pa.concat_tables(tables)
+
+
+def status() -> Dict[str, Any]:
+    """
+    Writer counters for /sync-status
+
+    Returns:
+        dict: enabled, rows written / dropped / pending, flushes, files rotated, errors
+    """
+    with _stats_lock:
+        return {"enabled": enabled(), "rows_pending": _pending_rows, **_stats}
@@ -0,0 +1,161 @@
+"""
+Typed process settings
+
+What the service reads from the environment at the process level - Redis
+(URL, timeouts, pool size), the tenants file, the API key and the defaults
+every tenant starts from (Turvo credentials, webhook, call windows, owner
+filter, rate limit) - is parsed once into a Settings object. get() loads
+it on first use, so importing a module neither reads these variables nor
+builds clients, and a test can swap in its own values with override().
+
+Feature tuning knobs stay next to the code that uses them as module
+constants, read at import on purpose: they size or switch on one feature and
+never change in a running process (a restart applies them). Those are the
+sync tuning in in_transit.py (prefilter margin, detail pool, payload cache,
+time budget, events, degraded cache, owner contact TTL, warm-up list age,
+round-trip warning), the decode options in turvo_client.py, capture/replay
+in turvo_capture.py, the run journal in run_journal.py, SQLite tuning in
+state_store.py, and the breaker, latency, profiling, history and warm-up
+knobs of their modules.
+
+Call windows, owner filters and webhook settings can be changed without a
+restart through TENANTS_FILE - see tenants.reload().
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Dict, Mapping, Optional, Union, get_type_hints
+
+
+def _env(name: str, default: Any = None, secret: bool = False):
+    return field(default=default, repr=not secret, metadata={"env": name, "secret": secret})
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Process-wide configuration (see the Configuration table in the README)"""
+
+    redis_url: Optional[str] = _env("REDIS_URL")
+    redis_ttl_days: int = _env("REDIS_TTL_DAYS", 2)
+    redis_command_timeout: float = _env("REDIS_COMMAND_TIMEOUT_SECONDS", 5.0)
+    redis_connect_timeout: float = _env("REDIS_CONNECT_TIMEOUT_SECONDS", 2.0)
+    redis_max_connections: int = _env("REDIS_MAX_CONNECTIONS", 50)
+    redis_health_check_seconds: int = _env("REDIS_HEALTH_CHECK_SECONDS", 30)
+    tenants_file: Optional[str] = _env("TENANTS_FILE")
+    api_secret_key: Optional[str] = _env("API_SECRET_KEY", secret=True)
+
+    # Token cache, call dedup and owner contacts: "auto" (Redis if REDIS_URL is
+    # set, else SQLite if STATE_DB_PATH is set, else per-process), "redis",
+    # "sqlite" or "none". No default file - state persists only where asked to.
+    state_backend: str = _env("STATE_BACKEND", "auto")
+    state_db_path: Optional[str] = _env("STATE_DB_PATH")
+
+    # Defaults for every tenant (TENANTS_FILE entries override them)
+    turvo_base_url: str = _env("TURVO_BASE_URL", "https://publicapi.turvo.com/v1")
+    turvo_api_key: Optional[str] = _env("TURVO_API_KEY", secret=True)
+    turvo_username: Optional[str] = _env("TURVO_USERNAME")
+    turvo_password: Optional[str] = _env("TURVO_PASSWORD", secret=True)
+    webhook_url: Optional[str] = _env("MOTUS_IN_TRANSIT_WEBHOOK_URL")
+    webhook_format: str = _env("WEBHOOK_FORMAT", "standard")
+    webhook_compression: str = _env("WEBHOOK_COMPRESSION", "none")
+    call_window_1_min: float = _env("CALL_WINDOW_1_MIN", 3.0)
+    call_window_1_max: float = _env("CALL_WINDOW_1_MAX", 4.0)
+    call_window_2_min: float = _env("CALL_WINDOW_2_MIN", 0.0)
+    call_window_2_max: float = _env("CALL_WINDOW_2_MAX", 0.5)
+    allowed_owners: str = _env("ALLOWED_OWNERS", "")
+    allowed_owner_ids: str = _env("ALLOWED_OWNER_IDS", "")
+    max_rps: float = _env("TURVO_MAX_RPS", 0.0)
+    pool_size: int = _env("TURVO_POOL_SIZE", 10)
+
+    def tenant_defaults(self) -> Dict[str, Any]:
+        """The settings a tenant inherits unless TENANTS_FILE overrides them"""
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name in TENANT_FIELDS}
+
+
+TENANT_FIELDS = frozenset((
+    "turvo_base_url", "turvo_api_key", "turvo_username", "turvo_password", "webhook_url",
+    "webhook_format", "webhook_compression", "call_window_1_min", "call_window_1_max",
+    "call_window_2_min", "call_window_2_max", "allowed_owners", "allowed_owner_ids", "max_rps", "pool_size"
+))
+
+_settings: Optional[Settings] = None
+_lock = threading.Lock()
+
+
+def _parse(name: str, raw: str, kind: Any) -> Any:
+    # Optional[X] -> X
+    if getattr(kind, "__origin__", None) is Union:
+        kind = next(arg for arg in kind.__args__ if arg is not type(None))
+    if kind is str:
+        return raw
+    try:
+        return kind(raw)
+    except ValueError:
+        raise ValueError(f"{name}: expected {kind.__name__}, got {raw!r}") from None
+
+
+def from_env(environ: Mapping[str, str] = os.environ) -> Settings:
+    """
+    Parse settings from environment variables
+
+    Args:
+        environ: Variables to read (os.environ by default)
+
+    Returns:
+        Settings (defaults for anything unset or empty)
+
+    Raises:
+        ValueError: A variable can't be parsed as its type
+    """
+    hints = get_type_hints(Settings)
+    values = {}
+    for f in fields(Settings):
+        raw = environ.get(f.metadata["env"])
+        if raw is None or (raw == "" and f.default is None):
+            continue
+        values[f.name] = _parse(f.metadata["env"], raw, hints[f.name])
+    return Settings(**values)
+
+
+def get() -> Settings:
+    """The process settings (read from the environment on first use)"""
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = from_env()
+    return _settings
+
+
+def override(**changes: Any) -> Settings:
+    """
+    Replace some settings (tests and benchmarks)
+
+    Clients already built from the old values are not rebuilt - override
+    before first use, or reset them (clients.use_redis).
+
+    Returns:
+        Settings: The previous settings, to restore with restore()
+    """
+    global _settings
+    previous = get()
+    with _lock:
+        _settings = replace(previous, **changes)
+    return previous
+
+
+def restore(previous: Settings):
+    """Put back settings returned by override()"""
+    global _settings
+    with _lock:
+        _settings = previous
+
+
+def describe(settings: Optional[Settings] = None) -> Dict[str, Any]:
+    """Settings with secrets masked (for /config)"""
+    settings = settings or get()
+    return {
+        f.name: ("***" if getattr(settings, f.name) else None) if f.metadata["secret"] else getattr(settings, f.name)
+        for f in fields(settings)
+    }
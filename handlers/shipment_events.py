@@ -0,0 +1,430 @@
+"""
+Push-based ingestion of Turvo shipment events
+
+POST /turvo/events applies a shipment update or location event (ETA, stop
+state, driver, status) to a per-shipment state snapshot and immediately
+re-evaluates just that shipment against the call windows. The polling sync
+becomes a low-frequency reconciliation pass that refreshes the snapshots of
+everything it fetches.
+
+- Idempotent: each event ID is accepted once (SET NX, kept for REDIS_TTL_DAYS)
+- Out-of-order safe: every field (eta, stop, driver, status) remembers the
+  time of the update it came from, and older updates never overwrite it
+- Unknown shipments are seeded with one detail call to Turvo
+
+State lives in Redis (`{prefix}:shipment_state:{id}`, in the tenant's key
+namespace), in-process without it. Events are applied as the current tenant.
+"""
+
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from pydantic import BaseModel
+
+from . import clients, eta_history, fleet_index, in_transit, metrics, run_journal, settings, tenants, turvo_client, turvo_utils
+
+EVENT_FIELDS = ("status", "eta", "stop", "driver")
+SEEN_EVENTS_LOCAL_MAX = 10000
+STATE_WRITE_RETRIES = 5
+
+
+# Per-tenant fallbacks when Redis is not configured
+def _local_states() -> Dict[int, Dict[str, Any]]:
+    return tenants.current().local("shipment_events.states", dict)
+
+
+def _seen_events() -> "OrderedDict[str, None]":
+    return tenants.current().local("shipment_events.seen", OrderedDict)
+
+
+class ShipmentEvent(BaseModel):
+    """Shipment update or location event from Turvo"""
+    event_id: Optional[str] = None          # Dedup key (a hash of the event if missing)
+    event_type: str                         # e.g. SHIPMENT_UPDATED, LOCATION_UPDATED
+    occurred_at: datetime                   # When the change happened in Turvo
+    shipment_id: int
+    custom_id: Optional[str] = None
+    status: Optional[str] = None            # Status code key, e.g. "2107"
+    eta: Optional[str] = None               # Delivery stop ETA (ISO)
+    next_stop_miles: Optional[float] = None
+    stop_id: Optional[int] = None           # Stop whose state changed
+    stop_state: Optional[str] = None        # e.g. "COMPLETED"
+    driver_name: Optional[str] = None
+    driver_phone: Optional[str] = None
+
+
+def _state_key(shipment_id: int) -> str:
+    return tenants.current().key("shipment_state", shipment_id)
+
+
+def _state_ttl() -> int:
+    return settings.get().redis_ttl_days * 86400
+
+
+def _event_id(event: ShipmentEvent) -> str:
+    return event.event_id or hashlib.blake2b(event.model_dump_json().encode(), digest_size=16).hexdigest()
+
+
+def _event_key(event_id: str) -> str:
+    return tenants.current().key("turvo_event", event_id)
+
+
+def _first_delivery(event_id: str) -> bool:
+    """
+    Record the event ID, returning False if it was already processed
+
+    Args:
+        event_id: ID from _event_id
+
+    Returns:
+        bool: True the first time this event is seen
+    """
+    redis_client = clients.redis_client()
+    if redis_client:
+        first = redis_client.set(_event_key(event_id), "1", nx=True, ex=_state_ttl())
+        return bool(first)
+
+    seen = _seen_events()
+    if event_id in seen:
+        return False
+    seen[event_id] = None
+    if len(seen) > SEEN_EVENTS_LOCAL_MAX:
+        seen.popitem(last=False)
+    return True
+
+
+def _forget(event_id: str):
+    """Let a redelivery of an event that failed mid-processing through"""
+    redis_client = clients.redis_client()
+    _seen_events().pop(event_id, None)
+    if redis_client:
+        redis_client.delete(_event_key(event_id))
+
+
+def _new_state(snapshot: Dict[str, Any], as_of: float) -> Dict[str, Any]:
+    return {"snapshot": snapshot, "as_of": dict.fromkeys(EVENT_FIELDS, as_of), "updated_at": time.time()}
+
+
+def get_state(shipment_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Current state snapshot of a shipment
+
+    Returns:
+        dict: {"snapshot", "as_of" (per-field epoch), "updated_at"} or None
+    """
+    redis_client = clients.redis_client()
+    if not redis_client:
+        return _local_states().get(shipment_id)
+
+    raw = redis_client.get(_state_key(shipment_id))
+    return json.loads(raw) if raw else None
+
+
+def save_polled_states(snapshots: Dict[int, Dict[str, Any]], polled_at: float):
+    """
+    Store snapshots fetched by a sync run (reconciliation)
+
+    Shipments with an event newer than the start of the run keep their
+    state - the event already reflects something the poll may have missed.
+
+    Args:
+        snapshots: shipment_id -> lean snapshot
+        polled_at: Epoch seconds when the run started
+    """
+    redis_client = clients.redis_client()
+    if not redis_client:
+        states = _local_states()
+        for shipment_id, snapshot in snapshots.items():
+            current = states.get(shipment_id)
+            if not current or max(current["as_of"].values()) <= polled_at:
+                states[shipment_id] = _new_state(snapshot, polled_at)
+        return
+
+    ids = list(snapshots)
+    try:
+        existing = redis_client.mget([_state_key(sid) for sid in ids])
+
+        with clients.batch() as pipe:
+            for shipment_id, raw in zip(ids, existing):
+                if raw and max(json.loads(raw)["as_of"].values()) > polled_at:
+                    continue
+                pipe.set(_state_key(shipment_id), json.dumps(_new_state(snapshots[shipment_id], polled_at)), ex=_state_ttl())
+    except clients.RedisError as e:
+        print(f"⚠ Could not save shipment states: {e}")
+
+
+def _seed_state(shipment_id: int) -> Dict[str, Any]:
+    """Fetch a shipment unknown to the state store (one detail call)"""
+    fetched_at = time.time()
+    details = turvo_client.get_shipment_details(shipment_id)
+    if not turvo_client.TURVO_LEAN_DECODE:
+        details = turvo_client.project_shipment(details)
+    return _new_state(details, fetched_at)
+
+
+def _apply(state: Dict[str, Any], event: ShipmentEvent, occurred: float) -> list:
+    """
+    Apply the event's fields that are newer than what the state holds
+
+    Returns:
+        list: Names of the fields that changed
+    """
+    snapshot = state["snapshot"]
+    as_of = state["as_of"]
+    applied = []
+
+    def newer(field: str) -> bool:
+        return occurred > as_of.get(field, 0)
+
+    if event.status and newer("status"):
+        snapshot.setdefault("status", {}).setdefault("code", {})["key"] = event.status
+        applied.append("status")
+
+    if event.stop_id is not None and event.stop_state and newer("stop"):
+        for stop in snapshot.get("globalRoute", []):
+            if stop.get("id") == event.stop_id:
+                stop["state"] = event.stop_state
+                applied.append("stop")
+                break
+
+    if event.eta and newer("eta"):
+        delivery_stop = turvo_utils.find_delivery_stop(snapshot.get("globalRoute", []))
+        if delivery_stop:
+            eta_to_stop = delivery_stop.setdefault("etaToStop", {})
+            eta_to_stop["etaValue"] = event.eta
+            if event.next_stop_miles is not None:
+                eta_to_stop["nextStopMiles"] = event.next_stop_miles
+            applied.append("eta")
+
+    if (event.driver_name or event.driver_phone) and newer("driver"):
+        carrier_orders = [co for co in snapshot.setdefault("carrierOrder", []) if not co.get("deleted")]
+        if not carrier_orders:
+            carrier_orders = [{"deleted": False, "drivers": []}]
+            snapshot["carrierOrder"].append(carrier_orders[0])
+        carrier_order = carrier_orders[-1]
+
+        drivers = carrier_order.get("drivers") or [{"context": {}}]
+        context = dict(drivers[-1].get("context") or {})
+        if event.driver_name:
+            context["name"] = event.driver_name
+        if event.driver_phone:
+            context["phones"] = [{"number": event.driver_phone}]
+        carrier_order["drivers"] = [{"context": context}]
+        applied.append("driver")
+
+    for field in applied:
+        as_of[field] = occurred
+    if applied:
+        state["updated_at"] = time.time()
+    return applied
+
+
+def _update_state(shipment_id: int, event: ShipmentEvent, occurred: float) -> Tuple[Optional[Dict[str, Any]], list, bool]:
+    """
+    Apply an event to the stored state (optimistic transaction on Redis)
+
+    Returns:
+        tuple: (state after the event or None if the shipment is closed,
+                applied fields, True if the state was just seeded from Turvo)
+    """
+    redis_client = clients.redis_client()
+    seed = None if get_state(shipment_id) else _seed_state(shipment_id)
+
+    if not redis_client:
+        states = _local_states()
+        state = states.get(shipment_id) or seed
+        applied = _apply(state, event, occurred)
+        states[shipment_id] = state
+        if state["snapshot"].get("status", {}).get("code", {}).get("key") in in_transit.INVALID_STATUSES:
+            del states[shipment_id]
+            return None, applied, seed is not None
+        return state, applied, seed is not None
+
+    key = _state_key(shipment_id)
+    with redis_client.pipeline() as pipe:
+        for _ in range(STATE_WRITE_RETRIES):
+            try:
+                pipe.watch(key)
+                raw = pipe.get(key)
+                state = json.loads(raw) if raw else seed
+                applied = _apply(state, event, occurred)
+                closed = state["snapshot"].get("status", {}).get("code", {}).get("key") in in_transit.INVALID_STATUSES
+
+                pipe.multi()
+                if closed:
+                    pipe.delete(key)
+                elif applied or not raw:
+                    pipe.set(key, json.dumps(state), ex=_state_ttl())
+                pipe.execute()
+                return (None if closed else state), applied, not raw
+            except clients.WatchError:
+                continue  # Another event for this shipment landed first - reapply on top of it
+
+    raise RuntimeError(f"Shipment {shipment_id} state kept changing, gave up after {STATE_WRITE_RETRIES} attempts")
+
+
+def evaluate(shipment_id: int, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Re-evaluate one shipment against the call windows and place any due call
+
+    Args:
+        shipment_id: Turvo shipment ID
+        snapshot: Current lean snapshot
+
+    Returns:
+        dict: outcome, hours_until and the call types placed
+    """
+    custom_id = snapshot.get("customId", "Unknown")
+
+    if not turvo_utils.find_delivery_stop(snapshot.get("globalRoute", [])):
+        fleet_index.update({shipment_id: None})
+        return {"outcome": "no_open_delivery_stop", "hours_until": None, "calls": []}
+
+    prepared = in_transit.prepare_details(snapshot)
+
+    if not prepared["owner_allowed"]:
+        fleet_index.update({shipment_id: fleet_index.make_entry(
+            snapshot, "owner_filtered", "Owner not in the allowed owners"
+        )})
+        return {"outcome": "owner_filtered", "hours_until": None, "calls": []}
+
+    called = in_transit.load_called([shipment_id])
+    checkin_called = (shipment_id, "checkin") in called
+    final_called = (shipment_id, "final") in called
+
+    payload = prepared["payload"]
+    if not payload:
+        fleet_index.update({shipment_id: fleet_index.make_entry(
+            snapshot, "missing_data", "Missing driver or delivery data",
+            checkin_called=checkin_called, final_called=final_called, owner_id=prepared["owner_id"]
+        )})
+        return {"outcome": "missing_data", "hours_until": None, "calls": []}
+
+    reefer = payload["equipment"]["temperature"] is not None
+    hours_until = payload["delivery"]["hours_until"]
+    if hours_until is None:
+        fleet_index.update({shipment_id: fleet_index.make_entry(
+            snapshot, "no_eta", "No ETA or appointment on the delivery stop",
+            checkin_called=checkin_called, final_called=final_called, reefer=reefer, owner_id=prepared["owner_id"]
+        )})
+        return {"outcome": "no_eta", "hours_until": None, "calls": []}
+
+    owner_contact = in_transit.get_owner_contact(prepared["owner_id"])
+    if owner_contact:
+        payload["owner"] = owner_contact
+
+    is_overnight = turvo_utils.is_overnight_hours()
+    stats = dict.fromkeys((
+        "checkin_already_called", "checkin_triggered", "checkin_outside_window",
+        "final_already_called", "final_triggered", "final_outside_window", "overnight_skipped", "trending_late"
+    ), 0)
+
+    # The event's ETA extends the shipment's trend
+    now = time.time()
+    history = eta_history.record(shipment_id, now, prepared["gps_eta"])
+    projected_late = eta_history.projected_minutes_late(history, prepared["appointment"], now)
+
+    decision = {}
+    calls = in_transit.classify_shipment(
+        shipment_id, custom_id, payload, prepared["gps_eta"], prepared["appointment"],
+        is_overnight, checkin_called, final_called, stats, decision, projected_minutes_late=projected_late
+    )
+
+    # Claim before sending - a concurrent event or sync may have decided the same call
+    calls = [call for call in calls if in_transit.claim_call(shipment_id, custom_id, call["call_type"])]
+
+    entry = fleet_index.make_entry(
+        snapshot, decision["state"], decision["reason"], eta=payload["delivery"]["eta"],
+        window=decision["window"], minutes_late=decision["minutes_late"], projected_minutes_late=projected_late,
+        checkin_called=checkin_called, final_called=final_called, reefer=reefer,
+        owner_id=prepared["owner_id"], owner_name=(owner_contact or {}).get("name")
+    )
+    mode = "OVERNIGHT" if is_overnight else "BUSINESS"
+    observed = {shipment_id: (prepared["gps_eta"], prepared["appointment"])}
+
+    if not calls:
+        if stats["checkin_already_called"] or stats["final_already_called"]:
+            outcome = "already_called"
+        elif stats["overnight_skipped"]:
+            outcome = "overnight_skipped"
+        else:
+            outcome = "outside_window"
+        if decision["state"] == "calling":
+            # Lost the claim to a concurrent event or sync
+            entry["state"], entry["reason"] = "already_called", "Call claimed concurrently"
+        fleet_index.update({shipment_id: entry})
+        run_journal.record("event", now, mode, {shipment_id: entry}, observed)
+        return {"outcome": outcome, "hours_until": hours_until, "calls": []}
+
+    try:
+        sent = in_transit.send_webhook(in_transit.build_batch_payload(calls, mode))
+    except BaseException:
+        in_transit.release_calls(calls)
+        raise
+    if not sent:
+        in_transit.release_calls(calls)
+        entry["state"], entry["reason"] = "webhook_failed", "Webhook failed - retried on the next event or sync"
+        fleet_index.update({shipment_id: entry})
+        run_journal.record("event", now, mode, {shipment_id: entry}, observed)
+        return {"outcome": "webhook_failed", "hours_until": hours_until, "calls": []}
+
+    entry["state"] = "called"
+    for call in calls:
+        entry[f"{call['call_type']}_called"] = True
+    fleet_index.update({shipment_id: entry})
+    call_types = [call["call_type"] for call in calls]
+    run_journal.record("event", now, mode, {shipment_id: entry}, observed, {shipment_id: call_types})
+
+    return {"outcome": "called", "hours_until": hours_until, "calls": call_types}
+
+
+def handle_event(event: ShipmentEvent) -> Dict[str, Any]:
+    """
+    Apply a Turvo shipment event and re-evaluate that shipment
+
+    Args:
+        event: Incoming event
+
+    Returns:
+        dict: status ("applied", "duplicate", "stale" or "closed"), applied
+              fields and, when re-evaluated, outcome/hours_until/calls
+    """
+    result = {"shipment_id": event.shipment_id, "event_type": event.event_type}
+
+    event_id = _event_id(event)
+    if not _first_delivery(event_id):
+        metrics.count_turvo_event("duplicate")
+        return {**result, "status": "duplicate"}
+
+    try:
+        state, applied, seeded = _update_state(event.shipment_id, event, event.occurred_at.timestamp())
+    except Exception:
+        _forget(event_id)
+        raise
+    result["applied"] = applied
+
+    if state is None:
+        print(f"✓ Event {event.event_type} closed shipment {event.shipment_id} (status {event.status})")
+        fleet_index.update({event.shipment_id: None})
+        metrics.count_turvo_event("closed")
+        return {**result, "status": "closed"}
+
+    # Nothing newer than the state - unless this is the redelivery of an event
+    # whose update was stored but whose evaluation failed (same timestamp)
+    if not applied and not seeded and event.occurred_at.timestamp() not in state["as_of"].values():
+        # Older than what's stored - the state (and any call it led to) already reflects something newer
+        metrics.count_turvo_event("stale")
+        return {**result, "status": "stale"}
+
+    try:
+        evaluation = evaluate(event.shipment_id, state["snapshot"])
+    except Exception:
+        # Seen only once processed - Turvo's redelivery gets another try
+        _forget(event_id)
+        raise
+    metrics.count_turvo_event(evaluation["outcome"])
+    return {**result, "status": "applied", **evaluation}
@@ -0,0 +1,340 @@
+"""
+State store: token cache, call dedup and owner contacts
+
+The state that stops a worker from re-dialing a driver it already called
+(and from re-fetching tokens and owner contacts) lives behind one small
+key/value interface with TTLs, so it works with or without Redis:
+
+- RedisStateStore keeps the existing Redis keys (no migration)
+- SQLiteStateStore keeps them in one SQLite file in WAL mode - for
+  deployments without Redis. Every uvicorn worker opens the same file;
+  readers never block the writer, and writers wait for each other up to
+  STATE_DB_BUSY_TIMEOUT_SECONDS. Expiry is an indexed expires_at column:
+  expired rows are ignored by reads and purged in the background of writes.
+
+clients.state_store() picks one from STATE_BACKEND and STATE_DB_PATH (see
+settings.py).
+Both raise StateError when the backend fails.
+"""
+
+import os
+import abc
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from . import clients
+
+# Configuration
+# Seconds a SQLite writer waits for another worker's write to finish
+STATE_DB_BUSY_TIMEOUT_SECONDS = float(os.getenv("STATE_DB_BUSY_TIMEOUT_SECONDS", "5"))
+
+# Expired SQLite rows are deleted at most this often (per process)
+STATE_DB_PURGE_SECONDS = float(os.getenv("STATE_DB_PURGE_SECONDS", "60"))
+
+# Keys per SQL statement (SQLite limits bound parameters)
+_SQLITE_CHUNK = 500
+
+
+class StateError(Exception):
+    """The state backend could not be read or written"""
+
+
+class StateStore(abc.ABC):
+    """
+    Key/value state with expiry
+
+    Plain keys hold one value; hash keys hold fields (owner contacts) and
+    expire as a whole, like a Redis hash.
+    """
+
+    backend = "none"
+
+    @abc.abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Values of keys, None where missing or expired (one round trip)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_many(self, values: Dict[str, str], ttl_seconds: float):
+        """Set several keys with the same TTL (one round trip)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add(self, key: str, value: str, ttl_seconds: float) -> bool:
+        """Set key unless it is already set (atomic across workers) - True if this call set it"""
+        raise NotImplementedError
+
+    def add_many(self, values: Dict[str, str], ttl_seconds: float) -> List[bool]:
+        """add() for several keys (one round trip) - True for each key this call set"""
+        return [self.add(key, value, ttl_seconds) for key, value in values.items()]
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        """Remove a key (and all its fields, for a hash)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete_many(self, keys: List[str]):
+        """delete() for several keys (one round trip)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def hash_set(self, key: str, field: str, value: str, ttl_seconds: float):
+        """Set one field of a hash key and (re)start the key's TTL"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def hash_get_all(self, key: str) -> Dict[str, str]:
+        """Every field of a hash key ({} if missing or expired)"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key])[0]
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        self.set_many({key: value}, ttl_seconds)
+
+    def close(self):
+        pass
+
+
+class RedisStateStore(StateStore):
+    """State in Redis, under the keys the service has always used"""
+
+    backend = "redis"
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.client.get(key)
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+        return value.decode() if value is not None else None
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        try:
+            values = self.client.mget(keys)
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+        return [value.decode() if value is not None else None for value in values]
+
+    def set_many(self, values: Dict[str, str], ttl_seconds: float):
+        if not values:
+            return
+        try:
+            with clients.batch(client=self.client) as pipe:
+                for key, value in values.items():
+                    pipe.set(key, value, ex=int(ttl_seconds))
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+
+    def add(self, key: str, value: str, ttl_seconds: float) -> bool:
+        try:
+            added = self.client.set(key, value, nx=True, ex=int(ttl_seconds))
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+        return bool(added)
+
+    def add_many(self, values: Dict[str, str], ttl_seconds: float) -> List[bool]:
+        if not values:
+            return []
+        try:
+            with clients.batch(client=self.client) as pipe:
+                for key, value in values.items():
+                    pipe.set(key, value, nx=True, ex=int(ttl_seconds))
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+        return [bool(added) for added in pipe.results]
+
+    def delete(self, key: str):
+        try:
+            self.client.delete(key)
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+
+    def delete_many(self, keys: List[str]):
+        if not keys:
+            return
+        try:
+            self.client.delete(*keys)
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+
+    def hash_set(self, key: str, field: str, value: str, ttl_seconds: float):
+        try:
+            with clients.batch(transaction=True, client=self.client) as pipe:
+                pipe.hset(key, field, value)
+                pipe.expire(key, int(ttl_seconds))
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+
+    def hash_get_all(self, key: str) -> Dict[str, str]:
+        try:
+            raw = self.client.hgetall(key)
+        except clients.RedisError as e:
+            raise StateError(str(e)) from e
+        return {field.decode(): value.decode() for field, value in raw.items()}
+
+
+def _chunks(items: List, size: int = _SQLITE_CHUNK) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteStateStore(StateStore):
+    """
+    State in a local SQLite file (WAL), shared by every worker on the host
+
+    Plain keys are rows with field "". One connection per thread, in
+    autocommit mode; multi-row writes run in one IMMEDIATE transaction.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self._run(self._create)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=STATE_DB_BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: a commit survives a process crash; only a power loss can drop the last ones
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _run(self, operation, *args):
+        try:
+            return operation(self._connect(), *args)
+        except sqlite3.Error as e:
+            raise StateError(f"{self.path}: {e}") from e
+
+    @staticmethod
+    def _create(connection: sqlite3.Connection):
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " key TEXT NOT NULL, field TEXT NOT NULL DEFAULT '', value TEXT NOT NULL, expires_at REAL,"
+            " PRIMARY KEY (key, field)) WITHOUT ROWID"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS state_expires_at ON state (expires_at)")
+
+    def _write(self, connection: sqlite3.Connection, statements: List[tuple]):
+        """Run (sql, rows) pairs in one transaction, then purge expired rows if it's time"""
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, rows in statements:
+                connection.executemany(sql, rows)
+            if now >= self._next_purge:
+                connection.execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+                self._next_purge = now + STATE_DB_PURGE_SECONDS
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        def read(connection):
+            now = time.time()
+            found = {}
+            for chunk in _chunks(keys):
+                found.update(connection.execute(
+                    f"SELECT key, value FROM state WHERE field = '' AND key IN ({','.join('?' * len(chunk))})"
+                    " AND (expires_at IS NULL OR expires_at > ?)",
+                    (*chunk, now)
+                ).fetchall())
+            return [found.get(key) for key in keys]
+
+        return self._run(read) if keys else []
+
+    def set_many(self, values: Dict[str, str], ttl_seconds: float):
+        if not values:
+            return
+        expires_at = time.time() + ttl_seconds
+        self._run(self._write, [(
+            "INSERT INTO state (key, field, value, expires_at) VALUES (?, '', ?, ?)"
+            " ON CONFLICT (key, field) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            [(key, value, expires_at) for key, value in values.items()]
+        )])
+
+    # An expired row counts as absent - take it over in the same statement
+    _ADD = (
+        "INSERT INTO state (key, field, value, expires_at) VALUES (?, '', ?, ?)"
+        " ON CONFLICT (key, field) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+        " WHERE state.expires_at <= ?"
+    )
+
+    def add(self, key: str, value: str, ttl_seconds: float) -> bool:
+        def insert(connection):
+            now = time.time()
+            return connection.execute(self._ADD, (key, value, now + ttl_seconds, now)).rowcount == 1
+
+        return self._run(insert)
+
+    def add_many(self, values: Dict[str, str], ttl_seconds: float) -> List[bool]:
+        def insert(connection):
+            now = time.time()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                added = [
+                    connection.execute(self._ADD, (key, value, now + ttl_seconds, now)).rowcount == 1
+                    for key, value in values.items()
+                ]
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return added
+
+        return self._run(insert) if values else []
+
+    def delete(self, key: str):
+        self._run(self._write, [("DELETE FROM state WHERE key = ?", [(key,)])])
+
+    def delete_many(self, keys: List[str]):
+        if not keys:
+            return
+        self._run(self._write, [
+            (f"DELETE FROM state WHERE key IN ({','.join('?' * len(chunk))})", [tuple(chunk)])
+            for chunk in _chunks(keys)
+        ])
+
+    def hash_set(self, key: str, field: str, value: str, ttl_seconds: float):
+        expires_at = time.time() + ttl_seconds
+        self._run(self._write, [
+            ("INSERT INTO state (key, field, value, expires_at) VALUES (?, ?, ?, ?)"
+             " ON CONFLICT (key, field) DO UPDATE SET value = excluded.value", [(key, field, value, expires_at)]),
+            ("UPDATE state SET expires_at = ? WHERE key = ?", [(expires_at, key)]),
+        ])
+
+    def hash_get_all(self, key: str) -> Dict[str, str]:
+        def read(connection):
+            return dict(connection.execute(
+                "SELECT field, value FROM state WHERE key = ? AND field != '' AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchall())
+
+        return self._run(read)
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
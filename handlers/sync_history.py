@@ -0,0 +1,278 @@
+"""
+Persisted sync run history
+
+Every run's result (stage timings, shipment counts, errors) is pushed to a
+capped Redis list, so /sync-status and /sync-history answer the same on
+every uvicorn worker and survive restarts. Without Redis, history is kept
+in-process.
+
+A Redis lock marks a run in progress across workers. It holds a random
+token, so only the run that took it can release it, and its TTL is renewed
+while the run lasts (an unlimited time budget included) but runs out soon
+after a crashed worker stops renewing it. History and the lock are per
+tenant, so tenants' runs never block each other.
+"""
+
+import os
+import json
+import math
+import secrets
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from . import clients, in_transit, tenants
+
+# Configuration
+SYNC_HISTORY_SIZE = int(os.getenv("SYNC_HISTORY_SIZE", "500"))  # Runs kept
+MAX_ERRORS_STORED = 50  # Per run - a Turvo outage can produce one error per shipment
+
+# Tenants with a run in this process, and runs started here so far (profiling
+# uses them to tell whether process-wide memory stats include other runs)
+_process_runs: Set[str] = set()
+_process_runs_started = 0
+_process_runs_lock = threading.Lock()
+
+# Delete / extend the lock only while it still holds our token
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _history_key() -> str:
+    return tenants.current().key("sync_history")
+
+
+def _durations_key() -> str:
+    return tenants.current().key("sync_history", "durations")
+
+
+def _running_key() -> str:
+    return tenants.current().key("sync_running")
+
+
+# Fallbacks when Redis is not configured (per tenant)
+def _local_history() -> deque:
+    return tenants.current().local("sync_history.history", lambda: deque(maxlen=SYNC_HISTORY_SIZE))
+
+
+def _local_running() -> Dict[str, Any]:
+    return tenants.current().local("sync_history.running", lambda: {"running": False, "token": None, "stop": None})
+
+
+def _running_ttl() -> int:
+    """Lock TTL - twice the time budget (at least 10 minutes), renewed every third of it"""
+    return int(max(600, in_transit.SYNC_TIME_BUDGET_SECONDS * 2))
+
+
+def _keep_alive(key: str, token: str, ttl: int, stop: threading.Event):
+    """Renew the lock until the run releases it (background thread)"""
+    redis_client = clients.redis_client()
+    while not stop.wait(ttl / 3):
+        try:
+            renewed = redis_client.eval(_RENEW_SCRIPT, 1, key, token, ttl)
+        except clients.RedisError as e:
+            print(f"⚠ Could not renew sync lock: {e}")
+            continue
+        if not renewed:
+            print("⚠ Sync lock expired or was taken over - another worker may start a run")
+            return
+
+
+def acquire_running() -> bool:
+    """
+    Mark the current tenant's sync as running (across workers when Redis is available)
+
+    Returns:
+        bool: False if another run already holds the lock
+    """
+    redis_client = clients.redis_client()
+    running = _local_running()
+    token = None
+
+    if redis_client:
+        token = secrets.token_hex(16)
+        try:
+            acquired = redis_client.set(_running_key(), token, nx=True, ex=_running_ttl())
+            if not acquired:
+                return False
+        except clients.RedisError as e:
+            print(f"⚠ Could not take sync lock: {e}")
+            token = None
+
+    if running["running"]:
+        if token:
+            _release_lock(redis_client, token)
+        return False
+
+    running.update(running=True, token=token, stop=None)
+    global _process_runs_started
+    with _process_runs_lock:
+        _process_runs.add(tenants.current().tenant_id)
+        _process_runs_started += 1
+    if token:
+        running["stop"] = threading.Event()
+        threading.Thread(
+            target=_keep_alive, args=(_running_key(), token, _running_ttl(), running["stop"]),
+            name="sync-lock-renew", daemon=True
+        ).start()
+    return True
+
+
+def _release_lock(redis_client, token: str):
+    """Delete the Redis lock if it still holds token"""
+    try:
+        redis_client.eval(_RELEASE_SCRIPT, 1, _running_key(), token)
+    except clients.RedisError as e:
+        print(f"⚠ Could not release sync lock: {e}")
+
+
+def release_running():
+    """Clear the running flag and release the lock this worker holds"""
+    redis_client = clients.redis_client()
+    running = _local_running()
+    token, stop = running["token"], running["stop"]
+    running.update(running=False, token=None, stop=None)
+    with _process_runs_lock:
+        _process_runs.discard(tenants.current().tenant_id)
+
+    if stop:
+        stop.set()
+    if redis_client and token:
+        _release_lock(redis_client, token)
+
+
+def process_runs() -> Tuple[Set[str], int]:
+    """
+    Runs in this worker process, for every tenant
+
+    Returns:
+        tuple: (tenant IDs with a run in progress, runs started so far)
+    """
+    with _process_runs_lock:
+        return set(_process_runs), _process_runs_started
+
+
+def is_running() -> bool:
+    """Check whether the current tenant's sync is running on any worker"""
+    redis_client = clients.redis_client()
+    if _local_running()["running"]:
+        return True
+
+    if redis_client:
+        try:
+            return bool(redis_client.exists(_running_key()))
+        except clients.RedisError:
+            pass
+    return False
+
+
+def record_run(result: Dict[str, Any], started_at: str, finished_at: str):
+    """
+    Append a finished run to the history
+
+    Args:
+        result: Return value of sync_in_transit (or the error result)
+        started_at: ISO timestamp when the run started
+        finished_at: ISO timestamp when the run finished
+    """
+    redis_client = clients.redis_client()
+    errors = result.get("errors") or []
+    entry = {
+        **result,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "errors": errors[:MAX_ERRORS_STORED],
+        "error_count": len(errors)
+    }
+    _local_history().appendleft(entry)
+
+    if not redis_client:
+        return
+
+    try:
+        with clients.batch(transaction=True) as pipe:
+            pipe.lpush(_history_key(), json.dumps(entry, default=str))
+            pipe.ltrim(_history_key(), 0, SYNC_HISTORY_SIZE - 1)
+            if entry.get("duration_seconds") is not None:
+                pipe.lpush(_durations_key(), entry["duration_seconds"])
+                pipe.ltrim(_durations_key(), 0, SYNC_HISTORY_SIZE - 1)
+    except clients.RedisError as e:
+        print(f"⚠ Could not record sync history: {e}")
+
+
+def last_run() -> Optional[Dict[str, Any]]:
+    """Most recent run, or None if none recorded"""
+    runs, _ = get_history(limit=1)
+    return runs[0] if runs else None
+
+
+def get_history(limit: int = 20, offset: int = 0) -> tuple:
+    """
+    Page through recorded runs, newest first
+
+    Args:
+        limit: Runs per page
+        offset: Runs to skip
+
+    Returns:
+        tuple: (runs, total recorded)
+    """
+    redis_client = clients.redis_client()
+    if redis_client:
+        try:
+            with clients.batch(transaction=True) as pipe:
+                pipe.lrange(_history_key(), offset, offset + limit - 1)
+                pipe.llen(_history_key())
+            raw_runs, total = pipe.results
+            return [json.loads(raw) for raw in raw_runs], total
+        except clients.RedisError as e:
+            print(f"⚠ Could not read sync history: {e}")
+
+    runs = list(_local_history())
+    return runs[offset:offset + limit], len(runs)
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def duration_summary() -> Dict[str, Any]:
+    """
+    Run-duration summary over the stored history
+
+    Returns:
+        dict: runs, p50, p95, max and mean duration in seconds
+    """
+    redis_client = clients.redis_client()
+    durations: List[float] = []
+
+    if redis_client:
+        try:
+            durations = [float(d) for d in redis_client.lrange(_durations_key(), 0, -1)]
+        except clients.RedisError as e:
+            print(f"⚠ Could not read sync durations: {e}")
+    else:
+        durations = [r["duration_seconds"] for r in _local_history() if r.get("duration_seconds") is not None]
+
+    durations.sort()
+    return {
+        "runs": len(durations),
+        "p50_seconds": _percentile(durations, 50),
+        "p95_seconds": _percentile(durations, 95),
+        "max_seconds": durations[-1] if durations else None,
+        "mean_seconds": round(sum(durations) / len(durations), 3) if durations else None
+    }
@@ -0,0 +1,175 @@
+"""
+Live progress of the running sync
+
+The sync thread bumps plain in-process counters (single writer, no locks)
+and publishes them to a Redis hash at most once per PROGRESS_FLUSH_SECONDS,
+so any worker can report progress, Turvo throughput and an estimated
+completion time while a run is in progress. Each tenant's run has its own
+progress.
+"""
+
+import time
+import asyncio
+from typing import Dict, Any, Optional
+
+from . import clients, tenants
+
+PROGRESS_FLUSH_SECONDS = 1.0
+PROGRESS_TTL_SECONDS = 3600  # Outlives the run so the final numbers stay visible
+
+COUNTERS = (
+    "shipments_listed",   # From /shipments/list
+    "shipments_total",    # Left after the status filter - what this run works through
+    "shipments_checked",  # Went through prefilter/dedup/fetch (ETA is based on this)
+    "details_fetched",
+    "payloads_built",
+    "calls_queued",
+    "turvo_requests",
+)
+
+
+def _progress_key() -> str:
+    return tenants.current().key("sync_progress")
+
+
+class SyncProgress:
+    """Progress counters for one run"""
+
+    def __init__(self):
+        self.tenant = tenants.current()
+        self.started_at = time.time()
+        self.fetch_started_at = 0.0
+        self.phase = "listing"
+        self.counts: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self._turvo_requests_at_start = self.tenant.requests_made
+        self._last_flush = 0.0
+
+    def incr(self, name: str, amount: int = 1):
+        """Bump a counter (publishes if the last flush is old enough)"""
+        self.counts[name] += amount
+        if time.monotonic() - self._last_flush >= PROGRESS_FLUSH_SECONDS:
+            self.flush()
+
+    def set(self, phase: Optional[str] = None, **counts: int):
+        """Set the phase and/or absolute counter values, then publish"""
+        if phase:
+            self.phase = phase
+            if phase == "fetching":
+                self.fetch_started_at = time.time()
+        self.counts.update(counts)
+        self.flush()
+
+    def flush(self):
+        """Publish the current counters"""
+        redis_client = clients.redis_client()
+        self._last_flush = time.monotonic()
+        self.counts["turvo_requests"] = self.tenant.requests_made - self._turvo_requests_at_start
+
+        state = {
+            "phase": self.phase,
+            "started_at": self.started_at,
+            "fetch_started_at": self.fetch_started_at,
+            "updated_at": time.time(),
+            **self.counts
+        }
+        self.tenant.local("sync_progress.last", dict).update(state)
+
+        if not redis_client:
+            return
+
+        key = self.tenant.key("sync_progress")
+        try:
+            with clients.batch(transaction=True) as pipe:
+                pipe.hset(key, mapping=state)
+                pipe.expire(key, PROGRESS_TTL_SECONDS)
+        except clients.RedisError as e:
+            print(f"⚠ Could not publish sync progress: {e}")
+
+    def finish(self):
+        """Mark the run done and publish the final counters"""
+        self.set(phase="done")
+
+
+def start() -> SyncProgress:
+    """Begin tracking a new run (for the current tenant)"""
+    progress = SyncProgress()
+    progress.flush()
+    return progress
+
+
+def _decode(raw: Dict[bytes, bytes]) -> Dict[str, str]:
+    return {k.decode(): v.decode() for k, v in raw.items()}
+
+
+def read() -> Optional[Dict[str, Any]]:
+    """
+    Latest published progress of the current tenant, with derived throughput and ETA
+
+    Returns:
+        dict: Counters plus elapsed_seconds, turvo_requests_per_sec,
+              shipments_per_sec and estimated_completion (epoch seconds),
+              or None if no run has published progress
+    """
+    redis_client = clients.redis_client()
+    # Last state published in this process (used without Redis)
+    state = tenants.current().local("sync_progress.last", dict)
+
+    if redis_client:
+        try:
+            raw = redis_client.hgetall(_progress_key())
+            if raw:
+                state = _decode(raw)
+        except clients.RedisError as e:
+            print(f"⚠ Could not read sync progress: {e}")
+
+    return _derive(state)
+
+
+async def read_async() -> Optional[Dict[str, Any]]:
+    """read() for the event loop - awaits Redis instead of blocking it"""
+    redis_client = clients.async_redis_client()
+    if redis_client is None:
+        return await asyncio.to_thread(read)
+
+    state = tenants.current().local("sync_progress.last", dict)
+    try:
+        raw = await redis_client.hgetall(_progress_key())
+        if raw:
+            state = _decode(raw)
+    except clients.RedisError as e:
+        print(f"⚠ Could not read sync progress: {e}")
+
+    return _derive(state)
+
+
+def _derive(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Published counters -> progress with throughput and ETA"""
+    if not state:
+        return None
+
+    progress = {"phase": state["phase"]}
+    for name in ("started_at", "updated_at"):
+        progress[name] = float(state[name])
+    for name in COUNTERS:
+        progress[name] = int(float(state.get(name, 0)))
+
+    end = progress["updated_at"] if progress["phase"] == "done" else time.time()
+    elapsed = max(end - progress["started_at"], 1e-6)
+    progress["elapsed_seconds"] = round(elapsed, 1)
+    progress["turvo_requests_per_sec"] = round(progress["turvo_requests"] / elapsed, 2)
+
+    # Shipment throughput since fetching began (listing time would skew the ETA)
+    fetch_started_at = float(state.get("fetch_started_at") or 0)
+    fetch_elapsed = max(end - fetch_started_at, 1e-6) if fetch_started_at else 0
+    shipments_per_sec = progress["shipments_checked"] / fetch_elapsed if fetch_elapsed else 0.0
+    progress["shipments_per_sec"] = round(shipments_per_sec, 2)
+
+    remaining = progress["shipments_total"] - progress["shipments_checked"]
+    if progress["phase"] == "done":
+        progress["estimated_completion"] = progress["updated_at"]
+    elif shipments_per_sec and remaining >= 0:
+        progress["estimated_completion"] = round(time.time() + remaining / shipments_per_sec, 1)
+    else:
+        progress["estimated_completion"] = None
+
+    return progress
@@ -0,0 +1,448 @@
+"""
+Tenants: one Turvo account each, served by the same deployment
+
+A tenant carries its Turvo credentials and connection settings, the
+HappyRobot webhook URL, its call policy (windows, owner filter) and the
+prefix of every Redis key it owns (token cache, dedup, history, progress,
+fleet index, event state). It also holds its own HTTP session, rate limiter
+and in-process caches, so concurrent syncs for different tenants share
+nothing but the Redis connection pool.
+
+Without TENANTS_FILE there is a single tenant, "default", configured from
+the usual environment variables and using the original Redis key prefix.
+
+TENANTS_FILE is a JSON object of tenant ID -> settings. Settings left out
+fall back to those environment variables, and "${VAR}" in values is
+expanded from the environment, so secrets can stay out of the file:
+
+    {
+      "motus": {"key_prefix": "019b0e1e-f561-7a0a-97a4-11058661c03e"},
+      "acme": {
+        "turvo_api_key": "${ACME_TURVO_API_KEY}",
+        "turvo_username": "dispatch@acme.com",
+        "turvo_password": "${ACME_TURVO_PASSWORD}",
+        "webhook_url": "https://hooks.happyrobot.ai/acme",
+        "allowed_owner_ids": "5564",
+        "call_window_1": [2, 3],
+        "max_rps": 5
+      }
+    }
+
+Call policy (windows, owner filter, webhook, max_rps) can be changed on a
+running server: edit TENANTS_FILE, which each sync checks for changes, or
+POST /config/reload, which every worker picks up through Redis (see
+reload()). Other settings need a restart.
+
+The tenant a piece of code works for is held in a context variable - set it
+with activate(); current() falls back to the default tenant.
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Dict, Any, Callable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import clients, settings
+
+# Namespace of the original single-tenant Redis keys (kept by the "default" tenant)
+DEFAULT_KEY_PREFIX = "019b0e1e-f561-7a0a-97a4-11058661c03e"
+
+
+@dataclass
+class Tenant:
+    """One Turvo account with its credentials, policy and isolated runtime state"""
+    tenant_id: str
+    key_prefix: str
+    turvo_base_url: str = "https://publicapi.turvo.com/v1"
+    turvo_api_key: Optional[str] = field(default=None, repr=False)
+    turvo_username: Optional[str] = None
+    turvo_password: Optional[str] = field(default=None, repr=False)
+    webhook_url: Optional[str] = None
+
+    # Webhook body: "standard" or "compact", compressed with "none", "gzip" or "zstd"
+    webhook_format: str = "standard"
+    webhook_compression: str = "none"
+
+    # Two-window call system (hours before delivery)
+    call_window_1_min: float = 3.0
+    call_window_1_max: float = 4.0
+    call_window_2_min: float = 0.0
+    call_window_2_max: float = 0.5
+
+    # Owner filtering (comma-separated - leave both empty to allow all owners)
+    allowed_owners: str = ""
+    allowed_owner_ids: str = ""
+
+    # Turvo requests per second (0 = unlimited) and pooled connections
+    max_rps: float = 0.0
+    pool_size: int = 10
+
+    # Runtime state - never configured, never shared between tenants
+    requests_made: int = field(default=0, init=False, repr=False, compare=False)
+    _session: Optional[requests.Session] = field(default=None, init=False, repr=False, compare=False)
+    _next_request_at: float = field(default=0.0, init=False, repr=False, compare=False)
+    _local: Dict[str, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.webhook_format not in ("standard", "compact"):
+            raise ValueError(f"Tenant {self.tenant_id}: webhook_format must be standard or compact")
+        if self.webhook_compression not in ("none", "gzip", "zstd"):
+            raise ValueError(f"Tenant {self.tenant_id}: webhook_compression must be none, gzip or zstd")
+        for window in ("call_window_1", "call_window_2"):
+            low, high = getattr(self, f"{window}_min"), getattr(self, f"{window}_max")
+            if not all(isinstance(value, (int, float)) for value in (low, high)) or low > high:
+                raise ValueError(f"Tenant {self.tenant_id}: {window} must be [min, max] hours")
+        if not isinstance(self.max_rps, (int, float)) or self.max_rps < 0:
+            raise ValueError(f"Tenant {self.tenant_id}: max_rps must be a number >= 0")
+
+    def key(self, *parts: Any) -> str:
+        """Redis key in this tenant's namespace, e.g. key("in_transit", "urgency")"""
+        return ":".join([self.key_prefix, *map(str, parts)])
+
+    def session(self) -> requests.Session:
+        """This tenant's Turvo HTTP session (its own connection pool)"""
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def throttle(self):
+        """Wait for this tenant's next request slot (max_rps) - other tenants are unaffected"""
+        if self.max_rps <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at)
+            self._next_request_at = slot + 1 / self.max_rps
+
+        if slot > now:
+            time.sleep(slot - now)
+
+    def local(self, name: str, factory: Callable[[], Any]) -> Any:
+        """
+        Per-tenant in-process state (caches and fallbacks used without Redis)
+
+        Args:
+            name: Owner-qualified name, e.g. "shipment_events.states"
+            factory: Builds the initial value on first use
+
+        Returns:
+            The tenant's instance of that state
+        """
+        with self._lock:
+            if name not in self._local:
+                self._local[name] = factory()
+            return self._local[name]
+
+    def policy(self) -> Dict[str, Any]:
+        """Current call policy (the RELOADABLE settings)"""
+        return {name: getattr(self, name) for name in RELOADABLE}
+
+    def secrets(self) -> tuple:
+        """Credentials to keep out of logs and captures"""
+        return tuple(value for value in (self.turvo_api_key, self.turvo_password) if value)
+
+    def close(self):
+        """Close the HTTP session (server shutdown)"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_FIELD_NAMES = {name for name in Tenant.__dataclass_fields__ if not name.startswith("_") and name != "requests_made"}
+
+# Call policy that reload() can change on a running server. Anything else -
+# credentials, base URL, key prefix, pool size, the set of tenants - needs a restart.
+RELOADABLE = frozenset((
+    "webhook_url", "webhook_format", "webhook_compression",
+    "call_window_1_min", "call_window_1_max", "call_window_2_min", "call_window_2_max",
+    "allowed_owners", "allowed_owner_ids", "max_rps",
+))
+
+_tenants: Optional[Dict[str, Tenant]] = None
+_tenants_mtime: Optional[float] = None
+
+# Settings changed with reload(changes): tenant ID -> values, and the version
+# of the copy published in Redis that this process has applied
+_OVERRIDES_KEY = f"{DEFAULT_KEY_PREFIX}:config_overrides"
+_overrides: Dict[str, Dict[str, Any]] = {}
+_overrides_version = 0
+_tenants_lock = threading.Lock()
+_current: contextvars.ContextVar = contextvars.ContextVar("tenant", default=None)
+
+
+def _normalize(tenant_id: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    values = {
+        name: os.path.expandvars(value) if isinstance(value, str) else value
+        for name, value in values.items()
+    }
+    for window in ("call_window_1", "call_window_2"):
+        if window in values:
+            values[f"{window}_min"], values[f"{window}_max"] = values.pop(window)
+
+    unknown = set(values) - _FIELD_NAMES
+    if unknown:
+        raise ValueError(f"Tenant {tenant_id}: unknown settings {sorted(unknown)}")
+    return values
+
+
+def _from_settings(tenant_id: str, values: Dict[str, Any]) -> Tenant:
+    values = _normalize(tenant_id, values)
+    values.setdefault(
+        "key_prefix", DEFAULT_KEY_PREFIX if tenant_id == "default" else f"{DEFAULT_KEY_PREFIX}:{tenant_id}"
+    )
+    return Tenant(tenant_id=tenant_id, **{**settings.get().tenant_defaults(), **values})
+
+
+def _read_file(tenants_file: str) -> Dict[str, Tenant]:
+    with open(tenants_file) as f:
+        config = json.load(f)
+    if not config:
+        raise ValueError(f"No tenants in {tenants_file}")
+
+    loaded = {tenant_id: _from_settings(tenant_id, values) for tenant_id, values in config.items()}
+
+    prefixes = [tenant.key_prefix for tenant in loaded.values()]
+    if len(set(prefixes)) != len(prefixes):
+        raise ValueError(f"Tenants in {tenants_file} share a key_prefix")
+    return loaded
+
+
+def _load() -> Dict[str, Tenant]:
+    global _tenants_mtime
+    tenants_file = settings.get().tenants_file
+    if not tenants_file:
+        return {"default": _from_settings("default", {})}
+
+    _tenants_mtime = os.path.getmtime(tenants_file)
+    loaded = _read_file(tenants_file)
+    print(f"✓ Loaded {len(loaded)} tenants: {', '.join(loaded)}")
+    return loaded
+
+
+def _base() -> Dict[str, Tenant]:
+    """Tenants as TENANTS_FILE (or the environment) defines them, without overrides"""
+    tenants_file = settings.get().tenants_file
+    if tenants_file:
+        return _read_file(tenants_file)
+    return {"default": _from_settings("default", {})}
+
+
+def _read_overrides() -> Optional[tuple]:
+    """(version, tenant ID -> settings) published by reload(changes), or None without Redis"""
+    if not clients.redis_client():
+        return None
+    try:
+        with clients.batch() as pipe:
+            pipe.get(f"{_OVERRIDES_KEY}:version")
+            pipe.hgetall(_OVERRIDES_KEY)
+    except clients.RedisError as e:
+        print(f"⚠ Could not read published tenant settings: {e}")
+        return None
+    version, raw = pipe.results
+    return int(version or 0), {tenant_id.decode(): json.loads(values) for tenant_id, values in raw.items()}
+
+
+def _publish_overrides(overrides: Dict[str, Dict[str, Any]]) -> Optional[int]:
+    """Replace the published overrides ({} clears them) - returns the new version"""
+    if not clients.redis_client():
+        return None
+    try:
+        with clients.batch(transaction=True) as pipe:
+            pipe.delete(_OVERRIDES_KEY)
+            if overrides:
+                pipe.hset(_OVERRIDES_KEY, mapping={
+                    tenant_id: json.dumps(values) for tenant_id, values in overrides.items()
+                })
+            pipe.incr(f"{_OVERRIDES_KEY}:version")
+    except clients.RedisError as e:
+        print(f"⚠ Settings changed on this worker only - could not publish them: {e}")
+        return None
+    return pipe.results[-1]
+
+
+def _apply(wanted: Dict[str, Tenant], check_removed: bool) -> Dict[str, Any]:
+    """Copy the RELOADABLE differences of wanted onto the running tenants"""
+    running = {tenant.tenant_id: tenant for tenant in all_tenants()}
+    changed: Dict[str, List[str]] = {}
+    restart_required = [f"{tenant_id}: added" for tenant_id in wanted if tenant_id not in running]
+    if check_removed:
+        restart_required += [f"{tenant_id}: removed" for tenant_id in running if tenant_id not in wanted]
+
+    for tenant_id, new in wanted.items():
+        tenant = running.get(tenant_id)
+        if tenant is None:
+            continue
+        differences = [name for name in sorted(_FIELD_NAMES) if getattr(new, name) != getattr(tenant, name)]
+        if any(name in RELOADABLE for name in differences):
+            changed[tenant_id] = [name for name in differences if name in RELOADABLE]
+        restart_required += [f"{tenant_id}: {name}" for name in differences if name not in RELOADABLE]
+
+    with _tenants_lock:
+        for tenant_id, names in changed.items():
+            for name in names:
+                setattr(running[tenant_id], name, getattr(wanted[tenant_id], name))
+
+    summary = "; ".join(f"{tenant_id}: {', '.join(names)}" for tenant_id, names in changed.items())
+    print(f"✓ Reloaded tenant settings | {summary or 'no changes'}")
+    if restart_required:
+        print(f"⚠ Restart needed to apply: {', '.join(restart_required)}")
+    return {"changed": changed, "restart_required": restart_required}
+
+
+def _with_overrides(base: Dict[str, Tenant], overrides: Dict[str, Dict[str, Any]]) -> Dict[str, Tenant]:
+    return {
+        tenant_id: replace(tenant, **overrides[tenant_id]) if tenant_id in overrides else tenant
+        for tenant_id, tenant in base.items()
+    }
+
+
+def reload(changes: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Apply call-policy changes to the running tenants, without a restart
+
+    Args:
+        changes: Tenant ID -> settings to change, in TENANTS_FILE form (RELOADABLE
+                 settings only). They are published through Redis, so every
+                 worker applies them at its next sync or event (workers
+                 started later too), and stay on top of TENANTS_FILE until
+                 a reload without changes. Without Redis they apply to this
+                 process only, until it restarts.
+                 None re-reads TENANTS_FILE and drops published changes.
+
+    Returns:
+        Dict with "changed" (tenant ID -> settings updated on this worker) and
+        "restart_required" (differences in TENANTS_FILE that only a restart applies)
+
+    Raises:
+        ValueError: Invalid settings, unknown tenant or no TENANTS_FILE to re-read -
+                    nothing is applied
+    """
+    global _tenants_mtime, _overrides, _overrides_version
+    running = {tenant.tenant_id: tenant for tenant in all_tenants()}
+
+    if changes is None:
+        tenants_file = settings.get().tenants_file
+        if not tenants_file:
+            raise ValueError("TENANTS_FILE is not set - send the changes to apply instead")
+        mtime = os.path.getmtime(tenants_file)
+        result = _apply(_read_file(tenants_file), check_removed=True)
+        _tenants_mtime = mtime
+        overrides: Dict[str, Dict[str, Any]] = {}
+    else:
+        published = _read_overrides()
+        overrides = {tenant_id: dict(values) for tenant_id, values in (published[1] if published else _overrides).items()}
+        wanted = {}
+        for tenant_id, values in changes.items():
+            if tenant_id not in running:
+                raise ValueError(f"Unknown tenant: {tenant_id}")
+            values = _normalize(tenant_id, values)
+            fixed = sorted(set(values) - RELOADABLE)
+            if fixed:
+                raise ValueError(f"Tenant {tenant_id}: {fixed} can't be changed without a restart")
+            wanted[tenant_id] = replace(running[tenant_id], **values)
+            overrides.setdefault(tenant_id, {}).update(values)
+        result = _apply(wanted, check_removed=False)
+
+    _overrides = overrides
+    version = _publish_overrides(overrides)
+    if version is not None:
+        _overrides_version = version
+    return result
+
+
+def maybe_reload():
+    """
+    Follow TENANTS_FILE edits and settings other workers published
+
+    Called at the start of every sync and event, so each worker process
+    follows the file and POST /config/reload bodies without a restart. An
+    invalid file is reported once and ignored.
+    """
+    global _tenants_mtime, _overrides, _overrides_version
+    if _tenants is None:
+        return
+
+    tenants_file = settings.get().tenants_file
+    mtime = None
+    if tenants_file:
+        try:
+            mtime = os.path.getmtime(tenants_file)
+        except OSError as e:
+            print(f"⚠ Keeping current tenant settings: {e}")
+            return
+
+    published = _read_overrides()
+    if mtime == _tenants_mtime and (published is None or published[0] == _overrides_version):
+        return
+
+    overrides = published[1] if published else _overrides
+    try:
+        _apply(_with_overrides(_base(), overrides), check_removed=bool(tenants_file))
+    except (OSError, ValueError) as e:
+        print(f"⚠ Keeping current tenant settings, {tenants_file} not applied: {e}")
+    _tenants_mtime = mtime  # Report each bad edit once
+    _overrides = overrides
+    if published:
+        _overrides_version = published[0]
+
+
+def all_tenants() -> List[Tenant]:
+    """Every configured tenant (the default one first)"""
+    global _tenants
+    with _tenants_lock:
+        if _tenants is None:
+            _tenants = _load()
+        return list(_tenants.values())
+
+
+def get(tenant_id: Optional[str]) -> Optional[Tenant]:
+    """
+    Look up a tenant
+
+    Args:
+        tenant_id: Tenant ID (None for the default tenant)
+
+    Returns:
+        Tenant or None if there is no such tenant
+    """
+    tenants = all_tenants()
+    if tenant_id is None:
+        return tenants[0]
+    return next((tenant for tenant in tenants if tenant.tenant_id == tenant_id), None)
+
+
+def current() -> Tenant:
+    """The tenant the running code works for (the default tenant if none is active)"""
+    return _current.get() or all_tenants()[0]
+
+
+@contextmanager
+def activate(tenant: Tenant):
+    """Make tenant current for the enclosed block (this thread / task only)"""
+    token = _current.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current.reset(token)
+
+
+def close_all():
+    """Close every tenant's HTTP session (server shutdown)"""
+    if _tenants:
+        for tenant in _tenants.values():
+            tenant.close()
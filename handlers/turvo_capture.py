@@ -0,0 +1,223 @@
+"""
+Record and replay Turvo API traffic
+
+With TURVO_CAPTURE_PATH set, every Turvo GET (request, status, timing and
+body) is appended to a gzip JSONL archive. Credentials are never written:
+auth headers aren't recorded and any configured secret that shows up in a
+body is redacted.
+
+With TURVO_REPLAY_PATH set, turvo_client serves requests from such an
+archive instead of the network (no token is fetched), so a production run
+can be reproduced, profiled and optimized offline:
+
+    TURVO_REPLAY_PATH=capture.jsonl.gz TURVO_REPLAY_SPEED=0 python -c \\
+        "from handlers import in_transit; in_transit.sync_in_transit()"
+
+Timestamps in replayed bodies are shifted by (replay start - capture start)
+so shipments land in the same call windows they were in when captured.
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Tuple
+
+import requests
+
+from . import settings, tenants
+
+# Configuration
+TURVO_CAPTURE_PATH = os.getenv("TURVO_CAPTURE_PATH")
+TURVO_REPLAY_PATH = os.getenv("TURVO_REPLAY_PATH")
+# 1 = original latencies, 2 = twice as fast, 0 = no delay
+TURVO_REPLAY_SPEED = float(os.getenv("TURVO_REPLAY_SPEED", "1"))
+TURVO_REPLAY_SHIFT_TIMES = os.getenv("TURVO_REPLAY_SHIFT_TIMES", "true").lower() == "true"
+
+# Values too short to be real credentials would redact ordinary text in bodies
+_MIN_SECRET_LENGTH = 8
+_KEPT_HEADERS = ("content-type", "retry-after")
+_ISO_TIMESTAMP = re.compile(r'"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d+)?(Z|[+-]\d{2}:\d{2})"')
+
+_capture_file = None
+_capture_lock = threading.Lock()
+
+# (tenant, endpoint, params) -> recorded entries, served in order (the last one repeats)
+_replay_entries: Optional[Dict[Tuple[str, str, str], deque]] = None
+_replay_shift: Optional[timedelta] = None
+# Tenant syncs and warm-up replay concurrently: one thread loads, the rest wait
+_replay_lock = threading.Lock()
+
+
+def _request_key(tenant_id: str, endpoint: str, params: Optional[Dict[str, Any]]) -> Tuple[str, str, str]:
+    return tenant_id, endpoint, json.dumps({k: str(v) for k, v in (params or {}).items()}, sort_keys=True)
+
+
+def _scrub(text: str, token: Optional[str]) -> str:
+    api_key = settings.get().api_secret_key
+    secrets = ((api_key,) if api_key else ()) + tenants.current().secrets() + ((token,) if token else ())
+    for secret in secrets:
+        if len(secret) >= _MIN_SECRET_LENGTH:
+            text = text.replace(secret, "[REDACTED]")
+    return text
+
+
+def capturing() -> bool:
+    return bool(TURVO_CAPTURE_PATH)
+
+
+def replaying() -> bool:
+    return bool(TURVO_REPLAY_PATH)
+
+
+def record(
+    endpoint: str,
+    params: Optional[Dict[str, Any]],
+    response: Optional[requests.Response],
+    seconds: float,
+    token: Optional[str] = None,
+    error: Optional[Exception] = None
+):
+    """
+    Append one request to the capture archive
+
+    Args:
+        endpoint: API endpoint (e.g., "/shipments/123")
+        params: Query parameters
+        response: Response received (None if the request failed)
+        seconds: Request latency
+        token: Bearer token used (redacted if it appears in the body)
+        error: Exception raised instead of a response
+    """
+    global _capture_file
+
+    entry = {
+        "captured_at": time.time(),
+        "tenant": tenants.current().tenant_id,
+        "endpoint": endpoint,
+        "params": params or {},
+        "seconds": round(seconds, 4)
+    }
+    if response is not None:
+        entry["status"] = response.status_code
+        entry["headers"] = {k: v for k, v in response.headers.items() if k.lower() in _KEPT_HEADERS}
+        entry["body"] = _scrub(response.content.decode("utf-8", "replace"), token)
+    else:
+        entry["error"] = f"{type(error).__name__}: {_scrub(str(error), token)}"
+
+    line = json.dumps(entry) + "\n"
+    with _capture_lock:
+        try:
+            if _capture_file is None:
+                # Append mode adds a gzip member per process - still one readable archive
+                _capture_file = gzip.open(TURVO_CAPTURE_PATH, "at", encoding="utf-8")
+            _capture_file.write(line)
+            _capture_file.flush()
+        except OSError as e:
+            print(f"⚠ Could not write Turvo capture: {e}")
+
+
+def close_capture():
+    """Finish the capture archive (call on shutdown)"""
+    global _capture_file
+    with _capture_lock:
+        if _capture_file is not None:
+            _capture_file.close()
+            _capture_file = None
+
+
+def _shift_timestamps(body: str) -> str:
+    def shift(match):
+        try:
+            moved = datetime.fromisoformat(match.group(1) + ("+00:00" if match.group(3) == "Z" else match.group(3)))
+        except ValueError:
+            return match.group(0)
+        moved += _replay_shift
+        offset = "Z" if match.group(3) == "Z" else moved.isoformat()[-6:]
+        return f'"{moved.strftime("%Y-%m-%dT%H:%M:%S")}{match.group(2) or ""}{offset}"'
+
+    return _ISO_TIMESTAMP.sub(shift, body)
+
+
+def _load_archive() -> Dict[Tuple[str, str, str], deque]:
+    """Read the replay archive once (the first caller loads it, concurrent ones wait for it)"""
+    global _replay_entries, _replay_shift
+
+    with _replay_lock:
+        if _replay_entries is not None:
+            return _replay_entries
+
+        entries, shift = _read_archive()
+        # Published complete - the shift first, as replay() reads it without the lock
+        _replay_shift = shift
+        _replay_entries = entries
+        return entries
+
+
+def _read_archive() -> Tuple[Dict[Tuple[str, str, str], deque], timedelta]:
+    replay_entries = defaultdict(deque)
+    first_captured_at = None
+    with gzip.open(TURVO_REPLAY_PATH, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if first_captured_at is None:
+                first_captured_at = entry["captured_at"]
+            # Each tenant replays its own traffic (archives without a tenant are the default one's)
+            replay_entries[_request_key(entry.get("tenant", "default"), entry["endpoint"], entry["params"])].append(entry)
+
+    shift = timedelta(seconds=time.time() - first_captured_at) if first_captured_at else timedelta()
+    count = sum(len(entries) for entries in replay_entries.values())
+    print(f"✓ Loaded Turvo replay archive | {count} requests | shifted by {shift}")
+    return replay_entries, shift
+
+
+def replay(endpoint: str, params: Optional[Dict[str, Any]]) -> requests.Response:
+    """
+    Serve a request from the replay archive (the current tenant's recorded traffic)
+
+    Sleeps for the recorded latency divided by TURVO_REPLAY_SPEED.
+
+    Args:
+        endpoint: API endpoint (e.g., "/shipments/123")
+        params: Query parameters
+
+    Returns:
+        requests.Response: Recorded response (404 if the archive has no such request)
+
+    Raises:
+        requests.ConnectionError: If the recorded request failed without a response
+    """
+    replay_entries = _replay_entries if _replay_entries is not None else _load_archive()
+
+    entries = replay_entries.get(_request_key(tenants.current().tenant_id, endpoint, params))
+    response = requests.models.Response()
+    response.url = f"replay:{endpoint}"
+
+    if not entries:
+        print(f"⚠ Not in replay archive: {endpoint} {params or ''}")
+        response.status_code = 404
+        response._content = b'{"Status": "ERROR", "details": {"errorMessage": "Not in replay archive"}}'
+        return response
+
+    with _replay_lock:
+        entry = entries.popleft() if len(entries) > 1 else entries[0]
+    if TURVO_REPLAY_SPEED > 0:
+        time.sleep(entry["seconds"] / TURVO_REPLAY_SPEED)
+
+    if "error" in entry:
+        raise requests.ConnectionError(f"Replayed failure: {entry['error']}")
+
+    body = entry["body"]
+    if TURVO_REPLAY_SHIFT_TIMES and _replay_shift:
+        body = _shift_timestamps(body)
+
+    response.status_code = entry["status"]
+    response.headers.update(entry.get("headers", {}))
+    response._content = body.encode("utf-8")
+    return response
@@ -1,37 +1,202 @@
 """
 Turvo API Client with OAuth2 authentication and token caching
+
+Requests go out as the current tenant (see tenants.py): its credentials,
+token cache, HTTP session and rate limit. Timeouts adapt to observed
+latency and slow GETs are hedged (see turvo_latency.py). Each endpoint
+family has a circuit breaker (see circuit_breaker.py).
 """
 
 import os
 import json
-import redis
+import time
 import requests
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, TypedDict
+
+from . import circuit_breaker, clients, metrics, state_store, tenants, turvo_capture, turvo_latency
+
+try:
+    import orjson  # Optional - ~2-3x faster decoding of large shipment documents
+except ImportError:
+    orjson = None
+
+# Configuration (credentials and base URL are per tenant - see tenants.py)
+
+# Project shipment details down to the fields the sync reads (set "false" to keep full documents)
+TURVO_LEAN_DECODE = os.getenv("TURVO_LEAN_DECODE", "true").lower() == "true"
+
+# Safety limit on /shipments/list pages per listing (100 shipments per page)
+TURVO_MAX_LIST_PAGES = int(os.getenv("TURVO_MAX_LIST_PAGES", "100"))
+
+# Requests sent to Turvo by this process, all tenants (Tenant.requests_made counts per tenant)
+requests_made = 0
+
+
+# Compact shipment snapshot: same key names as the Turvo document (so every
+# turvo_utils extractor works unchanged) but only the fields the sync reads.
+
+class StopSnapshot(TypedDict, total=False):
+    id: int
+    sequence: int
+    name: str
+    state: str
+    stopType: Dict[str, Any]        # {"value"}
+    address: Dict[str, Any]         # {"city", "state", "line1"}
+    etaToStop: Dict[str, Any]       # {"etaValue", "nextStopMiles"}
+    appointment: Dict[str, Any]     # {"date"}
+    notes: Optional[str]
+
+
+class CarrierOrderSnapshot(TypedDict, total=False):
+    deleted: bool
+    carrier: Dict[str, Any]         # {"id", "name"}
+    drivers: List[Dict[str, Any]]   # last driver only: [{"context": {"name", "phones": [first phone]}}]
+
+
+class CustomerOrderSnapshot(TypedDict, total=False):
+    deleted: bool
+    customer: Dict[str, Any]        # {"id", "name", "owner": {"id", "name"}}
+
+
+class ShipmentSnapshot(TypedDict, total=False):
+    id: int
+    customId: str
+    status: Dict[str, Any]          # {"code": {"key"}, "notes"}
+    globalRoute: List[StopSnapshot]
+    carrierOrder: List[CarrierOrderSnapshot]
+    equipment: List[Dict[str, Any]]  # first entry only
+    customerOrder: List[CustomerOrderSnapshot]
+
+
+def _json_loads(raw: bytes) -> Any:
+    """Decode JSON with orjson when installed, stdlib json otherwise"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _pick(obj: Any, keys: tuple) -> Any:
+    """Copy only the given keys of a dict (non-dicts are returned as-is)"""
+    if not isinstance(obj, dict):
+        return obj
+    return {key: obj[key] for key in keys if key in obj}
+
 
-# Configuration
-REDIS_URL = os.getenv("REDIS_URL")
-TURVO_BASE_URL = os.getenv("TURVO_BASE_URL", "https://publicapi.turvo.com/v1")
-TURVO_API_KEY = os.getenv("TURVO_API_KEY")
-TURVO_USERNAME = os.getenv("TURVO_USERNAME")
-TURVO_PASSWORD = os.getenv("TURVO_PASSWORD")
+def _pick_list(items: Any, project) -> Any:
+    """Project every element of a list (non-lists are returned as-is)"""
+    if not isinstance(items, list):
+        return items
+    return [project(item) for item in items]
 
-# Redis client for token caching
-redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+
+def _project_stop(stop: Dict[str, Any]) -> StopSnapshot:
+    snapshot = _pick(stop, ("id", "sequence", "name", "state", "notes"))
+    if "stopType" in stop:
+        snapshot["stopType"] = _pick(stop["stopType"], ("value",))
+    if "address" in stop:
+        snapshot["address"] = _pick(stop["address"], ("city", "state", "line1"))
+    if "etaToStop" in stop:
+        snapshot["etaToStop"] = _pick(stop["etaToStop"], ("etaValue", "nextStopMiles"))
+    if "appointment" in stop:
+        snapshot["appointment"] = _pick(stop["appointment"], ("date",))
+    return snapshot
+
+
+def _project_driver(driver: Dict[str, Any]) -> Dict[str, Any]:
+    context = driver.get("context") if isinstance(driver, dict) else None
+    if not isinstance(context, dict):
+        return _pick(driver, ("context",))
+
+    snapshot = _pick(context, ("name",))
+    if "phones" in context:
+        phones = context["phones"]
+        snapshot["phones"] = [_pick(phones[0], ("number",))] if isinstance(phones, list) and phones else phones
+    return {"context": snapshot}
+
+
+def _project_carrier_order(carrier_order: Dict[str, Any]) -> CarrierOrderSnapshot:
+    snapshot = _pick(carrier_order, ("deleted",))
+    if "carrier" in carrier_order:
+        snapshot["carrier"] = _pick(carrier_order["carrier"], ("id", "name"))
+    if "drivers" in carrier_order:
+        drivers = carrier_order["drivers"]
+        # Only the most recent driver is ever used
+        snapshot["drivers"] = [_project_driver(drivers[-1])] if isinstance(drivers, list) and drivers else drivers
+    return snapshot
+
+
+def _project_customer_order(customer_order: Dict[str, Any]) -> CustomerOrderSnapshot:
+    snapshot = _pick(customer_order, ("deleted",))
+    customer = customer_order.get("customer")
+    if isinstance(customer, dict):
+        snapshot["customer"] = _pick(customer, ("id", "name"))
+        if "owner" in customer:
+            snapshot["customer"]["owner"] = _pick(customer["owner"], ("id", "name"))
+    elif "customer" in customer_order:
+        snapshot["customer"] = customer
+    return snapshot
+
+
+def project_shipment(details: Dict[str, Any]) -> ShipmentSnapshot:
+    """
+    Reduce a full shipment document to the fields the sync reads
+
+    Keeps globalRoute stops, the last driver of each carrier order,
+    equipment[0], customerOrder owners and status notes. Everything else
+    (costs, contacts, tracking pings, ...) is dropped right after decoding.
+
+    Args:
+        details: Full shipment object from /shipments/{id}
+
+    Returns:
+        ShipmentSnapshot: Compact shipment with the same key names
+    """
+    snapshot = _pick(details, ("id", "customId"))
+
+    status = details.get("status")
+    if isinstance(status, dict):
+        snapshot["status"] = _pick(status, ("notes",))
+        if "code" in status:
+            snapshot["status"]["code"] = _pick(status["code"], ("key",))
+    elif "status" in details:
+        snapshot["status"] = status
+
+    if "globalRoute" in details:
+        snapshot["globalRoute"] = _pick_list(details["globalRoute"], _project_stop)
+    if "carrierOrder" in details:
+        snapshot["carrierOrder"] = _pick_list(details["carrierOrder"], _project_carrier_order)
+    if "equipment" in details:
+        equipment = details["equipment"]
+        snapshot["equipment"] = [
+            _pick(equipment[0], ("type", "size", "temp", "tempUnits", "weight", "weightUnits", "description"))
+        ] if isinstance(equipment, list) and equipment else equipment
+    if "customerOrder" in details:
+        snapshot["customerOrder"] = _pick_list(details["customerOrder"], _project_customer_order)
+
+    return snapshot
 
 
 def get_turvo_token() -> str:
     """
     Get cached Turvo access token or fetch new one if expired
 
-    Token is cached in Redis with 12-hour expiration (with 5-min buffer)
+    Token is cached per tenant, in-process and in the state store (Redis or
+    SQLite), with 12-hour expiration (with 5-min buffer)
 
     Returns:
         str: Valid access token
     """
-    # Try Redis cache first
-    if redis_client:
-        cached_data = redis_client.get("019b0e1e-f561-7a0a-97a4-11058661c03e:auth_token")
+    store = clients.state_store()
+    tenant = tenants.current()
+    local = tenant.local("turvo_client.token", dict)
+
+    if local and time.time() < local["expires_at"]:
+        return local["access_token"]
+
+    # Try the shared state store next (another worker may have fetched it)
+    if store:
+        cached_data = store.get(tenant.key("auth_token"))
 
         if cached_data:
             try:
@@ -39,29 +204,43 @@ def get_turvo_token() -> str:
                 expires_at = datetime.fromisoformat(token_data["expires_at"])
 
                 if datetime.now(timezone.utc) < expires_at:
+                    local.update(access_token=token_data["access_token"], expires_at=expires_at.timestamp())
                     return token_data["access_token"]
             except (json.JSONDecodeError, KeyError, ValueError):
                 pass  # Invalid cache, fetch new token
 
     # Fetch new token
-
-    response = requests.post(
-        f"{TURVO_BASE_URL}/oauth/token",
-        headers={
-            "Content-Type": "application/json",
-            "x-api-key": TURVO_API_KEY
-        },
-        json={
-            "grant_type": "password",
-            "username": TURVO_USERNAME,
-            "password": TURVO_PASSWORD,
-            "client_id": "publicapi",
-            "client_secret": "secret",
-            "scope": "read+trust+write",
-            "type": "business"
-        },
-        timeout=10
-    )
+    global requests_made
+    requests_made += 1
+    tenant.requests_made += 1
+    breaker = circuit_breaker.get("turvo /oauth/token")
+    breaker.check()
+    tenant.throttle()
+    started = time.perf_counter()
+    try:
+        response = tenant.session().post(
+            f"{tenant.turvo_base_url}/oauth/token",
+            headers={
+                "Content-Type": "application/json",
+                "x-api-key": tenant.turvo_api_key
+            },
+            json={
+                "grant_type": "password",
+                "username": tenant.turvo_username,
+                "password": tenant.turvo_password,
+                "client_id": "publicapi",
+                "client_secret": "secret",
+                "scope": "read+trust+write",
+                "type": "business"
+            },
+            timeout=10
+        )
+    except requests.exceptions.RequestException:
+        breaker.record(False)
+        metrics.observe_turvo_request("/oauth/token", "error", time.perf_counter() - started)
+        raise
+    breaker.record(response.status_code < 500)
+    metrics.observe_turvo_request("/oauth/token", response.status_code, time.perf_counter() - started)
 
     response.raise_for_status()
     data = response.json()
@@ -71,48 +250,141 @@ def get_turvo_token() -> str:
 
     # Cache with 5-minute buffer to avoid expiration mid-request
     expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in - 300)
+    local.update(access_token=access_token, expires_at=expires_at.timestamp())
 
-    if redis_client:
-        redis_client.set(
-            "019b0e1e-f561-7a0a-97a4-11058661c03e:auth_token",
+    if store:
+        store.set(
+            tenant.key("auth_token"),
             json.dumps({
                 "access_token": access_token,
                 "expires_at": expires_at.isoformat()
             }),
-            ex=expires_in
+            expires_in
         )
 
     return access_token
 
 
-def turvo_get(endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def forget_turvo_token():
+    """Drop the current tenant's cached token, in-process and in the state store"""
+    tenant = tenants.current()
+    tenant.local("turvo_client.token", dict).clear()
+
+    store = clients.state_store()
+    if store:
+        try:
+            store.delete(tenant.key("auth_token"))
+        except state_store.StateError as e:
+            print(f"⚠ Could not drop cached Turvo token: {e}")
+
+
+def _send(tenant: tenants.Tenant, endpoint: str, token: str, params: Optional[Dict[str, Any]]) -> requests.Response:
+    """One GET attempt (the request or its hedge) - rate limited, timed and counted"""
+    global requests_made
+    requests_made += 1
+    tenant.requests_made += 1
+    tenant.throttle()
+
+    started = time.perf_counter()
+    try:
+        response = tenant.session().get(
+            f"{tenant.turvo_base_url}{endpoint}",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "x-api-key": tenant.turvo_api_key,
+                "Content-Type": "application/json"
+            },
+            params=params,
+            timeout=turvo_latency.timeout_for(endpoint, tenant)
+        )
+    except requests.exceptions.RequestException:
+        elapsed = time.perf_counter() - started
+        metrics.observe_turvo_request(endpoint, "error", elapsed)
+        turvo_latency.observe(endpoint, elapsed, tenant)
+        raise
+
+    elapsed = time.perf_counter() - started
+    metrics.observe_turvo_request(endpoint, response.status_code, elapsed)
+    turvo_latency.observe(endpoint, elapsed, tenant)
+    return response
+
+
+def _turvo_request(
+    endpoint: str, params: Optional[Dict[str, Any]] = None, retry_unauthorized: bool = True
+) -> requests.Response:
     """
-    Make authenticated GET request to Turvo API
+    Make authenticated GET request to Turvo API (as the current tenant)
 
     Args:
         endpoint: API endpoint (e.g., "/shipments/list")
         params: Query parameters
+        retry_unauthorized: On a 401, fetch a new token and try once more
 
     Returns:
-        dict: JSON response from API
+        requests.Response: Successful response (body not yet decoded)
     """
-    token = get_turvo_token()
+    global requests_made
+    tenant = tenants.current()
+
+    # Replayed runs never touch the network, not even for a token
+    token = None if turvo_capture.replaying() else get_turvo_token()
+
+    # Fail fast while this endpoint family is down (raises CircuitOpen)
+    breaker = None if turvo_capture.replaying() else circuit_breaker.get(f"turvo {metrics.endpoint_template(endpoint)}")
+    if breaker:
+        breaker.check()
+
+    started = time.perf_counter()
+    try:
+        if turvo_capture.replaying():
+            requests_made += 1
+            tenant.requests_made += 1
+            response = turvo_capture.replay(endpoint, params)
+            metrics.observe_turvo_request(endpoint, response.status_code, time.perf_counter() - started)
+        else:
+            hedge_after = turvo_latency.hedge_delay(endpoint, tenant)
+            if hedge_after is None:
+                response = _send(tenant, endpoint, token, params)
+            else:
+                response = turvo_latency.hedged(
+                    endpoint, lambda: _send(tenant, endpoint, token, params), hedge_after, tenant
+                )
+            breaker.record(response.status_code < 500)
+    except requests.exceptions.RequestException as e:
+        if breaker:
+            breaker.record(False)
+        if turvo_capture.replaying():
+            metrics.observe_turvo_request(endpoint, "error", time.perf_counter() - started)
+        if turvo_capture.capturing():
+            turvo_capture.record(endpoint, params, None, time.perf_counter() - started, token=token, error=e)
+        raise
+
+    if turvo_capture.capturing():
+        turvo_capture.record(endpoint, params, response, time.perf_counter() - started, token=token)
+
+    # A cached token Turvo no longer accepts (revoked, credentials changed) is
+    # dropped and the request retried once with a freshly fetched one
+    if response.status_code == 401 and token:
+        forget_turvo_token()
+        if retry_unauthorized:
+            return _turvo_request(endpoint, params, retry_unauthorized=False)
 
-    url = f"{TURVO_BASE_URL}{endpoint}"
+    response.raise_for_status()
+    return response
 
-    response = requests.get(
-        url,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "x-api-key": TURVO_API_KEY,
-            "Content-Type": "application/json"
-        },
-        params=params,
-        timeout=30
-    )
 
-    response.raise_for_status()
-    return response.json()
+def turvo_get(endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Make authenticated GET request to Turvo API
+
+    Args:
+        endpoint: API endpoint (e.g., "/shipments/list")
+        params: Query parameters
+
+    Returns:
+        dict: JSON response from API
+    """
+    return _json_loads(_turvo_request(endpoint, params).content)
 
 
 def list_shipments(status: Optional[int] = None, page_size: int = 100, start: int = 0) -> Dict[str, Any]:
@@ -173,7 +445,8 @@ def list_all_shipments(status: Optional[int] = None) -> list:
         page_num += 1
 
         # Safety limit to prevent infinite loops
-        if page_num >= 100:
+        if page_num >= TURVO_MAX_LIST_PAGES:
+            print(f"⚠ Stopped listing after {page_num} pages (TURVO_MAX_LIST_PAGES)")
             break
 
     return all_shipments
@@ -187,10 +460,45 @@ def get_shipment_details(shipment_id: int) -> Dict[str, Any]:
         shipment_id: Turvo shipment ID
 
     Returns:
-        dict: Full shipment object with globalRoute, drivers, etc.
+        dict: Shipment object with globalRoute, drivers, etc. (see decode_shipment_details)
     """
-    response = turvo_get(f"/shipments/{shipment_id}")
-    return response.get("details", {})
+    return decode_shipment_details(get_shipment_details_raw(shipment_id))
+
+
+def get_shipment_details_raw(shipment_id: int) -> bytes:
+    """
+    Get the undecoded response body for a specific shipment
+
+    Lets the caller decide where the (CPU-heavy) JSON decoding happens,
+    e.g. in a worker process.
+
+    Args:
+        shipment_id: Turvo shipment ID
+
+    Returns:
+        bytes: Raw JSON body of /shipments/{id}
+    """
+    return _turvo_request(f"/shipments/{shipment_id}").content
+
+
+def decode_shipment_details(raw: bytes) -> Dict[str, Any]:
+    """
+    Decode a raw /shipments/{id} body into the shipment object
+
+    Uses orjson when available and, with TURVO_LEAN_DECODE (default),
+    projects the result to a ShipmentSnapshot immediately.
+
+    Args:
+        raw: Raw JSON body from get_shipment_details_raw
+
+    Returns:
+        dict: Shipment object with globalRoute, drivers, etc.
+    """
+    details = _json_loads(raw).get("details", {})
+
+    if TURVO_LEAN_DECODE:
+        return project_shipment(details)
+    return details
 
 
 def get_user_details(user_id: int) -> Dict[str, Any]:
@@ -0,0 +1,264 @@
+"""
+Adaptive timeouts and hedged requests for Turvo
+
+A fixed 30 s timeout lets a handful of stuck requests set a run's wall
+time. Instead, every request's latency goes into a rolling window per
+tenant and endpoint (/shipments/{id}, /shipments/list, ...), and:
+
+- the timeout is TURVO_TIMEOUT_P99_FACTOR x the observed p99, kept between
+  TURVO_TIMEOUT_MIN_SECONDS and TURVO_TIMEOUT_SECONDS (the old fixed value,
+  also used until an endpoint has enough samples)
+- once a request has been outstanding for longer than the p95, a duplicate
+  (hedge) is sent and whichever answers first is used. Every request this
+  client sends is an idempotent GET, so the duplicate is harmless.
+
+Hedges are paid for from a per-tenant budget: each request earns
+TURVO_HEDGE_BUDGET of a hedge (0.05 = at most ~5% extra requests), with at
+most TURVO_HEDGE_BURST saved up. Hedges also go through the tenant's rate
+limiter, and run in the tenant's own pool of TURVO_HEDGE_WORKERS threads, so
+a slow tenant neither skews another's timeouts nor holds its hedge threads.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Deque, Dict, Any, Optional
+
+import requests
+
+from . import metrics, tenants
+
+# Configuration
+TURVO_TIMEOUT_SECONDS = float(os.getenv("TURVO_TIMEOUT_SECONDS", "30"))
+TURVO_TIMEOUT_MIN_SECONDS = float(os.getenv("TURVO_TIMEOUT_MIN_SECONDS", "2"))
+TURVO_TIMEOUT_P99_FACTOR = float(os.getenv("TURVO_TIMEOUT_P99_FACTOR", "3"))
+TURVO_HEDGE_BUDGET = float(os.getenv("TURVO_HEDGE_BUDGET", "0.05"))  # 0 = no hedging
+TURVO_HEDGE_BURST = float(os.getenv("TURVO_HEDGE_BURST", "10"))
+TURVO_HEDGE_WORKERS = int(os.getenv("TURVO_HEDGE_WORKERS", "16"))
+
+WINDOW_SIZE = 1000        # Latencies kept per endpoint
+MIN_SAMPLES = 50          # Below this, use the fixed timeout and don't hedge
+RECOMPUTE_EVERY = 25      # New samples between percentile updates
+
+_hedge_pool_lock = threading.Lock()
+
+
+class _Window:
+    """Rolling latency window of one endpoint with cached percentiles"""
+
+    def __init__(self):
+        self.samples: Deque[float] = deque(maxlen=WINDOW_SIZE)
+        self.since_recompute = 0
+        self.p50: Optional[float] = None
+        self.p95: Optional[float] = None
+        self.p99: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+            self.since_recompute += 1
+            if len(self.samples) >= MIN_SAMPLES and (self.p99 is None or self.since_recompute >= RECOMPUTE_EVERY):
+                ordered = sorted(self.samples)
+                last = len(ordered) - 1
+                self.p50 = ordered[int(last * 0.50)]
+                self.p95 = ordered[int(last * 0.95)]
+                self.p99 = ordered[int(last * 0.99)]
+                self.since_recompute = 0
+
+
+def _windows(tenant) -> Dict[str, _Window]:
+    return tenant.local("turvo_latency.windows", dict)
+
+
+def _window(endpoint: str, tenant=None) -> _Window:
+    windows = _windows(tenant or tenants.current())
+    template = metrics.endpoint_template(endpoint)
+    window = windows.get(template)
+    if window is None:
+        window = windows.setdefault(template, _Window())
+    return window
+
+
+def observe(endpoint: str, seconds: float, tenant=None):
+    """Record the latency of one request attempt (successful or not) for tenant (default: current)"""
+    _window(endpoint, tenant).add(seconds)
+
+
+def timeout_for(endpoint: str, tenant=None) -> float:
+    """
+    Request timeout for an endpoint
+
+    Args:
+        endpoint: API endpoint (e.g., "/shipments/123")
+        tenant: Tenant sending the request (default: the current one)
+
+    Returns:
+        float: Seconds - TURVO_TIMEOUT_P99_FACTOR x p99, clamped, or the fixed
+               timeout while there are too few samples
+    """
+    p99 = _window(endpoint, tenant).p99
+    if p99 is None:
+        return TURVO_TIMEOUT_SECONDS
+    return min(max(p99 * TURVO_TIMEOUT_P99_FACTOR, TURVO_TIMEOUT_MIN_SECONDS), TURVO_TIMEOUT_SECONDS)
+
+
+class _HedgeBudget:
+    """One tenant's saved-up hedges"""
+
+    def __init__(self):
+        self.tokens = 0.0
+        self.lock = threading.Lock()
+
+    def earn(self) -> bool:
+        """Credit one request's share of a hedge; True if a hedge is affordable"""
+        with self.lock:
+            self.tokens = min(self.tokens + TURVO_HEDGE_BUDGET, TURVO_HEDGE_BURST)
+            return self.tokens >= 1
+
+    def spend(self) -> bool:
+        """Take one hedge out of the budget (False if it ran out meanwhile)"""
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def _budget(tenant) -> _HedgeBudget:
+    return tenant.local("turvo_latency.budget", _HedgeBudget)
+
+
+def hedge_delay(endpoint: str, tenant) -> Optional[float]:
+    """
+    How long to wait before hedging a request (call once per request)
+
+    Args:
+        endpoint: API endpoint
+        tenant: Tenant sending the request (its budget must allow a hedge)
+
+    Returns:
+        float: The endpoint's p95 in seconds, or None if this request won't be hedged
+    """
+    if TURVO_HEDGE_BUDGET <= 0:
+        return None
+
+    affordable = _budget(tenant).earn()
+    p95 = _window(endpoint, tenant).p95
+    if p95 is None or not affordable:
+        return None
+    return p95
+
+
+def _get_hedge_pool(tenant) -> ThreadPoolExecutor:
+    holder = tenant.local("turvo_latency.hedge_pool", dict)
+    with _hedge_pool_lock:
+        if "pool" not in holder:
+            holder["pool"] = ThreadPoolExecutor(
+                max_workers=TURVO_HEDGE_WORKERS, thread_name_prefix=f"turvo-hedge-{tenant.tenant_id}"
+            )
+        return holder["pool"]
+
+
+def _usable(response: requests.Response) -> bool:
+    """A response worth returning without waiting for the other attempt"""
+    return response.status_code < 500 and response.status_code != 429
+
+
+def _close_late(future: Future):
+    """Release the connection of the attempt that lost the race"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def hedged(endpoint: str, send: Callable[[], requests.Response], delay: float, tenant) -> requests.Response:
+    """
+    Send a request, and a duplicate if it is still outstanding after delay
+
+    Args:
+        endpoint: API endpoint (for metrics)
+        send: Sends one attempt and returns its response (raises RequestException)
+        delay: Seconds to wait before hedging (from hedge_delay)
+        tenant: Tenant paying for the hedge
+
+    Returns:
+        requests.Response: First usable response (or the last error response
+                           if neither attempt got a usable one)
+    """
+    pool = _get_hedge_pool(tenant)
+    primary = pool.submit(send)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeoutError:
+        pass
+
+    if not _budget(tenant).spend():
+        return primary.result()
+
+    hedge = pool.submit(send)
+    metrics.count_turvo_hedge(endpoint, "sent")
+
+    pending = {primary, hedge}
+    fallback: Optional[requests.Response] = None
+    error: Optional[Exception] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except requests.exceptions.RequestException as e:
+                error = error or e
+                continue
+
+            if _usable(response):
+                metrics.count_turvo_hedge(endpoint, "won" if future is hedge else "lost")
+                for late in pending:
+                    late.add_done_callback(_close_late)
+                if fallback is not None:
+                    fallback.close()
+                return response
+
+            # 429 / 5xx - keep it in case the other attempt does no better
+            if fallback is None:
+                fallback = response
+            else:
+                response.close()
+
+    if fallback is not None:
+        return fallback
+    raise error
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    The current tenant's latency percentiles and timeouts per endpoint
+
+    Returns:
+        dict: endpoint -> samples, p50/p95/p99 (seconds) and timeout
+    """
+    tenant = tenants.current()
+    windows = dict(_windows(tenant))
+
+    return {
+        template: {
+            "samples": len(window.samples),
+            "p50": round(window.p50, 3) if window.p50 is not None else None,
+            "p95": round(window.p95, 3) if window.p95 is not None else None,
+            "p99": round(window.p99, 3) if window.p99 is not None else None,
+            "timeout": round(timeout_for(template, tenant), 2),
+            "hedge_after": round(window.p95, 3) if window.p95 is not None and TURVO_HEDGE_BUDGET > 0 else None
+        }
+        for template, window in windows.items()
+    }
+
+
+def shutdown():
+    """Stop every tenant's hedge threads (server shutdown)"""
+    for tenant in tenants.all_tenants():
+        holder = tenant.local("turvo_latency.hedge_pool", dict)
+        with _hedge_pool_lock:
+            pool = holder.pop("pool", None)
+        if pool is not None:
+            pool.shutdown(wait=False)
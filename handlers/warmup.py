@@ -0,0 +1,133 @@
+"""
+Startup warm-up
+
+After a deploy or restart the first sync would otherwise pay for the OAuth
+token, cold TLS connections, empty owner and fleet caches and a full
+pagination pass all at once - exactly when final-window loads are most at
+risk. Right after startup each tenant, concurrently and in the background:
+
+1. fetches its Turvo token (which also opens its pooled connection)
+2. loads the fleet index and the owner contacts other workers cached in Redis
+3. prefetches the En Route list - the first sync reuses it if it is at most
+   WARMUP_LIST_MAX_AGE_SECONDS old
+4. looks up the owners of listed shipments that are still missing
+
+Steps 3 and 4 cost a full pagination pass, so with several uvicorn workers
+only one per tenant does them: the first to claim the tenant's warm-up key
+in the state store (Redis or SQLite) for LEADER_SECONDS. The owners it looks
+up land in the shared store; the other workers only warm their own token,
+connections and local caches, and their first sync lists by itself. Without
+a state store every worker is on its own and does all four.
+
+/health answers as soon as the server is up; /ready returns 503 until
+warm-up has finished (successfully or not - a failed step is reported and
+the first sync simply does that work itself).
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable
+
+from . import clients, fleet_index, in_transit, state_store, tenants, turvo_capture, turvo_client, turvo_utils
+
+# Configuration
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+LEADER_SECONDS = 60  # Workers started within this of each other share one listing pass
+
+_status: Dict[str, Dict[str, Any]] = {}
+_done = threading.Event()
+
+
+def _step(status: Dict[str, Any], name: str, action: Callable[[], Any]) -> Any:
+    """Run one warm-up step, recording its duration and any error"""
+    started = time.perf_counter()
+    try:
+        result = action()
+    except Exception as e:
+        status["errors"][name] = str(e)[:200]
+        result = None
+    status["steps"][name] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _claim_listing(tenant: tenants.Tenant) -> bool:
+    """True if this worker should list the tenant's fleet (no other worker just did)"""
+    store = clients.state_store()
+    if not store:
+        return True
+    try:
+        return store.add(tenant.key("warmup", "listing"), str(os.getpid()), LEADER_SECONDS)
+    except state_store.StateError as e:
+        print(f"⚠ Could not coordinate warm-up, listing anyway: {e}")
+        return True
+
+
+def warm_tenant(tenant: tenants.Tenant):
+    """Warm one tenant's token, connections, caches and En Route list"""
+    status = _status[tenant.tenant_id]
+    status["state"] = "warming"
+    started = time.perf_counter()
+
+    with tenants.activate(tenant):
+        # Replayed runs never authenticate
+        if not turvo_capture.replaying():
+            _step(status, "token", turvo_client.get_turvo_token)
+
+        _step(status, "fleet_index", fleet_index.summary)
+        _step(status, "owner_contacts", in_transit.preload_owner_contacts)
+
+        shipments, owner_ids = [], set()
+        status["lists_fleet"] = _claim_listing(tenant)
+        if status["lists_fleet"]:
+            shipments = _step(status, "list", in_transit.prefetch_listing) or []
+            owner_ids = {turvo_utils.extract_owner_id(shipment) for shipment in shipments} - {None}
+            _step(status, "owners", lambda: [in_transit.get_owner_contact(owner_id) for owner_id in owner_ids])
+        status["shipments_listed"] = len(shipments)
+        status["owners"] = len(owner_ids)
+
+    status["duration_seconds"] = round(time.perf_counter() - started, 3)
+    status["state"] = "ready"
+
+    errors = f" | Failed: {', '.join(status['errors'])}" if status["errors"] else ""
+    listed = f"{len(shipments)} shipments listed | {len(owner_ids)} owners" if status["lists_fleet"] else "fleet listed by another worker"
+    print(f"✓ Warm-up done | Tenant: {tenant.tenant_id} | {status['duration_seconds']:.1f}s | {listed}{errors}")
+
+
+def _run():
+    targets = tenants.all_tenants()
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="warmup") as pool:
+        for future in [pool.submit(warm_tenant, tenant) for tenant in targets]:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"⚠ Warm-up failed: {e}")
+    _done.set()
+
+
+def start():
+    """Begin warming every tenant in the background (server startup)"""
+    if not WARMUP_ENABLED:
+        _done.set()
+        return
+
+    for tenant in tenants.all_tenants():
+        _status[tenant.tenant_id] = {"state": "pending", "steps": {}, "errors": {}}
+    threading.Thread(target=_run, name="warmup", daemon=True).start()
+
+
+def is_ready() -> bool:
+    """Warm-up finished (or is disabled)"""
+    return _done.is_set()
+
+
+def status() -> Dict[str, Dict[str, Any]]:
+    """
+    Warm-up progress per tenant
+
+    Returns:
+        dict: tenant_id -> {"state", "steps" (seconds each), "errors", ...}
+    """
+    return {tenant_id: dict(tenant_status) for tenant_id, tenant_status in _status.items()}
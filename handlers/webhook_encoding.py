@@ -0,0 +1,217 @@
+"""
+Compact, compressed encoding for batch webhooks
+
+At peak a batch carries hundreds of shipments, each repeating the same
+owner, carrier and customer blocks. A tenant can opt in to a smaller body:
+
+- format "compact": owners, carriers and customers shared by several
+  shipments are sent once, in top-level "owners" / "carriers" / "customers"
+  tables keyed by id, and those shipments refer to them by "owner_id" /
+  "carrier_id" / "customer_id" (a block used once stays inline - a table
+  entry would only add its id twice).
+  Keys whose value is null are left out, and the per-shipment "source"
+  moves to the batch. Blocks without an id stay inline.
+- compression "gzip" or "zstd": the body is sent with Content-Encoding
+  (zstd needs the optional zstandard package and falls back to gzip)
+
+Bodies are serialized with orjson when installed. The standard format
+without compression is what send_webhook has always sent, and stays the
+default. expand() turns a compact batch back into the standard shape.
+"""
+
+import gzip
+import json
+import time
+from typing import Dict, Any, Tuple
+
+try:
+    import orjson  # Optional - several times faster serialization of large batches
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard  # Optional - faster than gzip at a similar or better ratio
+except ImportError:
+    zstandard = None
+
+from . import metrics
+
+# Per tenant: webhook_format / webhook_compression (WEBHOOK_FORMAT / WEBHOOK_COMPRESSION)
+FORMATS = ("standard", "compact")
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Shipment field -> (batch table, reference field)
+SHARED_BLOCKS = {
+    "owner": ("owners", "owner_id"),
+    "carrier": ("carriers", "carrier_id"),
+    "customer": ("customers", "customer_id"),
+}
+
+_REF_FIELDS = {ref_field: field for field, (_, ref_field) in SHARED_BLOCKS.items()}
+
+# Identical for every shipment of a batch - sent once at the top level
+BATCH_FIELDS = ("source",)
+
+_zstd_warned = False
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), allow_nan=False).encode()
+
+
+def _without_nulls(value: Any) -> Any:
+    """Drop None values from nested dicts (shipment payloads hold no lists)"""
+    if type(value) is not dict:
+        return value
+    return {k: _without_nulls(v) if type(v) is dict else v for k, v in value.items() if v is not None}
+
+
+def _compact_shipment(shipment: Dict[str, Any], tables: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    compacted = {}
+    for key, value in shipment.items():
+        if value is None or key in BATCH_FIELDS:
+            continue
+        shared = SHARED_BLOCKS.get(key)
+        if shared and value.get("id") is not None:
+            table, ref_field = shared
+            ref = str(value["id"])
+            known = tables[table].get(ref)
+            # Only blocks shared with another shipment, with the same content
+            # (e.g. not a contact refreshed mid-run) - the rest stay inline
+            if known is value or (known is not None and known == value):
+                compacted[ref_field] = ref
+                continue
+        compacted[key] = _without_nulls(value)
+    return compacted
+
+
+def compact(batch: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a batch from build_batch_payload to the compact format
+
+    Args:
+        batch: Standard batch payload
+
+    Returns:
+        dict: Compact batch ("format": "compact")
+    """
+    # First pass: blocks referenced by more than one shipment
+    first_seen: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    tables: Dict[str, Dict[str, Dict[str, Any]]] = {table: {} for table, _ in SHARED_BLOCKS.values()}
+    for shipment in batch["shipments"]:
+        for field, (table, _) in SHARED_BLOCKS.items():
+            block = shipment.get(field)
+            if not block or block.get("id") is None:
+                continue
+            ref = str(block["id"])
+            seen = first_seen.setdefault((field, ref), block)
+            if seen is not block and ref not in tables[table]:
+                tables[table][ref] = seen
+
+    shipments = [_compact_shipment(shipment, tables) for shipment in batch["shipments"]]
+
+    first = batch["shipments"][0] if batch["shipments"] else {}
+    result = {key: value for key, value in batch.items() if key != "shipments"}
+    result.update({field: first[field] for field in BATCH_FIELDS if field in first})
+    result["format"] = "compact"
+    result.update({table: {ref: _without_nulls(block) for ref, block in blocks.items()} for table, blocks in tables.items()})
+    result["shipments"] = shipments
+    return result
+
+
+def expand(batch: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a compact batch back into the standard shape (for receivers and tests)
+
+    Null values left out by compact() stay absent.
+
+    Args:
+        batch: Compact batch
+
+    Returns:
+        dict: Batch with full owner / carrier / customer blocks per shipment
+    """
+    if batch.get("format") != "compact":
+        return batch
+
+    shipments = []
+    for shipment in batch["shipments"]:
+        expanded = {}
+        for key, value in shipment.items():
+            field = _REF_FIELDS.get(key)
+            if field:
+                expanded[field] = batch[SHARED_BLOCKS[field][0]][value]
+            else:
+                expanded[key] = value
+        expanded.update({field: batch[field] for field in BATCH_FIELDS if field in batch})
+        shipments.append(expanded)
+
+    tables = {table for table, _ in SHARED_BLOCKS.values()}
+    result = {
+        key: value for key, value in batch.items()
+        if key not in tables and key not in BATCH_FIELDS and key not in ("format", "shipments")
+    }
+    result["shipments"] = shipments
+    return result
+
+
+def _compress(body: bytes, compression: str) -> Tuple[bytes, str]:
+    """Compress a body; returns (bytes, Content-Encoding actually used)"""
+    global _zstd_warned
+    if compression == "zstd":
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+        if not _zstd_warned:
+            print("⚠ WEBHOOK_COMPRESSION=zstd but zstandard is not installed - using gzip")
+            _zstd_warned = True
+        compression = "gzip"
+    if compression == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, "none"
+
+
+def encode(batch: Dict[str, Any], fmt: str, compression: str) -> Tuple[bytes, Dict[str, str], Dict[str, Any]]:
+    """
+    Serialize a batch for the webhook request
+
+    Args:
+        batch: Standard batch payload
+        fmt: "standard" or "compact"
+        compression: "none", "gzip" or "zstd"
+
+    Returns:
+        tuple: (body, headers, info) - info has encoding, bytes, standard_bytes
+               (the uncompressed standard-format body) and encode_ms
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown webhook format: {fmt}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown webhook compression: {compression}")
+
+    started = time.perf_counter()
+    # The standard body is serialized once: it is what gets compressed, or,
+    # for compact, the size the savings are measured against
+    standard = _dumps(batch)
+    body, used = _compress(_dumps(compact(batch)) if fmt == "compact" else standard, compression)
+    encode_seconds = time.perf_counter() - started
+    metrics.observe_stage("webhook_encode", encode_seconds)
+
+    headers = {"Content-Type": "application/json"}
+    if used != "none":
+        headers["Content-Encoding"] = used
+
+    encoding = fmt if used == "none" else f"{fmt}+{used}"
+    standard_bytes = len(standard)
+    metrics.count_webhook_bytes(encoding, len(body), standard_bytes)
+
+    return body, headers, {
+        "encoding": encoding,
+        "bytes": len(body),
+        "standard_bytes": standard_bytes,
+        "encode_ms": round(encode_seconds * 1000, 2)
+    }
@@ -7,16 +7,23 @@ FastAPI server with endpoints for:
 - Manual testing
 """
 
-import os
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from fastapi import FastAPI, HTTPException, Header, BackgroundTasks
-from fastapi.responses import JSONResponse
-from handlers import in_transit
+from typing import Any, Dict, Optional
+from fastapi import FastAPI, HTTPException, Header, BackgroundTasks, Body, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from handlers import (
+    circuit_breaker, clients, fleet_index, in_transit, metrics, profiling, run_journal, settings, shipment_events,
+    sync_history, sync_progress, tenants, turvo_capture, turvo_latency, warmup
+)
 
 
 def verify_api_key(authorization: str = Header(None)):
     """Verify API key from Authorization header"""
-    api_key = os.getenv("API_SECRET_KEY")
+    api_key = settings.get().api_secret_key
 
     # If no API key configured, allow all requests (for backwards compatibility)
     if not api_key:
@@ -36,35 +43,82 @@ def verify_api_key(authorization: str = Header(None)):
     return True
 
 
+def resolve_tenant(tenant_id: str = None) -> tenants.Tenant:
+    """Tenant named by the ?tenant= parameter (the default tenant if omitted)"""
+    tenant = tenants.get(tenant_id)
+    if tenant is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant_id}")
+    return tenant
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks"""
+    # Token, connections, caches and the En Route list for the first sync (see /ready)
+    warmup.start()
+    yield
+    # Stop detail pool workers (if DETAIL_POOL_WORKERS enabled them)
+    in_transit.shutdown_detail_pool()
+    # Finish the capture archive (if TURVO_CAPTURE_PATH is set)
+    turvo_capture.close_capture()
+    # Stop the hedged-request threads, then close each tenant's Turvo connection pool
+    turvo_latency.shutdown()
+    tenants.close_all()
+    # Write out queued run journal rows (if JOURNAL_DIR is set)
+    run_journal.shutdown()
+    # Close the shared Redis connection pools
+    await clients.aclose()
+    clients.close()
+
+
 app = FastAPI(
     title="Motus Freight In-Transit Integration",
     description="Turvo API integration for in-transit automated calls",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
-# Track sync status
-sync_status = {
-    "running": False,
-    "last_run": None,
-    "last_result": None
-}
 
+def run_tenant_sync(tenant: tenants.Tenant):
+    """Run one tenant's sync (as that tenant)"""
+    with tenants.activate(tenant):
+        # One run per tenant at a time across all workers
+        if not sync_history.acquire_running():
+            print(f"⚠ Sync for tenant {tenant.tenant_id} already running on another worker, skipping")
+            return
 
-def run_sync_task():
-    """Background task to run the sync"""
-    global sync_status
-    sync_status["running"] = True
+        started_at = datetime.now(timezone.utc).isoformat()
 
-    try:
-        result = in_transit.sync_in_transit()
-        sync_status["last_result"] = result
-        sync_status["last_run"] = datetime.now(timezone.utc).isoformat()
-    except Exception as e:
-        print(f"✗ Fatal error in sync_in_transit: {e}")
-        sync_status["last_result"] = {"success": False, "error": str(e)}
-        sync_status["last_run"] = datetime.now(timezone.utc).isoformat()
-    finally:
-        sync_status["running"] = False
+        try:
+            if profiling.consume_request():
+                result, _ = profiling.run_profiled(in_transit.sync_in_transit)
+            else:
+                result = in_transit.sync_in_transit()
+        except Exception as e:
+            print(f"✗ Fatal error in sync_in_transit for tenant {tenant.tenant_id}: {e}")
+            result = {"success": False, "tenant": tenant.tenant_id, "error": str(e)}
+        finally:
+            sync_history.release_running()
+
+        sync_history.record_run(result, started_at, datetime.now(timezone.utc).isoformat())
+
+
+def run_sync_task(targets: list):
+    """
+    Background task to run the sync
+
+    Tenants run concurrently, each in its own thread with its own Turvo
+    session, rate limit and time budget - a slow tenant doesn't hold up the rest.
+    """
+    # Pick up an edited TENANTS_FILE (call windows, owner filters, webhook)
+    tenants.maybe_reload()
+
+    if len(targets) == 1:
+        run_tenant_sync(targets[0])
+        return
+
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="sync") as executor:
+        list(executor.map(run_tenant_sync, targets))
 
 
 @app.get("/")
@@ -75,8 +129,19 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "in_transit_sync": "/sync-in-transit (POST)",
-            "sync_status": "/sync-status (GET)"
+            "sync_status": "/sync-status (GET)",
+            "sync_status_stream": "/sync-status/stream (GET, server-sent events)",
+            "sync_history": "/sync-history (GET)",
+            "profile_sync": "/sync-in-transit/profile (POST)",
+            "turvo_events": "/turvo/events (POST)",
+            "fleet": "/fleet (GET)",
+            "tenants": "/tenants (GET)",
+            "config": "/config (GET)",
+            "config_reload": "/config/reload (POST)",
+            "profiles": "/profiles (GET)",
+            "metrics": "/metrics (GET)"
         }
     }
 
@@ -90,33 +155,209 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness: 503 until the startup warm-up has finished
+
+    Point the deploy health check here to route traffic (and the cron) to a
+    new instance only once its token, caches and En Route list are warm.
+    """
+    body = {"status": "ready" if warmup.is_ready() else "warming", "tenants": warmup.status()}
+    return JSONResponse(body, status_code=200 if warmup.is_ready() else 503)
+
+
 @app.get("/sync-status")
-async def get_sync_status(authorization: str = Header(None)):
+def get_sync_status(tenant: str = Query(None), authorization: str = Header(None)):
+    """
+    Get the status of the last/current sync operation (of one tenant)
+
+    Same answer on every worker (backed by the Redis run history).
+    While a run is in progress, "progress" shows shipments listed, details
+    fetched, payloads built, calls queued, Turvo requests/sec and an
+    estimated completion time. "turvo_latency" has this worker's observed
+    Turvo latency per endpoint with the timeout and hedge delay derived from it.
+    "circuit_breakers" has the state of this worker's breakers for the
+    tenant; "degraded" is true while any of them is open. "journal" has the
+    run journal writer's counters (this worker).
+
+    Plain def, like every endpoint that reads Redis: it runs in the
+    threadpool, so a slow Redis can't stall the event loop.
+
+    Returns:
+        dict: Current sync status, live progress and last result
     """
-    Get the status of the last/current sync operation
+    verify_api_key(authorization)
+
+    with tenants.activate(resolve_tenant(tenant)) as active:
+        last = sync_history.last_run()
+        breakers = circuit_breaker.snapshot()
+
+        return {
+            "tenant": active.tenant_id,
+            "running": sync_history.is_running(),
+            "progress": sync_progress.read(),
+            "last_run": last["finished_at"] if last else None,
+            "last_result": last,
+            "degraded": any(breaker["state"] != circuit_breaker.CLOSED for breaker in breakers.values()),
+            "circuit_breakers": breakers,
+            "turvo_latency": turvo_latency.snapshot(),
+            "journal": run_journal.status()
+        }
+
+
+@app.get("/sync-status/stream")
+async def stream_sync_status(tenant: str = Query(None), authorization: str = Header(None)):
+    """
+    Live sync progress as server-sent events (Protected)
+
+    Emits a "progress" event every second until the run finishes, then
+    closes. Use: curl -N -H "Authorization: Bearer ..." .../sync-status/stream
+    """
+    verify_api_key(authorization)
+    active = resolve_tenant(tenant)
+
+    async def events():
+        while True:
+            with tenants.activate(active):
+                progress = await sync_progress.read_async()
+            yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+
+            if not progress or progress["phase"] == "done":
+                break
+            await asyncio.sleep(sync_progress.PROGRESS_FLUSH_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/tenants")
+def list_tenants(authorization: str = Header(None)):
+    """
+    Configured tenants with their sync state (Protected)
 
     Returns:
-        dict: Current sync status and last result
+        dict: tenants (ID, running, last run finish time and success)
+    """
+    verify_api_key(authorization)
+
+    overview = []
+    for tenant in tenants.all_tenants():
+        with tenants.activate(tenant):
+            last = sync_history.last_run()
+            overview.append({
+                "tenant": tenant.tenant_id,
+                "running": sync_history.is_running(),
+                "last_run": last["finished_at"] if last else None,
+                "last_success": last.get("success") if last else None
+            })
+    return {"tenants": overview}
+
+
+@app.get("/config")
+async def get_config(authorization: str = Header(None)):
+    """
+    Process settings (secrets masked) and each tenant's current call policy (Protected)
     """
     verify_api_key(authorization)
 
     return {
-        "running": sync_status["running"],
-        "last_run": sync_status["last_run"],
-        "last_result": sync_status["last_result"]
+        "settings": settings.describe(),
+        "tenants": {
+            tenant.tenant_id: {name: getattr(tenant, name) for name in sorted(tenants.RELOADABLE)}
+            for tenant in tenants.all_tenants()
+        }
     }
 
 
+@app.post("/config/reload")
+def reload_config(
+    changes: Optional[Dict[str, Dict[str, Any]]] = Body(None, description="Tenant ID -> settings to change"),
+    authorization: str = Header(None)
+):
+    """
+    Change call windows, owner filters and webhook settings without a restart (Protected)
+
+    Without a body, TENANTS_FILE is re-read and any changes sent earlier are
+    dropped (every worker also picks up an edited file at its next sync).
+    With a body - e.g.
+    {"default": {"call_window_1": [2.5, 3.5], "allowed_owner_ids": "5564"}} -
+    the settings are applied here and published through Redis, so every
+    worker applies them at its next sync or event. They stay in force,
+    restarts included, until a reload without a body. Without Redis they
+    apply to this worker only, until it restarts. Invalid settings are
+    rejected as a whole (400).
+
+    Returns:
+        dict: changed (tenant -> settings updated) and restart_required
+    """
+    verify_api_key(authorization)
+
+    try:
+        return tenants.reload(changes)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/sync-history")
+def get_sync_history(
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    tenant: str = Query(None),
+    authorization: str = Header(None)
+):
+    """
+    Recorded sync runs, newest first, with run-duration percentiles (Protected)
+
+    Each run includes stage timings, shipment counts and errors.
+
+    Args:
+        limit: Runs per page (max 200)
+        offset: Runs to skip
+
+    Returns:
+        dict: runs, total, and p50/p95 duration summary over the stored history
+    """
+    verify_api_key(authorization)
+
+    with tenants.activate(resolve_tenant(tenant)) as active:
+        runs, total = sync_history.get_history(limit=limit, offset=offset)
+
+        return {
+            "tenant": active.tenant_id,
+            "runs": runs,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "summary": sync_history.duration_summary()
+        }
+
+
+@app.get("/metrics")
+async def get_metrics(authorization: str = Header(None)):
+    """
+    Prometheus metrics (Protected)
+
+    Sync stage latency, Turvo request latency by endpoint/status,
+    Redis round trips and per-shipment sync outcome counters.
+    """
+    verify_api_key(authorization)
+
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
 @app.post("/sync-in-transit")
-async def sync_in_transit_endpoint(
+def sync_in_transit_endpoint(
     background_tasks: BackgroundTasks,
+    tenant: str = Query(None, description="Sync only this tenant (default: all tenants, concurrently)"),
     authorization: str = Header(None)
 ):
     """
     In-Transit Sync Endpoint (Protected)
 
     Starts the sync process in the background and returns immediately.
-    Check /sync-status for results.
+    Check /sync-status for results. Tenants whose previous run is still
+    going are skipped.
 
     Authentication:
     - Requires Authorization header: Bearer <API_SECRET_KEY>
@@ -132,8 +373,15 @@ async def sync_in_transit_endpoint(
     # Verify API key
     verify_api_key(authorization)
 
-    # Check if already running
-    if sync_status["running"]:
+    # Check which tenants are already running
+    targets = [resolve_tenant(tenant)] if tenant else tenants.all_tenants()
+    idle = []
+    for target in targets:
+        with tenants.activate(target):
+            if not sync_history.is_running():
+                idle.append(target)
+
+    if not idle:
         return JSONResponse(
             content={
                 "success": True,
@@ -144,19 +392,206 @@ async def sync_in_transit_endpoint(
         )
 
     # Start background task
-    background_tasks.add_task(run_sync_task)
+    background_tasks.add_task(run_sync_task, idle)
 
     return JSONResponse(
         content={
             "success": True,
             "message": "Sync started in background",
             "status": "started",
+            "tenants": [target.tenant_id for target in idle],
             "check_status_at": "/sync-status"
         },
         status_code=202
     )
 
 
+@app.post("/sync-in-transit/profile")
+def profile_sync_endpoint(
+    background_tasks: BackgroundTasks,
+    tenant: str = Query(None),
+    authorization: str = Header(None)
+):
+    """
+    Profile the next sync run (Protected)
+
+    Arms cProfile + tracemalloc for the next run. If no sync is running,
+    one is started now; otherwise the next cron-triggered run is profiled.
+    Results are listed at /profiles.
+
+    Returns:
+        dict: Acknowledgment
+    """
+    verify_api_key(authorization)
+
+    profiling.request_profile()
+    target = resolve_tenant(tenant)
+
+    with tenants.activate(target):
+        running = sync_history.is_running()
+
+    if running:
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": "Sync in progress - the next run will be profiled",
+                "status": "armed",
+                "check_profiles_at": "/profiles"
+            },
+            status_code=202
+        )
+
+    background_tasks.add_task(run_sync_task, [target])
+
+    return JSONResponse(
+        content={
+            "success": True,
+            "message": "Profiled sync started in background",
+            "status": "started",
+            "check_profiles_at": "/profiles"
+        },
+        status_code=202
+    )
+
+
+@app.post("/turvo/events")
+def receive_turvo_event(
+    event: shipment_events.ShipmentEvent,
+    tenant: str = Query(None, description="Tenant whose Turvo account sent the event"),
+    authorization: str = Header(None)
+):
+    """
+    Ingest a Turvo shipment update / location event (Protected)
+
+    Updates the shipment's state snapshot and re-evaluates just that
+    shipment against the call windows, placing a call if one is due.
+    Redelivered events are acknowledged without being applied again, and
+    events older than the stored state are ignored.
+
+    Plain def: the evaluation may call Turvo and the webhook, so it runs in
+    the threadpool instead of blocking the event loop.
+
+    Returns:
+        dict: status (applied/duplicate/stale/closed), applied fields, outcome and calls placed
+    """
+    verify_api_key(authorization)
+    tenants.maybe_reload()
+
+    try:
+        with tenants.activate(resolve_tenant(tenant)):
+            return shipment_events.handle_event(event)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"✗ Failed to process Turvo event for shipment {event.shipment_id}: {e}")
+        # Non-2xx so Turvo redelivers it
+        raise HTTPException(status_code=503, detail=f"Event not processed: {e}")
+
+
+@app.get("/fleet")
+def get_fleet(
+    owner: str = Query(None, description="Owner ID or name"),
+    window: str = Query(None, pattern="^(checkin|final|none)$"),
+    state: str = Query(None, description="e.g. calling, called, already_called, outside_window, overnight_on_time"),
+    reefer: bool = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    tenant: str = Query(None),
+    authorization: str = Header(None)
+):
+    """
+    Current fleet classification, soonest delivery first (Protected)
+
+    Served from the fleet index the syncs and shipment events maintain -
+    no Turvo requests. Each shipment shows hours_until (live), window,
+    minutes late, which calls were made, and why it is or isn't being called.
+
+    Returns:
+        dict: updated_at, total matches, limit/offset and the page of shipments
+    """
+    verify_api_key(authorization)
+
+    with tenants.activate(resolve_tenant(tenant)):
+        result = fleet_index.query(owner=owner, window=window, state=state, reefer=reefer, limit=limit, offset=offset)
+    return {**result, "limit": limit, "offset": offset}
+
+
+@app.get("/fleet/summary")
+def get_fleet_summary(tenant: str = Query(None), authorization: str = Header(None)):
+    """
+    Shipment counts per classification state and call window (Protected)
+    """
+    verify_api_key(authorization)
+
+    with tenants.activate(resolve_tenant(tenant)):
+        return fleet_index.summary()
+
+
+@app.get("/fleet/{shipment_id}")
+def get_fleet_shipment(shipment_id: int, tenant: str = Query(None), authorization: str = Header(None)):
+    """
+    One shipment's current classification (Protected)
+    """
+    verify_api_key(authorization)
+
+    with tenants.activate(resolve_tenant(tenant)):
+        entry = fleet_index.get(shipment_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Shipment not in the fleet index")
+    return entry
+
+
+@app.get("/profiles")
+def list_profiles(authorization: str = Header(None)):
+    """
+    List stored sync profiles, newest first (Protected)
+
+    Returns:
+        dict: Profile metadata with top allocators
+    """
+    verify_api_key(authorization)
+
+    return {"profiles": profiling.list_profiles()}
+
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, authorization: str = Header(None)):
+    """
+    Get a stored profile's text summary and top allocators (Protected)
+
+    Returns:
+        dict: Profile with "summary" (top functions by cumulative time)
+    """
+    verify_api_key(authorization)
+
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    profile.pop("pstats")
+    return profile
+
+
+@app.get("/profiles/{profile_id}/download")
+def download_profile(profile_id: str, authorization: str = Header(None)):
+    """
+    Download raw cProfile stats (Protected)
+
+    Open with: python -m pstats sync.prof (or snakeviz sync.prof)
+    """
+    verify_api_key(authorization)
+
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return Response(
+        content=profile["pstats"],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="sync-{profile_id}.prof"'}
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
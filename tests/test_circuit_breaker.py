@@ -0,0 +1,90 @@
+"""CircuitBreaker state transitions"""
+
+import pytest
+
+from handlers import circuit_breaker
+from handlers.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(circuit_breaker, "BREAKER_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(circuit_breaker, "BREAKER_OPEN_SECONDS", 30)
+    return now
+
+
+@pytest.fixture
+def breaker(clock):
+    return circuit_breaker.CircuitBreaker("turvo /shipments/{id}", "default")
+
+
+def _fail(breaker, times):
+    for _ in range(times):
+        assert breaker.allow()
+        breaker.record(False)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    _fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+    _fail(breaker, 1)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    with pytest.raises(circuit_breaker.CircuitOpen):
+        breaker.check()
+
+
+def test_success_resets_the_failure_count(breaker):
+    _fail(breaker, 2)
+    breaker.record(True)
+    _fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe_through(breaker, clock):
+    _fail(breaker, 3)
+    clock[0] += 30
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(breaker, clock):
+    _fail(breaker, 3)
+    clock[0] += 30
+    assert breaker.allow()
+
+    breaker.record(True)
+
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_opens_again(breaker, clock):
+    _fail(breaker, 3)
+    clock[0] += 30
+    assert breaker.allow()
+
+    breaker.record(False)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    clock[0] += 30
+    assert breaker.allow()
+
+
+def test_probe_that_never_reports_back_is_given_up_on(breaker, clock):
+    _fail(breaker, 3)
+    clock[0] += 30
+    assert breaker.allow()  # Caller raised before record()
+
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
@@ -0,0 +1,85 @@
+"""ETA history packing, merging and the lateness projection"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from handlers import eta_history
+
+NOW = 1_800_000_000
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def _history(points):
+    history = b""
+    for observed_at, eta in points:
+        history = eta_history.append(history, observed_at, _iso(eta))
+    return history
+
+
+def test_merge_keeps_observations_of_both_versions_in_order():
+    loaded = _history([(NOW - 3600, NOW + 7200)])
+    stored = eta_history.append(loaded, NOW - 600, _iso(NOW + 7300))  # an event appended meanwhile
+    ours = eta_history.append(loaded, NOW, _iso(NOW + 7400))          # the sync's own observation
+
+    merged = eta_history.merge(stored, ours)
+
+    assert eta_history.observations(merged) == [
+        (NOW - 3600, NOW + 7200), (NOW - 600, NOW + 7300), (NOW, NOW + 7400)
+    ]
+    assert eta_history.merge(ours, stored) == merged
+
+
+def test_merge_collapses_close_observations_and_caps_the_history():
+    stored = _history([(NOW, NOW + 100)])
+    ours = _history([(NOW + eta_history.MERGE_SECONDS - 1, NOW + 200)])
+    assert eta_history.observations(eta_history.merge(stored, ours)) == [(NOW + eta_history.MERGE_SECONDS - 1, NOW + 200)]
+
+    size = eta_history.ETA_HISTORY_SIZE
+    stored = _history([(NOW + i * 600, NOW) for i in range(size)])
+    ours = _history([(NOW + i * 600 + 300, NOW) for i in range(size)])
+    merged = eta_history.observations(eta_history.merge(stored, ours))
+    assert len(merged) == size
+    assert merged[-1] == (NOW + (size - 1) * 600 + 300, NOW)
+
+
+def test_merge_with_nothing_stored_is_ours():
+    ours = _history([(NOW, NOW + 60)])
+    assert eta_history.merge(b"", ours) == ours
+
+
+def test_slope_of_a_steadily_slipping_eta():
+    # ETA slips 12 minutes every hour
+    history = _history([(NOW - 7200 + i * 900, NOW + 3600 + i * 900 * 0.2) for i in range(9)])
+    assert eta_history.slope(history, NOW) == pytest.approx(0.2, abs=0.01)
+
+
+def test_slope_needs_enough_points_spread_over_time():
+    assert eta_history.slope(_history([(NOW - 900, NOW), (NOW, NOW)]), NOW) is None
+    close_together = _history([(NOW - 120 * i, NOW) for i in range(5, 0, -1)])
+    assert eta_history.slope(close_together, NOW) is None
+
+
+def test_projection_of_a_slipping_eta_is_late():
+    appointment = NOW + 3.5 * 3600
+    # Ten minutes early two hours ago, slipping 12 min/h
+    history = _history([
+        (NOW - 7200 + i * 900, appointment - 600 + i * 900 * 0.2) for i in range(9)
+    ])
+
+    projected = eta_history.projected_minutes_late(history, _iso(appointment), NOW)
+
+    assert projected is not None and projected > 30
+
+
+def test_no_projection_for_a_steady_or_improving_eta():
+    appointment = NOW + 3 * 3600
+    steady = _history([(NOW - 3600 + i * 900, appointment) for i in range(5)])
+    improving = _history([(NOW - 3600 + i * 900, appointment + 3600 - i * 600) for i in range(5)])
+
+    assert eta_history.projected_minutes_late(steady, _iso(appointment), NOW) is None
+    assert eta_history.projected_minutes_late(improving, _iso(appointment), NOW) is None
+    assert eta_history.projected_minutes_late(steady, None, NOW) is None
@@ -0,0 +1,49 @@
+"""SQLite state store: claims (add / add_many), expiry and deletes"""
+
+import pytest
+
+from handlers import state_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = state_store.SQLiteStateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def test_add_many_claims_only_free_keys(store):
+    assert store.add("call:1", "first", 60)
+
+    assert store.add_many({"call:1": "second", "call:2": "second"}, 60) == [False, True]
+    assert store.get_many(["call:1", "call:2"]) == ["first", "second"]
+
+
+def test_add_many_takes_over_expired_keys(store):
+    store.set("call:1", "stale", -1)
+
+    assert store.get("call:1") is None
+    assert store.add_many({"call:1": "fresh"}, 60) == [True]
+    assert store.get("call:1") == "fresh"
+
+
+def test_add_many_of_nothing(store):
+    assert store.add_many({}, 60) == []
+
+
+def test_delete_many_releases_claims(store):
+    store.add_many({f"call:{i}": "x" for i in range(1200)}, 60)
+
+    store.delete_many([f"call:{i}" for i in range(1100)])
+
+    assert sum(value is not None for value in store.get_many([f"call:{i}" for i in range(1200)])) == 100
+    assert store.add("call:0", "again", 60)
+
+
+def test_hash_fields_expire_with_their_key(store):
+    store.hash_set("owners", "5", "a", 60)
+    store.hash_set("owners", "6", "b", 60)
+    assert store.hash_get_all("owners") == {"5": "a", "6": "b"}
+
+    store.hash_set("owners", "7", "c", -1)
+    assert store.hash_get_all("owners") == {}
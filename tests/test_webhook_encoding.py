@@ -0,0 +1,55 @@
+"""compact() / expand() round trip of batch webhooks"""
+
+from handlers import webhook_encoding
+
+
+def _shipment(load: str, owner_id: int, carrier_id: int, notes=None):
+    return {
+        "load_number": load,
+        "notes": notes,
+        "owner": {"id": owner_id, "name": f"Owner {owner_id}", "phone": None},
+        "carrier": {"id": carrier_id, "name": f"Carrier {carrier_id}"},
+        "customer": {"name": "No id - stays inline"},
+        "source": "turvo",
+    }
+
+
+def _batch():
+    return {
+        "mode": "BUSINESS",
+        "shipments": [_shipment("L1", 7, 100, notes="fragile"), _shipment("L2", 7, 101), _shipment("L3", 8, 100)],
+    }
+
+
+def test_round_trip_restores_standard_batch_without_nulls():
+    batch = _batch()
+
+    expanded = webhook_encoding.expand(webhook_encoding.compact(batch))
+
+    assert expanded == webhook_encoding._without_nulls({
+        **batch, "shipments": [webhook_encoding._without_nulls(s) for s in batch["shipments"]]
+    })
+
+
+def test_shared_blocks_are_sent_once_and_single_use_blocks_stay_inline():
+    compacted = webhook_encoding.compact(_batch())
+
+    assert compacted["format"] == "compact"
+    assert compacted["source"] == "turvo"
+    assert set(compacted["owners"]) == {"7"}
+    assert set(compacted["carriers"]) == {"100"}
+    first, second, third = compacted["shipments"]
+    assert first["owner_id"] == "7" and first["carrier_id"] == "100"
+    assert second["carrier"] == {"id": 101, "name": "Carrier 101"}
+    assert third["owner"] == {"id": 8, "name": "Owner 8"}
+    assert all("source" not in shipment and "customer" in shipment for shipment in compacted["shipments"])
+
+
+def test_expand_leaves_standard_batches_alone():
+    batch = _batch()
+    assert webhook_encoding.expand(batch) is batch
+
+
+def test_empty_batch_round_trips():
+    batch = {"mode": "OVERNIGHT", "shipments": []}
+    assert webhook_encoding.expand(webhook_encoding.compact(batch)) == batch